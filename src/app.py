@@ -11,6 +11,13 @@ import pandas as pd
 from flask import Flask, render_template, request, jsonify
 import joblib
 from datetime import datetime
+from prediction_cache import SharedPredictionCache, file_model_version
+from dataset_profiler import load_profile, PROFILE_FILENAME
+from workload_features import WorkloadTable, WORKLOAD_FEATURES, OVERALL_FEATURES
+from feature_matrix import category_encoder
+from category_vocab import CategoryVocabulary, VOCAB_FILENAME
+from model_registry import current_version, version_dir
+from explain import ForestExplainer, supports_explanations
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -20,54 +27,107 @@ MODEL_PATH = 'visa_processing_model_Random_Forest.pkl'
 PREPROCESSOR_PATH = 'visa_preprocessor.pkl'
 FEATURES_PATH = 'visa_features.pkl'
 SUMMARY_PATH = 'model_summary.json'
+CACHE_PATH = 'prediction_cache.sqlite'
+PROFILE_PATH = PROFILE_FILENAME  # copied next to the model by retrain_model.py
+WORKLOAD_PATH = 'workload_features.npz'
+VOCAB_PATH = VOCAB_FILENAME
+ARTIFACT_NAMES = [MODEL_PATH, PREPROCESSOR_PATH, FEATURES_PATH, SUMMARY_PATH, PROFILE_PATH, WORKLOAD_PATH, VOCAB_PATH]
+
+# Serve the promoted version of a model registry (model_registry.py) instead of
+# the files above; promotions and rollbacks are picked up on the next request
+REGISTRY_DIR = os.environ.get('VISA_MODEL_REGISTRY')
 
 class VisaPredictor:
-    def __init__(self):
-        """Initialize the prediction system"""
+    def __init__(self, artifacts_dir='', model_version=None):
+        """Initialize the prediction system from the artifacts in artifacts_dir"""
         print("Loading model artifacts...")
+        model_path, preprocessor_path, features_path, summary_path, profile_path, workload_path, vocab_path = [
+            os.path.join(artifacts_dir, name) for name in ARTIFACT_NAMES]
         
         # Load model
-        if os.path.exists(MODEL_PATH):
-            self.model = joblib.load(MODEL_PATH)
-            print(f"Model loaded from {os.path.abspath(MODEL_PATH)}")
+        if os.path.exists(model_path):
+            self.model = joblib.load(model_path)
+            print(f"Model loaded from {os.path.abspath(model_path)}")
         else:
-            raise FileNotFoundError(f"Model file not found: {MODEL_PATH}")
+            raise FileNotFoundError(f"Model file not found: {model_path}")
         
         # Load preprocessor
-        if os.path.exists(PREPROCESSOR_PATH):
-            self.preprocessor = joblib.load(PREPROCESSOR_PATH)
-            print(f"Preprocessor loaded from {PREPROCESSOR_PATH}")
+        if os.path.exists(preprocessor_path):
+            self.preprocessor = joblib.load(preprocessor_path)
+            print(f"Preprocessor loaded from {preprocessor_path}")
         else:
             self.preprocessor = None
             print("Warning: Preprocessor not found")
         
         # Load feature list
-        if os.path.exists(FEATURES_PATH):
-            with open(FEATURES_PATH, 'rb') as f:
+        if os.path.exists(features_path):
+            with open(features_path, 'rb') as f:
                 self.features = pickle.load(f)
-            print(f"Features loaded from {FEATURES_PATH}")
+            print(f"Features loaded from {features_path}")
         else:
             self.features = None
             print("Warning: Features file not found")
         
         # Load model summary
-        if os.path.exists(SUMMARY_PATH):
-            with open(SUMMARY_PATH, 'r') as f:
+        if os.path.exists(summary_path):
+            with open(summary_path, 'r') as f:
                 self.summary = json.load(f)
-            print(f"Model summary loaded from {SUMMARY_PATH}")
+            print(f"Model summary loaded from {summary_path}")
         else:
             self.summary = {}
             print("Warning: Model summary not found")
+        
+        # Training data profile, used to flag inputs unlike anything seen in training
+        try:
+            self.profile = load_profile(profile_path)
+            if self.profile:
+                print(f"Data profile loaded from {profile_path}")
+            else:
+                print("Warning: Data profile not found")
+        except Exception as e:
+            self.profile = None
+            print(f"Warning: Could not load data profile: {e}")
+        
+        # Intake / backlog lookup table, only needed if the model was trained with it
+        self.workload = None
+        if self.features is None or any(f in self.features for f in WORKLOAD_FEATURES):
+            if os.path.exists(workload_path):
+                self.workload = WorkloadTable.load(workload_path)
+                print(f"Workload table loaded from {workload_path}")
+                if self.workload.held(datetime.now()):
+                    print(f"Warning: Workload data ends {self.workload.last_complete_date:%Y-%m-%d}; "
+                          f"requests get that day's intake and backlog")
+            else:
+                print("Warning: Workload table not found")
+        
+        # Levels kept for the high-cardinality columns at training time
+        self.vocabulary = None
+        if os.path.exists(vocab_path):
+            try:
+                self.vocabulary = CategoryVocabulary.load(vocab_path)
+                print(f"Category vocabulary loaded from {vocab_path}")
+            except Exception as e:
+                print(f"Warning: Could not load category vocabulary: {e}")
+        else:
+            print("Warning: Category vocabulary not found")
+        
+        # Shared prediction cache (one SQLite file for all workers on this host)
+        try:
+            self.model_version = model_version or file_model_version(model_path)
+            self.cache = SharedPredictionCache(CACHE_PATH, model_version=self.model_version)
+            print(f"Prediction cache at {CACHE_PATH} (model version {self.model_version})")
+        except Exception as e:
+            self.cache = None
+            print(f"Warning: Prediction cache disabled: {e}")
             
         # Introspect model to find categories
         try:
             if hasattr(self.model, 'named_steps'):
-                preprocessor = self.model.named_steps['preprocessor']
-                cat_transformer = preprocessor.named_transformers_['cat']
-                onehot = cat_transformer.named_steps['onehot']
+                # One-hot ('onehot') or native categorical ('ordinal') encoder
+                encoder = category_encoder(self.model)
                 
                 # Get feature names from the categorical columns
-                self.model_categories = onehot.categories_
+                self.model_categories = encoder.categories_
         except Exception as e:
             print(f"Warning: Could not extract model categories: {e}")
             self.model_categories = []
@@ -118,14 +178,22 @@ class VisaPredictor:
         }
         
         # Handle high cardinality categorical features
-        for col in ['JOB_TITLE', 'SOC_TITLE', 'NAICS_CODE']:
-            if col in input_data:
-                # Simple reduction strategy
-                input_data[col] = input_data[col][:50]  # Truncate if too long
+        if self.vocabulary is not None:
+            # Same levels as training, everything else becomes 'Other'
+            input_data = self.vocabulary.map_record(input_data)
+        else:
+            for col in ['JOB_TITLE', 'SOC_TITLE', 'NAICS_CODE']:
+                if col in input_data:
+                    # Simple reduction strategy
+                    input_data[col] = input_data[col][:50]  # Truncate if too long
         
         # Validate and map inputs to model categories
         input_data = self._validate_and_map_inputs(input_data)
         
+        # Current intake volume and backlog (O(1) lookup by day)
+        if self.workload is not None:
+            input_data.update(self.workload.lookup(current_date, input_data['VISA_CLASS']))
+        
         return input_data
 
     def _validate_and_map_inputs(self, input_data):
@@ -207,6 +275,28 @@ class VisaPredictor:
 
         return input_data
 
+    def check_input(self, input_data):
+        """Warnings for values outside the range or vocabulary of the training data"""
+        warnings = []
+        if not self.profile:
+            return warnings
+        for feature, value in input_data.items():
+            # Date features and CASE_STATUS are filled in by the app, not the user
+            if feature.startswith('application_') or feature == 'CASE_STATUS':
+                continue
+            if feature not in self.profile or value is None:
+                continue
+            info = self.profile.columns[feature]
+            if info['kind'] == 'numeric' and isinstance(value, (int, float)):
+                low, high = self.profile.value_range(feature)
+                if low is not None and not (low <= value <= high):
+                    warnings.append(f"{feature}={value} is outside the training range [{low:g}, {high:g}]")
+            elif info['kind'] == 'categorical':
+                known = self.profile.known_values(feature)
+                if known is not None and str(value) not in known and value != 'Other':
+                    warnings.append(f"{feature}='{value}' was not seen in the training data")
+        return warnings
+
     def _get_season(self, month):
         """Determine season based on month"""
         if month in [12, 1, 2]:
@@ -228,13 +318,16 @@ class VisaPredictor:
     def predict_processing_time(self, input_data):
         """Make prediction using the trained model"""
         try:
-            # Convert input data to DataFrame
-            input_df = pd.DataFrame([input_data])
-            
-            
             # Make prediction
             if hasattr(self.model, 'predict'):
-                prediction = self.model.predict(input_df)[0]
+                # Check the shared cache before building a DataFrame
+                prediction = self.cache.get(input_data) if self.cache else None
+                
+                if prediction is None:
+                    input_df = pd.DataFrame([input_data])
+                    prediction = self.model.predict(input_df)[0]
+                    if self.cache:
+                        self.cache.put(input_data, prediction)
                 
                 # Ensure prediction is reasonable
                 prediction = max(1, min(365, float(prediction)))
@@ -242,7 +335,7 @@ class VisaPredictor:
                 # Calculate confidence interval
                 confidence_interval = self._calculate_confidence_interval(prediction)
                 
-                return {
+                result = {
                     'processing_days': round(prediction, 1),
                     'confidence_low': round(confidence_interval[0], 1),
                     'confidence_high': round(confidence_interval[1], 1),
@@ -250,12 +343,29 @@ class VisaPredictor:
                     'processing_months': round(prediction / 30, 1),
                     'status': 'success'
                 }
+                
+                input_warnings = self.check_input(input_data)
+                if input_warnings:
+                    result['input_warnings'] = input_warnings
+                return result
             else:
                 return {'error': 'Model does not have predict method', 'status': 'error'}
         
         except Exception as e:
             return {'error': str(e), 'status': 'error'}
     
+    def explain(self, input_data):
+        """Baseline and the largest per-field contributions to the estimate (None if the model has no trees)"""
+        if not supports_explanations(self.model):
+            return None
+        # Node-level deltas are computed once per loaded model
+        if getattr(self, 'explainer', None) is None:
+            self.explainer = ForestExplainer(self.model)
+        # Past the end of the workload data every request gets the same overall
+        # intake and backlog, so they are not reported as drivers of this estimate
+        fixed = OVERALL_FEATURES if self.workload is not None and self.workload.held(datetime.now()) else ()
+        return self.explainer.explain(pd.DataFrame([input_data]), fixed=fixed)[0]
+
     def _calculate_confidence_interval(self, prediction):
         """Calculate 95% confidence interval based on model performance"""
         # Use model summary if available
@@ -279,12 +389,42 @@ class VisaPredictor:
         }
         return info
 
+def load_predictor(version=None):
+    """Predictor of a registry version (the promoted one by default), or of the artifacts next to the app"""
+    if REGISTRY_DIR:
+        version = version or current_version(REGISTRY_DIR)
+        if version is None:
+            raise FileNotFoundError(f"No promoted model version in {REGISTRY_DIR}")
+        return VisaPredictor(version_dir(REGISTRY_DIR, version), model_version=version)
+    return VisaPredictor()
+
+# Promoted version that failed to load; not retried until CURRENT changes
+failed_version = None
+
 # Initialize predictor
 try:
-    predictor = VisaPredictor()
+    predictor = load_predictor()
 except Exception as e:
     print(f"Error initializing predictor: {e}")
     predictor = None
+    failed_version = current_version(REGISTRY_DIR) if REGISTRY_DIR else None
+
+@app.before_request
+def follow_registry():
+    """Switch models right after a promotion or rollback (a read of the small CURRENT file)"""
+    global predictor, failed_version
+    if not REGISTRY_DIR:
+        return
+    version = current_version(REGISTRY_DIR)
+    if version is None or version in (getattr(predictor, 'model_version', None), failed_version):
+        return
+    try:
+        predictor = load_predictor(version)
+        failed_version = None
+    except Exception as e:
+        failed_version = version
+        print(f"Error switching to model version {version}: {e}; "
+              f"serving the previous model until another version is promoted")
 
 # Routes
 @app.route('/')
@@ -354,6 +494,9 @@ def api_predict():
         data = request.get_json()
         input_data = predictor.prepare_input_data(data)
         result = predictor.predict_processing_time(input_data)
+        # {"explain": true} adds the per-field breakdown of the estimate
+        if data.get('explain') and result.get('status') == 'success':
+            result['explanation'] = predictor.explain(input_data)
         return jsonify(result)
     
     except Exception as e:
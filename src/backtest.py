@@ -0,0 +1,175 @@
+"""
+Backtest
+Time-based evaluation of the retrain_model.py forest, one fold per month of
+RECEIVED_DATE, instead of a single random train_test_split.
+
+Every fold tests on the applications received in one month and trains only on
+applications decided before that month started (their processing time was
+known by then):
+
+- expanding: every earlier decided application
+- rolling:   only those received in the WINDOW_MONTHS months before
+
+The data is loaded and encoded once (category vocabulary, sparse float32
+one-hot matrix) and cached on disk; the folds run in parallel worker
+processes that load the cache and densify only their own rows. The
+encoding itself is fitted on all months, so only the model is kept blind to
+the future.
+
+Outputs per-month MAE / RMSE, per-VISA_CLASS errors and the month x class MAE
+table, saved as CSV when an output directory is given.
+
+Usage: python backtest.py [preprocessed_csv] [expanding|rolling] [output_dir]
+"""
+
+import sys
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import RandomForestRegressor
+
+from data_loader import load_dataset
+from dataset_profiler import get_profile
+from category_vocab import CategoryVocabulary
+from feature_matrix import build_preprocessor, densify
+from model_scheduler import CPU_BUDGET, cache_matrices
+from plot_utils import save_table
+from workload_features import WORKLOAD_FEATURES, get_workload_table, add_workload_features
+from retrain_model import selected_features
+
+MODES = ('expanding', 'rolling')
+MIN_TRAIN_MONTHS = 3   # months of history before the first test month
+WINDOW_MONTHS = 6      # training window of the rolling mode
+N_ESTIMATORS = 100
+
+_data = {}
+
+
+def backtest_model():
+    """The retrain_model.py forest, single-threaded (the folds run in parallel)"""
+    return RandomForestRegressor(n_estimators=N_ESTIMATORS, max_depth=None, random_state=42, n_jobs=1)
+
+
+def month_numbers(dates):
+    """Consecutive month numbers (year * 12 + month) of a datetime column"""
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype='int32')
+
+
+def prepare_matrix(data_path):
+    """Encoded feature matrix plus the arrays the folds are cut from"""
+    df = load_dataset(data_path, columns=['RECEIVED_DATE', 'DECISION_DATE'] + selected_features)
+    df = df[df['processing_days'].notna() & df['RECEIVED_DATE'].notna() & df['DECISION_DATE'].notna()]
+    df = df.reset_index(drop=True)
+    add_workload_features(df, get_workload_table(data_path))
+
+    features = [f for f in selected_features[:-1] + WORKLOAD_FEATURES if f in df.columns]
+    X = df[features]
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    X = CategoryVocabulary.fit(X, categorical_cols, get_profile(data_path)).transform(X)
+
+    start_time = time.time()
+    X_encoded = build_preprocessor(numerical_cols, categorical_cols, sparse_output=True).fit_transform(X)
+    print(f"Encoded {X_encoded.shape[0]:,} rows x {X_encoded.shape[1]} columns once "
+          f"in {time.time() - start_time:.1f}s")
+
+    first_month = month_numbers(df['RECEIVED_DATE']).min()
+    months = pd.period_range(df['RECEIVED_DATE'].min(), df['RECEIVED_DATE'].max(), freq='M')
+    return {
+        'X': X_encoded,
+        'y': df['processing_days'].to_numpy(dtype='float64'),
+        'month': month_numbers(df['RECEIVED_DATE']) - first_month,
+        'decided_month': month_numbers(df['DECISION_DATE']) - first_month,
+    }, months, df['VISA_CLASS'].astype(str).to_numpy()
+
+
+def fold_rows(month, decided_month, test_month, mode, window_months=WINDOW_MONTHS):
+    """(train rows, test rows) of the fold testing on test_month"""
+    train = decided_month < test_month
+    if mode == 'rolling':
+        train &= month >= test_month - window_months
+    return np.flatnonzero(train), np.flatnonzero(month == test_month)
+
+
+def _init_worker(paths):
+    for name, path in paths.items():
+        _data[name] = sparse.load_npz(path).tocsr() if path.endswith('.npz') else np.load(path, mmap_mode='r')
+
+
+def _run_fold(test_month, mode):
+    """Fit on the fold's training rows and predict its test month (runs in a worker)"""
+    train_rows, test_rows = fold_rows(_data['month'], _data['decided_month'], test_month, mode)
+    start_time = time.perf_counter()
+    # The forest copies its input to dense float32 anyway and splits it far faster than CSR
+    model = backtest_model().fit(densify(_data['X'][train_rows]), _data['y'][train_rows])
+    train_time = time.perf_counter() - start_time
+    return test_month, len(train_rows), test_rows, model.predict(densify(_data['X'][test_rows])), train_time
+
+
+def _errors(y_true, y_pred):
+    errors = y_true - y_pred
+    return {'MAE': np.mean(np.abs(errors)), 'RMSE': np.sqrt(np.mean(errors ** 2))}
+
+
+def run_backtest(data_path, mode='expanding', output_dir=None, max_workers=None,
+                 min_train_months=MIN_TRAIN_MONTHS):
+    """Train and evaluate every monthly fold in parallel; returns (monthly, by_class, month_by_class)"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown backtest mode: {mode} (expected one of {MODES})")
+    start_time = time.time()
+    arrays, months, visa_class = prepare_matrix(data_path)
+    test_months = [m for m in range(min_train_months, len(months)) if (arrays['month'] == m).any()]
+    if not test_months:
+        print(f"Error: {len(months)} months of data, need more than {min_train_months} for a backtest")
+        return None
+
+    max_workers = max_workers or min(CPU_BUDGET, len(test_months))
+    cache_dir = tempfile.mkdtemp(prefix='visa_backtest_')
+    try:
+        paths = cache_matrices(cache_dir, **arrays)
+        print(f"Running {len(test_months)} {mode} folds on {max_workers} workers...")
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(paths,)) as pool:
+            folds = list(pool.map(_run_fold, test_months, [mode] * len(test_months)))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    y = arrays['y']
+    monthly, predictions = [], []
+    for test_month, n_train, test_rows, y_pred, train_time in folds:
+        monthly.append({'month': str(months[test_month]), 'train_rows': n_train, 'test_rows': len(test_rows),
+                        **_errors(y[test_rows], y_pred), 'Train_Time': train_time})
+        predictions.append(pd.DataFrame({'month': str(months[test_month]), 'VISA_CLASS': visa_class[test_rows],
+                                         'y_true': y[test_rows], 'y_pred': y_pred}))
+    monthly = pd.DataFrame(monthly).set_index('month')
+    predictions = pd.concat(predictions, ignore_index=True)
+    predictions['abs_error'] = (predictions['y_true'] - predictions['y_pred']).abs()
+
+    by_class = predictions.groupby('VISA_CLASS').apply(
+        lambda g: pd.Series({'test_rows': len(g), **_errors(g['y_true'], g['y_pred'])}))
+    by_class = by_class.astype({'test_rows': 'int64'}).sort_values('test_rows', ascending=False)
+    month_by_class = predictions.pivot_table(index='month', columns='VISA_CLASS', values='abs_error', aggfunc='mean')
+
+    print(f"\nMonthly errors ({mode} window):")
+    print(monthly.round(2).to_string())
+    print("\nErrors by VISA_CLASS over all folds:")
+    print(by_class.round(2).to_string())
+    print(f"\nBacktest finished in {time.time() - start_time:.1f}s "
+          f"(sum of fold training times: {monthly['Train_Time'].sum():.1f}s)")
+
+    save_table(monthly, f'backtest_{mode}_monthly', output_dir)
+    save_table(by_class, f'backtest_{mode}_visa_class', output_dir)
+    save_table(month_by_class, f'backtest_{mode}_month_visa_class_mae', output_dir)
+    return monthly, by_class, month_by_class
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'expanding'
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else None
+    run_backtest(data_path, mode, output_dir)
@@ -0,0 +1,116 @@
+"""
+Model Benchmark
+Compares the current one-hot Random Forest with HistGradientBoosting on
+native categorical splits (feature_matrix.native_categorical_model): training
+time, pickled model size, single-row prediction latency and test error.
+
+The native model is run twice, with the forest's category reduction (top 20
+levels + 'Other') and with NATIVE_MAX_CATEGORIES levels per column, to show
+what keeping far more JOB_TITLE / SOC_TITLE / NAICS_CODE levels costs.
+
+Usage: python benchmark_models.py [preprocessed_csv] [n_rows]
+"""
+
+import io
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from data_loader import load_dataset
+from category_vocab import CategoryVocabulary
+from dataset_profiler import get_profile
+from feature_matrix import build_preprocessor, native_categorical_model, NATIVE_MAX_CATEGORIES
+from retrain_model import selected_features
+from workload_features import WORKLOAD_FEATURES, get_workload_table, add_workload_features
+
+LATENCY_CALLS = 200
+
+
+def single_row_latency(model, X, calls=LATENCY_CALLS):
+    """Median and 95th percentile milliseconds of predict() on one-row frames"""
+    rows = [X.iloc[[i % len(X)]] for i in range(calls)]
+    model.predict(rows[0])
+    times = []
+    for row in rows:
+        start = time.perf_counter()
+        model.predict(row)
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times), np.percentile(times, 95)
+
+
+def benchmark(name, pipeline, X, y, train_index, test_index):
+    X_train, X_test = X.loc[train_index], X.loc[test_index]
+    y_train, y_test = y.loc[train_index], y.loc[test_index]
+
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    train_time = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    joblib.dump(pipeline, buffer)
+    median_ms, p95_ms = single_row_latency(pipeline, X_test)
+    y_pred = pipeline.predict(X_test)
+
+    result = {
+        'Model': name,
+        'Train_Time': train_time,
+        'Size_MB': buffer.getbuffer().nbytes / 1e6,
+        'Latency_ms': median_ms,
+        'Latency_p95_ms': p95_ms,
+        'Test_RMSE': np.sqrt(mean_squared_error(y_test, y_pred)),
+        'Test_MAE': mean_absolute_error(y_test, y_pred),
+    }
+    print(f"  {name}: trained in {train_time:.1f}s, {result['Size_MB']:.1f} MB, "
+          f"{median_ms:.2f} ms per row, RMSE {result['Test_RMSE']:.2f}")
+    return result
+
+
+def run(data_path, n_rows=None):
+    df = load_dataset(data_path, columns=['RECEIVED_DATE'] + selected_features)
+    add_workload_features(df, get_workload_table(data_path))
+    if n_rows and n_rows < len(df):
+        df = df.sample(n=n_rows, random_state=42)
+    profile = get_profile(data_path)
+
+    features = [f for f in selected_features[:-1] + WORKLOAD_FEATURES if f in df.columns]
+    X, y = df[features], df['processing_days']
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    train_index, test_index = train_test_split(X.index, test_size=0.2, random_state=42)
+    print(f"Benchmarking on {len(train_index):,} training / {len(test_index):,} test rows")
+
+    X_top20 = CategoryVocabulary.fit(X, categorical_cols, profile).transform(X)
+    X_wide = CategoryVocabulary.fit(X, categorical_cols, profile,
+                                    NATIVE_MAX_CATEGORIES, NATIVE_MAX_CATEGORIES).transform(X)
+    for col in ['JOB_TITLE', 'SOC_TITLE', 'NAICS_CODE']:
+        if col in X.columns:
+            print(f"  {col}: {X_top20[col].nunique()} levels (top 20) vs {X_wide[col].nunique()} levels (native)")
+
+    forest = Pipeline(steps=[
+        ('preprocessor', build_preprocessor(numerical_cols, categorical_cols)),
+        ('regressor', RandomForestRegressor(n_estimators=100, max_depth=None, random_state=42, n_jobs=-1))
+    ])
+    results = [
+        benchmark('Random Forest (one-hot, top 20)', forest, X_top20, y, train_index, test_index),
+        benchmark('HistGB native (top 20)', native_categorical_model(numerical_cols, categorical_cols),
+                  X_top20, y, train_index, test_index),
+        benchmark(f'HistGB native (top {NATIVE_MAX_CATEGORIES})',
+                  native_categorical_model(numerical_cols, categorical_cols),
+                  X_wide, y, train_index, test_index),
+    ]
+    results = pd.DataFrame(results).set_index('Model')
+    print("\n" + results.round(3).to_string())
+    return results
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    n_rows = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    run(data_path, n_rows)
@@ -0,0 +1,114 @@
+"""
+Preprocessing Benchmark
+Times the cleaning, date-parsing and temporal-feature stages of
+visa_preprocessing.py against the original row-wise implementations on a
+synthetic multi-million-row frame shaped like the LCA disclosure data, and
+checks that both produce identical output.
+
+Usage: python benchmark_preprocessing.py [n_rows]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+import visa_preprocessing as vp
+
+N_ROWS = 3000000
+
+
+def make_frame(n_rows, seed=42):
+    """Synthetic raw frame with realistic cardinalities and messy whitespace"""
+    rng = np.random.default_rng(seed)
+    job_titles = np.array([f' Software  Engineer {i} ' for i in range(20000)], dtype=object)
+    soc_titles = np.array([f'Soc  Title {i}' for i in range(800)], dtype=object)
+    states = np.array(['CA', 'NY', 'TX', 'NJ', 'WA', 'MA', 'IL', 'GA', 'PA', 'FL', ' CA', 'NY '], dtype=object)
+    days = pd.date_range('2023-10-01', '2024-09-30').strftime('%Y-%m-%d').values.astype(object)
+
+    received = rng.integers(0, len(days) - 60, n_rows)
+    return pd.DataFrame({
+        'JOB_TITLE': job_titles[rng.integers(0, len(job_titles), n_rows)],
+        'SOC_TITLE': soc_titles[rng.integers(0, len(soc_titles), n_rows)],
+        'EMPLOYER_STATE': states[rng.integers(0, len(states), n_rows)],
+        'WORKSITE_STATE': states[rng.integers(0, len(states), n_rows)],
+        'RECEIVED_DATE': days[received],
+        'DECISION_DATE': days[received + rng.integers(0, 60, n_rows)],
+    })
+
+
+# Original implementations, kept here as the baseline
+
+def legacy_clean(df):
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        df[col] = df[col].astype(str).str.strip()
+        df[col] = df[col].str.replace(r'\s+', ' ', regex=True)
+    return df
+
+
+def legacy_dates(df):
+    for col in ['RECEIVED_DATE', 'DECISION_DATE']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def legacy_temporal(df):
+    df['application_year'] = df['RECEIVED_DATE'].dt.year
+    df['application_month'] = df['RECEIVED_DATE'].dt.month
+    df['application_day'] = df['RECEIVED_DATE'].dt.day
+    df['application_weekday'] = df['RECEIVED_DATE'].dt.weekday
+    df['application_season'] = df['application_month'].apply(vp.get_season)
+    return df
+
+
+def new_clean(df):
+    vp.clean_categorical_columns(df)
+    return df
+
+
+def new_dates(df):
+    return vp.convert_date_columns(df, parser=vp.DateParser())
+
+
+def new_temporal(df):
+    vp.add_temporal_features(df)
+    return df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(n_rows=N_ROWS):
+    print(f"Building synthetic frame with {n_rows:,} rows...")
+    raw = make_frame(n_rows)
+    text_columns = ['JOB_TITLE', 'SOC_TITLE', 'EMPLOYER_STATE', 'WORKSITE_STATE']
+
+    rows = []
+
+    before, t_before = timed(legacy_clean, raw[text_columns].copy())
+    after, t_after = timed(new_clean, raw[text_columns].copy())
+    pd.testing.assert_frame_equal(before, after, check_dtype=False)
+    rows.append(('Categorical cleaning', t_before, t_after))
+
+    dates_before, t_before = timed(legacy_dates, raw[['RECEIVED_DATE', 'DECISION_DATE']].copy())
+    dates_after, t_after = timed(new_dates, raw[['RECEIVED_DATE', 'DECISION_DATE']].copy())
+    pd.testing.assert_frame_equal(dates_before, dates_after, check_dtype=False)
+    rows.append(('Date parsing', t_before, t_after))
+
+    temporal_before, t_before = timed(legacy_temporal, dates_before[['RECEIVED_DATE']].copy())
+    temporal_after, t_after = timed(new_temporal, dates_before[['RECEIVED_DATE']].copy())
+    pd.testing.assert_frame_equal(temporal_before, temporal_after, check_dtype=False)
+    rows.append(('Temporal features + season', t_before, t_after))
+
+    results = pd.DataFrame(rows, columns=['Stage', 'Before (s)', 'After (s)'])
+    results['Speedup'] = results['Before (s)'] / results['After (s)']
+    print("\nOutputs identical for every stage.")
+    print(results.to_string(index=False, float_format=lambda v: f'{v:.2f}'))
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS)
@@ -0,0 +1,90 @@
+"""
+Category Vocabulary
+The levels kept for every high-cardinality categorical column at training
+time, saved next to the model so serving maps inputs exactly like training.
+
+Training reduces each column with a vectorized mapping (categorical columns
+are remapped through their codes, other columns with isin), every value
+outside the vocabulary becoming 'Other'. The vocabulary is saved as JSON and
+loaded at serving time into one set per column, so mapping a request value is
+a single hash lookup.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+from dataset_profiler import reduction_categories
+
+VOCAB_FILENAME = 'visa_category_vocab.json'
+VOCAB_VERSION = 1
+OTHER = 'Other'
+
+
+def reduce_series(series, keep, other=OTHER):
+    """Values of series outside keep replaced by other, without a per-row Python call"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        kept = categories[categories.isin(keep)]
+        if other not in kept:
+            kept = kept.append(pd.Index([other]))
+        # New code of every old category (categories not kept map to other)
+        remap = kept.get_indexer(categories)
+        remap[remap < 0] = kept.get_loc(other)
+        codes = series.cat.codes.values
+        new_codes = np.where(codes < 0, kept.get_loc(other), remap[codes])
+        return pd.Series(pd.Categorical.from_codes(new_codes, kept), index=series.index, name=series.name)
+    return series.where(series.isin(keep), other)
+
+
+class CategoryVocabulary:
+    def __init__(self, levels=None, other=OTHER):
+        self.other = other
+        self.levels = {col: [str(v) for v in values] for col, values in (levels or {}).items()}
+        self._lookup = {col: frozenset(values) for col, values in self.levels.items()}
+
+    @classmethod
+    def fit(cls, X, columns, profile=None, max_unique=50, top_k=20):
+        """Vocabulary of the columns that need reducing (same rule as reduction_categories)"""
+        levels = {}
+        for col in columns:
+            top_categories = reduction_categories(X, col, profile, max_unique, top_k)
+            if top_categories is not None:
+                levels[col] = list(top_categories)
+        return cls(levels)
+
+    def __contains__(self, column):
+        return column in self.levels
+
+    def transform(self, X, verbose=False):
+        """Copy of X with every vocabulary column reduced"""
+        X = X.copy()
+        for col, values in self.levels.items():
+            if col in X.columns:
+                if verbose:
+                    print(f"  Reducing categories in '{col}' (had {X[col].nunique()} unique values)")
+                X[col] = reduce_series(X[col], values, self.other)
+        return X
+
+    def map_value(self, column, value):
+        """Serving-time mapping of one value (columns without a vocabulary pass through)"""
+        lookup = self._lookup.get(column)
+        if lookup is None or value is None or str(value) in lookup:
+            return value
+        return self.other
+
+    def map_record(self, record):
+        """Copy of an input dict with every vocabulary column mapped"""
+        return {key: self.map_value(key, value) for key, value in record.items()}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': VOCAB_VERSION, 'other': self.other, 'levels': self.levels}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') != VOCAB_VERSION:
+            raise ValueError(f"Unsupported category vocabulary version in {path}")
+        return cls(saved['levels'], saved['other'])
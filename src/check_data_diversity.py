@@ -1,14 +1,14 @@
-import pandas as pd
 import os
+from data_loader import load_dataset
 
 DATA_PATH = r'c:\Users\HP\Documents\GitHub\Visa-Status-Prediction\data\visa_data_preprocessed.csv'
 
+cols_to_check = ['CASE_STATUS', 'VISA_CLASS', 'application_year', 'EMPLOYER_STATE']
+
 try:
-    df = pd.read_csv(DATA_PATH, nrows=50000)
+    df = load_dataset(DATA_PATH, columns=cols_to_check + ['processing_days'], nrows=50000)
     print(f"Loaded {len(df)} rows.")
     
-    cols_to_check = ['CASE_STATUS', 'VISA_CLASS', 'application_year', 'EMPLOYER_STATE']
-    
     for col in cols_to_check:
         if col in df.columns:
             print(f"\nValue Counts for {col}:")
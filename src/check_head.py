@@ -1,10 +1,10 @@
-import pandas as pd
+from data_loader import load_dataset
 
 DATA_PATH = r'c:\Users\HP\Documents\GitHub\Visa-Status-Prediction\data\visa_data_preprocessed.csv'
 
 try:
     print("Reading first 1000 rows...")
-    df = pd.read_csv(DATA_PATH, nrows=1000)
+    df = load_dataset(DATA_PATH, columns=['CASE_STATUS', 'application_year', 'EMPLOYER_STATE'], nrows=1000)
     
     print(f"CASE_STATUS counts: {dict(df['CASE_STATUS'].value_counts())}")
     print(f"Year counts: {dict(df['application_year'].value_counts())}")
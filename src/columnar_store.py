@@ -0,0 +1,165 @@
+"""
+Columnar Store
+Partitioned Parquet copy of the preprocessed dataset.
+
+Layout (hive partitioning, one directory per fiscal year and visa class):
+
+    visa_data_parquet/fiscal_year=2024/VISA_CLASS=H-1B/<source>-00000-0.parquet
+
+Fiscal years follow the DOL convention (October 1 - September 30) and are
+derived from DECISION_DATE. Files are named after the source disclosure file,
+so rewriting one year's file only replaces that file's parts and several
+years can sit side by side. String columns are dictionary encoded and read
+back as pandas categoricals; dates stay native timestamps.
+"""
+
+import os
+import re
+import glob
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITION_COLUMNS = ['fiscal_year', 'VISA_CLASS']
+PARTITION_SCHEMA = pa.schema([('fiscal_year', pa.int32()), ('VISA_CLASS', pa.string())])
+
+# Columns read back as pandas categoricals (stored dictionary encoded)
+CATEGORICAL_COLUMNS = [
+    'CASE_STATUS', 'VISA_CLASS', 'FULL_TIME_POSITION', 'EMPLOYER_STATE', 'WORKSITE_STATE',
+    'EMPLOYER_COUNTRY', 'WORKSITE_COUNTY', 'WORKSITE_CITY', 'JOB_TITLE', 'SOC_CODE', 'SOC_TITLE',
+    'WAGE_UNIT_OF_PAY', 'PW_UNIT_OF_PAY', 'PW_WAGE_LEVEL', 'H_1B_DEPENDENT', 'WILLFUL_VIOLATOR',
+    'AGENT_REPRESENTING_EMPLOYER', 'application_season'
+]
+
+
+def add_fiscal_year(df):
+    """DOL fiscal year of each decision (FY N runs Oct N-1 to Sep N)"""
+    dates = df['DECISION_DATE'] if 'DECISION_DATE' in df.columns else df['RECEIVED_DATE']
+    dates = pd.to_datetime(dates, errors='coerce')
+    fiscal_year = dates.dt.year + (dates.dt.month >= 10).astype('int64')
+    df['fiscal_year'] = fiscal_year.fillna(0).astype('int32')
+    return df
+
+
+def to_arrow_table(df):
+    """Convert a preprocessed frame to an Arrow table with compact types"""
+    df = df.copy()
+    if 'fiscal_year' not in df.columns:
+        add_fiscal_year(df)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+        if df[col].dtype == 'object':
+            df[col] = df[col].where(df[col].isnull(), df[col].astype(str))
+    df['VISA_CLASS'] = df['VISA_CLASS'].fillna('Unknown').astype(str)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def remove_source_parts(dataset_dir, source_name):
+    """Delete every part file previously written for one source file"""
+    pattern = os.path.join(dataset_dir, '**', f'{glob.escape(source_name)}-*.parquet')
+    # The glob also matches other sources named '{source_name}-...'; keep only this source's parts
+    part_name = re.compile(rf'{re.escape(source_name)}(-w\d{{3}})?-\d{{5}}-\d+\.parquet')
+    removed = 0
+    for path in glob.glob(pattern, recursive=True):
+        if part_name.fullmatch(os.path.basename(path)):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+class PartitionedWriter:
+    def __init__(self, dataset_dir, source_name, replace=True, worker=None):
+        """
+        Writer for one source file; replaces that source's old parts.
+
+        Parallel workers pass replace=False (the parent clears old parts once)
+        and a worker number so their file names never collide.
+        """
+        self.dataset_dir = dataset_dir
+        self.source_name = source_name
+        self.prefix = source_name if worker is None else f'{source_name}-w{worker:03d}'
+        self.schema = None
+        self.part = 0
+        self.rows = 0
+        os.makedirs(dataset_dir, exist_ok=True)
+        if replace:
+            removed = remove_source_parts(dataset_dir, source_name)
+            if removed:
+                print(f"Replaced {removed} existing parts for {source_name}")
+
+    def write(self, df):
+        """Append one frame (or chunk) to the partitioned dataset"""
+        if len(df) == 0:
+            return
+        table = to_arrow_table(df)
+        if self.schema is None:
+            self.schema = table.schema
+        else:
+            # Later chunks follow the first chunk's schema
+            table = table.select(self.schema.names).cast(self.schema)
+
+        ds.write_dataset(
+            table,
+            self.dataset_dir,
+            format='parquet',
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+            basename_template=f'{self.prefix}-{self.part:05d}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        self.part += 1
+        self.rows += len(df)
+
+
+def write_columnar(df, dataset_dir, source_name):
+    """Write a whole preprocessed frame to the partitioned dataset"""
+    writer = PartitionedWriter(dataset_dir, source_name)
+    writer.write(df)
+    return writer
+
+
+def open_dataset(dataset_dir):
+    return ds.dataset(
+        dataset_dir,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+    )
+
+
+def read_columnar(dataset_dir, columns=None, filters=None):
+    """
+    Read the partitioned dataset into pandas.
+
+    columns: optional list of columns to load (column projection)
+    filters: optional DNF filters, e.g. [('fiscal_year', '=', 2024),
+             ('VISA_CLASS', 'in', ['H-1B', 'E-3 Australian'])]; conditions on
+             partition columns skip whole directories.
+    """
+    dataset = open_dataset(dataset_dir)
+    expression = pq.filters_to_expression(filters) if filters else None
+    table = dataset.to_table(columns=columns, filter=expression)
+
+    # Dictionary-encode categorical columns so pandas gets categoricals
+    for i, name in enumerate(table.column_names):
+        field_type = table.schema.field(name).type
+        if name in CATEGORICAL_COLUMNS and (pa.types.is_string(field_type) or pa.types.is_large_string(field_type)):
+            table = table.set_column(i, name, table.column(name).dictionary_encode())
+    return table.to_pandas()
+
+
+def iter_columnar(dataset_dir, columns=None, filters=None, batch_size=200000):
+    """Yield the dataset as pandas chunks of at most batch_size rows"""
+    dataset = open_dataset(dataset_dir)
+    expression = pq.filters_to_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def fiscal_years(dataset_dir):
+    """Fiscal years present in the dataset (from the directory names only)"""
+    years = set()
+    for path in glob.glob(os.path.join(dataset_dir, 'fiscal_year=*')):
+        years.add(int(os.path.basename(path).split('=', 1)[1]))
+    return sorted(years)
@@ -0,0 +1,243 @@
+"""
+Data Loader
+One typed loader for the preprocessed dataset, shared by the analysis,
+inspection and training scripts.
+
+- Reads the fastest available format: the partitioned Parquet dataset written
+  by visa_preprocessing.py (columnar_store.py) when it exists next to the CSV,
+  otherwise the CSV with only the requested columns parsed.
+- Applies compact dtypes: category for string columns, int32 for integer
+  features, float32 for floats and datetime64 for the date columns.
+- Optionally caches the parsed frame on local disk (pickle, keyed by the
+  source file, columns, filters and row limit).
+- Prints the load time and memory use of every call.
+"""
+
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+
+COLUMNAR_DIRNAME = 'visa_data_parquet'
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'visa_data')
+CHUNK_SIZE = 200000
+
+# String columns become categoricals unless nearly every value is distinct
+CATEGORY_MAX_RATIO = 0.5
+
+DATE_COLUMNS = ['RECEIVED_DATE', 'DECISION_DATE', 'ORIGINAL_CERT_DATE', 'BEGIN_DATE', 'END_DATE']
+
+# Integer-valued features that safely fit in int32
+INT32_COLUMNS = [
+    'processing_days', 'application_year', 'application_month', 'application_day',
+    'application_weekday', 'fiscal_year'
+]
+
+# Codes whose dtype the trained pipelines rely on; left exactly as read
+KEEP_DTYPE_COLUMNS = ['NAICS_CODE']
+
+
+def columnar_path_for(data_path):
+    """Location of the Parquet dataset that sits next to a preprocessed CSV"""
+    if os.path.isdir(data_path):
+        return data_path
+    return os.path.join(os.path.dirname(data_path), COLUMNAR_DIRNAME)
+
+
+def compact_dtypes(df):
+    """Downcast a frame in place to category / int32 / float32 / datetime64"""
+    for col in df.columns:
+        series = df[col]
+        if col in DATE_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                df[col] = pd.to_datetime(series, errors='coerce')
+        elif col in KEEP_DTYPE_COLUMNS:
+            continue
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        elif pd.api.types.is_bool_dtype(series):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            if col in INT32_COLUMNS or (series.min() >= np.iinfo('int32').min and series.max() <= np.iinfo('int32').max):
+                df[col] = series.astype('int32')
+        elif pd.api.types.is_float_dtype(series):
+            if col in INT32_COLUMNS and not series.isnull().any():
+                df[col] = series.astype('int32')
+            else:
+                df[col] = series.astype('float32')
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            # Near-unique columns (e.g. CASE_NUMBER) are cheaper as plain strings
+            if len(series) and series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+                df[col] = series.astype('category')
+    return df
+
+
+def apply_filters(df, filters):
+    """Apply DNF-style filters [(column, op, value), ...] (ANDed) in pandas"""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        series = df[column]
+        if op in ('=', '=='):
+            mask &= series == value
+        elif op == '!=':
+            mask &= series != value
+        elif op == 'in':
+            mask &= series.isin(value)
+        elif op == 'not in':
+            mask &= ~series.isin(value)
+        elif op == '<':
+            mask &= series < value
+        elif op == '<=':
+            mask &= series <= value
+        elif op == '>':
+            mask &= series > value
+        elif op == '>=':
+            mask &= series >= value
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return df[mask]
+
+
+def _read_columns(columns, filters):
+    """Columns to read: requested ones plus any needed only for filtering"""
+    if columns is None:
+        return None
+    extra = [f[0] for f in (filters or []) if f[0] not in columns]
+    return list(columns) + extra
+
+
+def _cache_key(source, columns, filters, nrows, compact):
+    if os.path.isdir(source):
+        stamps = [
+            (os.path.join(root, name), os.path.getmtime(os.path.join(root, name)))
+            for root, _, files in os.walk(source) for name in sorted(files)
+        ]
+        stamp = str(sorted(stamps))
+    else:
+        stat = os.stat(source)
+        stamp = f"{stat.st_size}|{stat.st_mtime_ns}"
+    token = f"{os.path.abspath(source)}|{stamp}|{columns}|{filters}|{nrows}|{compact}"
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()
+
+
+def _read_csv(data_path, columns, filters, nrows):
+    read_columns = _read_columns(columns, filters)
+    header = pd.read_csv(data_path, nrows=0).columns
+    if read_columns is not None:
+        missing = [c for c in read_columns if c not in header]
+        if missing:
+            print(f"Warning: columns not in {data_path}: {missing}")
+        read_columns = [c for c in read_columns if c in header]
+    parse_dates = [c for c in DATE_COLUMNS if c in header and (read_columns is None or c in read_columns)]
+    df = pd.read_csv(data_path, usecols=read_columns, parse_dates=parse_dates, nrows=nrows, low_memory=False)
+    return apply_filters(df, filters)
+
+
+def _read_parquet(dataset_path, columns, filters, nrows):
+    from columnar_store import read_columnar, iter_columnar, open_dataset
+
+    read_columns = _read_columns(columns, filters)
+    if read_columns is not None:
+        available = open_dataset(dataset_path).schema.names
+        missing = [c for c in read_columns if c not in available]
+        if missing:
+            print(f"Warning: columns not in {dataset_path}: {missing}")
+        read_columns = [c for c in read_columns if c in available]
+
+    if nrows is None:
+        return read_columnar(dataset_path, columns=read_columns, filters=filters)
+
+    chunks = []
+    rows = 0
+    for chunk in iter_columnar(dataset_path, columns=read_columns, filters=filters):
+        chunks.append(chunk)
+        rows += len(chunk)
+        if rows >= nrows:
+            break
+    if not chunks:
+        return read_columnar(dataset_path, columns=read_columns, filters=filters).head(0)
+    return pd.concat(chunks, ignore_index=True).head(nrows)
+
+
+def load_dataset(data_path, columns=None, filters=None, nrows=None, compact=True,
+                 cache=False, cache_dir=CACHE_DIR, prefer_columnar=True):
+    """
+    Load the preprocessed dataset.
+
+    data_path: preprocessed CSV (a Parquet dataset directory is also accepted)
+    columns:   columns to load; None loads every column
+    filters:   [(column, op, value), ...] ANDed row filters, e.g.
+               [('VISA_CLASS', '=', 'H-1B1 Singapore')]
+    nrows:     load at most this many rows
+    compact:   apply category / int32 / float32 / datetime64 dtypes
+    cache:     keep a pickled copy of the parsed frame in cache_dir
+    """
+    start_time = time.time()
+
+    dataset_path = columnar_path_for(data_path)
+    use_columnar = prefer_columnar and os.path.isdir(dataset_path)
+    source = dataset_path if use_columnar else data_path
+
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Data file not found: {source}")
+
+    cache_file = None
+    if cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file = os.path.join(cache_dir, _cache_key(source, columns, filters, nrows, compact) + '.pkl')
+
+    if cache_file and os.path.exists(cache_file):
+        df = pd.read_pickle(cache_file)
+        origin = 'cache'
+    else:
+        if use_columnar:
+            df = _read_parquet(dataset_path, columns, filters, nrows)
+            origin = 'parquet'
+        else:
+            df = _read_csv(data_path, columns, filters, nrows)
+            origin = 'csv'
+
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        df = df.reset_index(drop=True)
+        if compact:
+            df = compact_dtypes(df)
+        if cache_file:
+            df.to_pickle(cache_file)
+
+    memory_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    print(f"Loaded {len(df):,} rows x {df.shape[1]} columns from {origin} "
+          f"in {time.time() - start_time:.2f}s ({memory_mb:.1f} MB)")
+    return df
+
+
+def iter_dataset(data_path, columns=None, filters=None, chunksize=CHUNK_SIZE, compact=True,
+                 prefer_columnar=True):
+    """Yield the dataset in chunks of at most chunksize rows"""
+    dataset_path = columnar_path_for(data_path)
+    read_columns = _read_columns(columns, filters)
+    use_columnar = prefer_columnar and os.path.isdir(dataset_path)
+
+    if use_columnar:
+        from columnar_store import iter_columnar
+        chunks = iter_columnar(dataset_path, columns=read_columns, filters=filters, batch_size=chunksize)
+    else:
+        header = pd.read_csv(data_path, nrows=0).columns
+        if read_columns is not None:
+            read_columns = [c for c in read_columns if c in header]
+        parse_dates = [c for c in DATE_COLUMNS if c in header and (read_columns is None or c in read_columns)]
+        chunks = pd.read_csv(data_path, usecols=read_columns, parse_dates=parse_dates,
+                             chunksize=chunksize, low_memory=False)
+
+    for chunk in chunks:
+        if not use_columnar:
+            chunk = apply_filters(chunk, filters)
+        if columns is not None:
+            chunk = chunk[[c for c in columns if c in chunk.columns]]
+        if compact:
+            chunk = compact_dtypes(chunk)
+        if len(chunk):
+            yield chunk
@@ -0,0 +1,292 @@
+"""
+Dataset Profiler
+Streams the preprocessed dataset once and saves a reusable statistics
+artifact (visa_data_profile.json next to the preprocessed CSV).
+
+Per column: null counts, approximate distinct counts (HyperLogLog), top-k
+heavy hitters, min/max, and for numeric columns mean/std/skew/kurtosis and a
+quantile grid. EDA, training (category reduction) and the web app (input
+validation) load the profile instead of rescanning the data.
+
+Usage: python dataset_profiler.py [preprocessed_csv]
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from data_loader import iter_dataset, columnar_path_for, CHUNK_SIZE
+from streaming_stats import HeavyHitters, HyperLogLog, Moments, StreamingMedian
+
+PROFILE_VERSION = 1
+PROFILE_FILENAME = 'visa_data_profile.json'
+TOP_K = 100
+QUANTILES = [0.0, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0]
+
+
+def profile_path_for(data_path):
+    """Location of the profile artifact that sits next to a preprocessed CSV"""
+    if os.path.isdir(data_path):
+        return os.path.join(os.path.dirname(os.path.abspath(data_path)), PROFILE_FILENAME)
+    return os.path.join(os.path.dirname(data_path), PROFILE_FILENAME)
+
+
+def source_fingerprint(data_path):
+    """Size/mtime stamp of the data the profile was built from"""
+    source = columnar_path_for(data_path)
+    if not os.path.isdir(source):
+        source = data_path
+    if os.path.isdir(source):
+        files = [os.path.join(root, name) for root, _, names in os.walk(source) for name in names]
+        size = sum(os.path.getsize(f) for f in files)
+        mtime = max((os.path.getmtime(f) for f in files), default=0)
+    else:
+        size = os.path.getsize(source)
+        mtime = os.path.getmtime(source)
+    return {'path': os.path.abspath(source), 'size': size, 'mtime': mtime}
+
+
+def _to_json_value(value):
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, (np.bool_,)):
+        return bool(value)
+    return value
+
+
+class ColumnProfiler:
+    def __init__(self, kind):
+        self.kind = kind
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.distinct = HyperLogLog()
+        self.top = HeavyHitters()
+        self.moments = Moments() if kind == 'numeric' else None
+        self.values = StreamingMedian() if kind == 'numeric' else None
+
+    def update(self, series):
+        self.count += len(series)
+        self.nulls += int(series.isnull().sum())
+        values = series.dropna()
+        if values.empty:
+            return
+        self.distinct.update(values)
+        if self.kind != 'datetime':
+            self.top.update(values.astype(str) if self.kind == 'categorical' else values)
+        if self.kind != 'categorical':
+            low, high = values.min(), values.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.kind == 'numeric':
+            self.moments.update(values)
+            self.values.update(values)
+
+    def merge(self, other):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+        for bound, pick in (('minimum', min), ('maximum', max)):
+            mine, theirs = getattr(self, bound), getattr(other, bound)
+            setattr(self, bound, theirs if mine is None else mine if theirs is None else pick(mine, theirs))
+        if self.kind == 'numeric':
+            self.moments.merge(other.moments)
+            self.values.merge(other.values)
+
+    def result(self, top_k=TOP_K):
+        non_null = self.count - self.nulls
+        distinct = min(self.distinct.estimate(), non_null)
+        top = self.top.top(top_k)
+        summary = {
+            'kind': self.kind,
+            'count': non_null,
+            'nulls': self.nulls,
+            'distinct': distinct,
+            # Misra-Gries counts are exact while the column fits in the summary
+            'top_exact': len(self.top.counts) < self.top.capacity and int(self.top.counts.sum()) == self.top.total,
+            'top': [[_to_json_value(v), int(c)] for v, c in top.items()],
+            'min': _to_json_value(self.minimum),
+            'max': _to_json_value(self.maximum),
+        }
+        if self.kind == 'numeric':
+            summary.update({
+                'mean': _to_json_value(self.moments.mean if self.moments.n else np.nan),
+                'std': _to_json_value(self.moments.std()),
+                'skew': _to_json_value(self.moments.skew()),
+                'kurtosis': _to_json_value(self.moments.kurtosis()),
+                'quantiles': {str(q): _to_json_value(v) for q, v in zip(QUANTILES, self.values.quantiles(QUANTILES))},
+            })
+        return summary
+
+
+def _column_kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(series):
+        return 'categorical'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    return 'categorical'
+
+
+class DatasetProfiler:
+    def __init__(self):
+        self.n_rows = 0
+        self.columns = {}
+
+    def update(self, chunk):
+        self.n_rows += len(chunk)
+        for column in chunk.columns:
+            series = chunk[column]
+            if column not in self.columns:
+                self.columns[column] = ColumnProfiler(_column_kind(series))
+            self.columns[column].update(series)
+
+    def merge(self, other):
+        self.n_rows += other.n_rows
+        for column, profiler in other.columns.items():
+            if column in self.columns:
+                self.columns[column].merge(profiler)
+            else:
+                self.columns[column] = profiler
+
+    def result(self, top_k=TOP_K):
+        return {
+            'version': PROFILE_VERSION,
+            'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'n_rows': self.n_rows,
+            'columns': {column: profiler.result(top_k) for column, profiler in self.columns.items()},
+        }
+
+
+class DatasetProfile:
+    """Read-only view of a saved profile"""
+
+    def __init__(self, data):
+        self.data = data
+        self.n_rows = data['n_rows']
+        self.columns = data['columns']
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def distinct(self, column):
+        return self.columns[column]['distinct']
+
+    def top_values(self, column, k=10):
+        """Most frequent values as a Series of counts, like value_counts().head(k)"""
+        top = self.columns[column]['top'][:k]
+        return pd.Series([c for _, c in top], index=[v for v, _ in top], name='count', dtype='int64')
+
+    def known_values(self, column):
+        """Every observed value, or None when the column has more than TOP_K values"""
+        info = self.columns[column]
+        if info['top_exact'] and info['distinct'] <= len(info['top']):
+            return {v for v, _ in info['top']}
+        return None
+
+    def value_range(self, column):
+        info = self.columns[column]
+        return info['min'], info['max']
+
+    def describe(self, column):
+        """describe()-style Series for a numeric column (quantiles from the profile)"""
+        info = self.columns[column]
+        quantiles = info['quantiles']
+        return pd.Series({
+            'count': float(info['count']),
+            'mean': info['mean'],
+            'std': info['std'],
+            'min': info['min'],
+            '25%': quantiles['0.25'],
+            '50%': quantiles['0.5'],
+            '75%': quantiles['0.75'],
+            'max': info['max'],
+        }, name=column, dtype='float64')
+
+    def missing_table(self):
+        """Missing-value table in the same shape as the preprocessing report"""
+        missing_values = pd.Series({column: info['nulls'] for column, info in self.columns.items()})
+        missing_df = pd.DataFrame({
+            'Missing Values': missing_values,
+            'Percentage': (missing_values / max(self.n_rows, 1)) * 100
+        })
+        return missing_df[missing_df['Missing Values'] > 0].sort_values('Percentage', ascending=False)
+
+
+def profile_dataset(data_path, columns=None, chunksize=CHUNK_SIZE, top_k=TOP_K):
+    """Build the profile of the dataset in one streaming pass"""
+    start_time = time.time()
+    profiler = DatasetProfiler()
+    for chunk in iter_dataset(data_path, columns=columns, chunksize=chunksize, compact=False):
+        profiler.update(chunk)
+    result = profiler.result(top_k)
+    result['source'] = source_fingerprint(data_path)
+    print(f"Profiled {profiler.n_rows:,} rows x {len(profiler.columns)} columns "
+          f"in {time.time() - start_time:.1f}s")
+    return result
+
+
+def save_profile(profile, path):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(profile, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def load_profile(path, data_path=None):
+    """Load a saved profile; None if missing, of another version, or stale for data_path"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get('version') != PROFILE_VERSION:
+        print(f"Warning: profile {path} has version {data.get('version')}, expected {PROFILE_VERSION}")
+        return None
+    if data_path is not None and os.path.exists(data_path):
+        if data.get('source') != source_fingerprint(data_path):
+            print(f"Warning: profile {path} is out of date for {data_path}")
+            return None
+    return DatasetProfile(data)
+
+
+def get_profile(data_path, path=None, rebuild=False):
+    """Load the profile for data_path, building and saving it first if needed"""
+    path = path or profile_path_for(data_path)
+    profile = None if rebuild else load_profile(path, data_path)
+    if profile is None:
+        data = profile_dataset(data_path)
+        save_profile(data, path)
+        print(f"Profile saved to: {path}")
+        profile = DatasetProfile(data)
+    return profile
+
+
+def reduction_categories(X, column, profile=None, max_unique=50, top_k=20):
+    """
+    Categories to keep when reducing a high-cardinality column, or None when
+    the column needs no reduction. Uses the profile when it covers the column.
+    """
+    if profile is not None and column in profile:
+        if profile.distinct(column) <= max_unique:
+            return None
+        return profile.top_values(column, top_k).index
+    if X[column].nunique() <= max_unique:
+        return None
+    return X[column].value_counts().head(top_k).index
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    get_profile(data_path, rebuild=True)
@@ -0,0 +1,216 @@
+"""
+EDA Aggregate Cube
+One out-of-core pass over the preprocessed dataset that stores everything the
+EDA tables and charts need, so visa_eda.py never holds the raw rows.
+
+For every grouping in GROUPINGS the cube keeps a histogram of processing_days
+(count of rows per group and whole day). Counts, sums, sums of squares, means,
+standard deviations and exact quantiles of any coarser grouping are rolled up
+from these histograms, e.g. month and year from (year, month, season).
+The same pass feeds a StreamingCorrelation (sparse one-hot sufficient
+statistics) for the correlation section, and a seeded reservoir sample of
+SAMPLE_COLUMNS backs the per-state scatter.
+"""
+
+import os
+import time
+import pickle
+import numpy as np
+import pandas as pd
+
+from data_loader import iter_dataset, CHUNK_SIZE
+from dataset_profiler import source_fingerprint
+from workload_features import day_numbers, week_numbers
+from streaming_correlation import StreamingCorrelation
+from streaming_stats import count_quantiles
+
+CUBE_FILENAME = 'visa_eda_cube.pkl'
+CUBE_VERSION = 1
+TARGET = 'processing_days'
+
+GROUPINGS = {
+    'overall': [],
+    'status': ['CASE_STATUS'],
+    'visa': ['VISA_CLASS'],
+    'full_time': ['FULL_TIME_POSITION'],
+    'employer_state': ['EMPLOYER_STATE'],
+    'worksite_state': ['WORKSITE_STATE'],
+    'calendar': ['application_year', 'application_month', 'application_season'],
+    'week': ['receive_week'],
+    'industry': ['NAICS_CODE'],
+    'soc': ['SOC_TITLE'],
+}
+
+SAMPLE_SIZE = 100000
+SAMPLE_COLUMNS = ['processing_days', 'EMPLOYER_STATE']
+
+# Columns of the correlation analysis (NAICS_CODE is a code, so one-hot encoded)
+CORRELATION_NUMERIC = ['processing_days', 'TOTAL_WORKER_POSITIONS', 'WAGE_RATE_OF_PAY_FROM', 'PREVAILING_WAGE']
+CORRELATION_CATEGORICAL = ['VISA_CLASS', 'FULL_TIME_POSITION', 'SOC_TITLE', 'NAICS_CODE']
+
+
+def cube_path_for(data_path):
+    """Location of the cube that sits next to a preprocessed CSV"""
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), CUBE_FILENAME)
+
+
+def add_week_key(chunk):
+    """Integer (Monday-based) week number of the received date"""
+    chunk['receive_week'] = week_numbers(day_numbers(chunk['RECEIVED_DATE']))
+    return chunk
+
+
+class AggregateCube:
+    def __init__(self, groupings=GROUPINGS, sample_size=SAMPLE_SIZE, seed=42):
+        self.groupings = groupings
+        self.histograms = {}
+        self.n_rows = 0
+        self.received_min = None
+        self.received_max = None
+        self.sample_size = sample_size
+        self.sample = None
+        self.rng = np.random.default_rng(seed)
+        self.correlation = None
+
+    def update(self, chunk):
+        """Fold one chunk of the preprocessed data into the cube"""
+        chunk = chunk[chunk[TARGET].notnull()]
+        if chunk.empty:
+            return
+        self.n_rows += len(chunk)
+        days = chunk[TARGET].round().astype('int64').rename(TARGET)
+
+        if 'RECEIVED_DATE' in chunk.columns:
+            low, high = chunk['RECEIVED_DATE'].min(), chunk['RECEIVED_DATE'].max()
+            self.received_min = low if self.received_min is None else min(self.received_min, low)
+            self.received_max = high if self.received_max is None else max(self.received_max, high)
+            add_week_key(chunk)
+
+        for name, dims in self.groupings.items():
+            if not all(d in chunk.columns for d in dims):
+                continue
+            keys = [chunk[d].astype(object) if isinstance(chunk[d].dtype, pd.CategoricalDtype) else chunk[d]
+                    for d in dims]
+            counts = days.groupby(keys + [days]).size()
+            if name in self.histograms:
+                counts = self.histograms[name].add(counts, fill_value=0)
+            self.histograms[name] = counts
+
+        self._update_sample(chunk)
+        self._update_correlation(chunk)
+
+    def _update_correlation(self, chunk):
+        numeric = [c for c in CORRELATION_NUMERIC if c in chunk.columns]
+        categorical = [c for c in CORRELATION_CATEGORICAL if c in chunk.columns]
+        if self.correlation is None:
+            self.correlation = StreamingCorrelation(numeric, categorical)
+        self.correlation.update(chunk[numeric + categorical])
+
+    def _update_sample(self, chunk):
+        """Reservoir sampling with random keys: keep the rows with the smallest keys"""
+        columns = [c for c in SAMPLE_COLUMNS if c in chunk.columns]
+        rows = chunk[columns].copy()
+        for col in rows.columns:
+            if isinstance(rows[col].dtype, pd.CategoricalDtype):
+                rows[col] = rows[col].astype(object)
+        rows['_key'] = self.rng.random(len(rows))
+        if self.sample is not None:
+            rows = pd.concat([self.sample, rows], ignore_index=True)
+        self.sample = rows.nsmallest(self.sample_size, '_key').reset_index(drop=True)
+
+    def _grouping_for(self, dims):
+        for name, grouping_dims in self.groupings.items():
+            if name in self.histograms and all(d in grouping_dims for d in dims):
+                return name
+        raise KeyError(f"No grouping in the cube covers {dims}")
+
+    def covers(self, dims):
+        """True if some grouping in the cube can be rolled up to dims"""
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        try:
+            self._grouping_for(dims)
+            return True
+        except KeyError:
+            return False
+
+    def histogram(self, dims=()):
+        """Counts per (dims..., processing_days), rolled up from the finest grouping"""
+        dims = list(dims)
+        counts = self.histograms[self._grouping_for(dims)]
+        return counts.groupby(level=dims + [TARGET]).sum()
+
+    def rollup(self, dims):
+        """count / sum / sumsq / mean / median / std of processing_days per group"""
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        counts = self.histogram(dims)
+        values = counts.index.get_level_values(TARGET).values.astype('float64')
+        frame = pd.DataFrame({
+            'count': counts.values,
+            'sum': counts.values * values,
+            'sumsq': counts.values * values ** 2,
+        }, index=counts.index)
+        stats = frame.groupby(level=dims).sum()
+        stats['mean'] = stats['sum'] / stats['count']
+        variance = (stats['sumsq'] - stats['sum'] ** 2 / stats['count']) / (stats['count'] - 1)
+        stats['std'] = np.sqrt(variance.clip(lower=0)).where(stats['count'] > 1)
+        stats['median'] = counts.groupby(level=dims).apply(lambda c: count_quantiles(c.droplevel(dims), 0.5))
+        stats['count'] = stats['count'].astype('int64')
+        return stats
+
+    def distribution(self):
+        """Overall processing_days histogram as a Series of counts by day"""
+        return self.histogram(())
+
+    def quantile(self, q):
+        return count_quantiles(self.distribution(), q)
+
+    def box_stats(self, label=''):
+        """Box plot statistics (1.5 IQR whiskers) for Axes.bxp, from the histogram"""
+        counts = self.distribution()
+        counts = counts[counts > 0].sort_index()
+        values = counts.index.values.astype('float64')
+        q1, median, q3 = (count_quantiles(counts, q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+        return {
+            'label': label, 'med': median, 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': values[(values < inside.min()) | (values > inside.max())],
+        }
+
+    def sample_frame(self, n=None):
+        sample = self.sample.drop(columns='_key')
+        return sample if n is None else sample.head(n)
+
+
+def build_cube(data_path, chunksize=CHUNK_SIZE):
+    """Build the cube in one pass over the dataset"""
+    start_time = time.time()
+    columns = ['RECEIVED_DATE', TARGET]
+    for dims in GROUPINGS.values():
+        columns += [d for d in dims if d not in columns and d != 'receive_week']
+    columns += [c for c in SAMPLE_COLUMNS + CORRELATION_NUMERIC + CORRELATION_CATEGORICAL if c not in columns]
+
+    cube = AggregateCube()
+    for chunk in iter_dataset(data_path, columns=columns, chunksize=chunksize):
+        cube.update(chunk)
+    print(f"Aggregate cube built from {cube.n_rows:,} rows in {time.time() - start_time:.1f}s")
+    return cube
+
+
+def get_cube(data_path, path=None, rebuild=False):
+    """Load the saved cube for data_path, rebuilding it if missing or stale"""
+    path = path or cube_path_for(data_path)
+    fingerprint = source_fingerprint(data_path)
+    if not rebuild and os.path.exists(path):
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+        if saved.get('version') == CUBE_VERSION and saved.get('source') == fingerprint:
+            print(f"Aggregate cube loaded from {path}")
+            return saved['cube']
+
+    cube = build_cube(data_path)
+    with open(path, 'wb') as f:
+        pickle.dump({'version': CUBE_VERSION, 'source': fingerprint, 'cube': cube}, f)
+    print(f"Aggregate cube saved to: {path}")
+    return cube
@@ -0,0 +1,167 @@
+"""
+EDA Report
+Headless batch run of the analysis sections, collected into one static report.
+
+The aggregate cube and profile are built (or loaded) once, then every section
+of visa_eda.SECTIONS plus the model diagnostics runs in its own worker process
+with the Agg backend. Each section writes its figures (.png) and tables (.csv)
+to output_dir/<section>/ and its printed output is captured; report.html links
+everything in section order.
+
+Model diagnostics use the test set predictions that visa_model.py saves when
+run with VISA_REPORT_DIR=<output_dir>/model; the section is skipped without them.
+
+Usage: python eda_report.py [preprocessed_csv] [output_dir]
+"""
+
+import os
+import io
+import sys
+import html
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+from dataset_profiler import get_profile
+from eda_cube import get_cube
+from plot_utils import finish_figure, save_table, model_diagnostics_figure
+import visa_eda
+
+REPORT_FILENAME = 'report.html'
+MODEL_SECTION = 'model'
+PREDICTIONS_FILENAME = 'model_predictions.npz'
+MAX_TABLE_ROWS = 25
+MAX_WORKERS = None  # defaults to one worker per CPU
+
+
+def model_diagnostics(output_dir):
+    """Diagnostics figure and error tables from the saved test set predictions"""
+    path = os.path.join(output_dir, PREDICTIONS_FILENAME)
+    if not os.path.exists(path):
+        print(f"No model predictions at {path}; run visa_model.py with VISA_REPORT_DIR={output_dir}")
+        return
+    with np.load(path, allow_pickle=False) as data:
+        y_test, y_pred = data['y_test'], data['y_pred']
+        model_name = str(data['model_name'])
+        visa_class = data['visa_class']
+
+    errors = y_test - y_pred
+    metrics = pd.Series({
+        'model': model_name,
+        'test_samples': len(y_test),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'r2': float(1 - (errors ** 2).sum() / ((y_test - y_test.mean()) ** 2).sum()),
+    }, name='value')
+    print(f"Model diagnostics for {model_name}:")
+    print(metrics.to_string())
+    save_table(metrics.to_frame(), 'test_metrics', output_dir)
+
+    fig = model_diagnostics_figure(y_test, y_pred, model_name)
+    finish_figure(fig, 'model_diagnostics', output_dir)
+
+    if len(visa_class) == len(y_test):
+        class_errors = pd.DataFrame({'VISA_CLASS': visa_class, 'abs_error': np.abs(errors)}).groupby(
+            'VISA_CLASS')['abs_error'].agg(['mean', 'median', 'count']).sort_values('count', ascending=False)
+        save_table(class_errors, 'visa_class_errors', output_dir)
+
+
+def run_section(name, data_path, output_dir):
+    """Run one section in a worker: save its outputs and capture what it prints"""
+    section_dir = os.path.join(output_dir, name)
+    os.makedirs(section_dir, exist_ok=True)
+    log = io.StringIO()
+    start_time = time.time()
+    error = None
+    with contextlib.redirect_stdout(log):
+        try:
+            if name == MODEL_SECTION:
+                model_diagnostics(section_dir)
+            else:
+                # Both are already cached next to the data by the parent process
+                cube = get_cube(data_path)
+                profile = get_profile(data_path)
+                dict(visa_eda.SECTIONS)[name](cube, profile, section_dir)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Error: {error}")
+
+    files = sorted(os.listdir(section_dir))
+    return {
+        'name': name,
+        'seconds': time.time() - start_time,
+        'log': log.getvalue(),
+        'error': error,
+        'figures': [f for f in files if f.endswith('.png')],
+        'tables': [f for f in files if f.endswith('.csv')],
+    }
+
+
+def write_report(results, output_dir, title='Visa Processing Time Analysis'):
+    """Static HTML page with every section's log, figures and tables"""
+    parts = [f"<html><head><meta charset='utf-8'><title>{title}</title>",
+             "<style>body{font-family:sans-serif;margin:2em} pre{background:#f4f4f4;padding:1em;"
+             "overflow-x:auto} table{border-collapse:collapse;font-size:12px;margin-bottom:1em}"
+             " td,th{border:1px solid #ccc;padding:2px 6px} img{max-width:100%}</style></head><body>",
+             f"<h1>{title}</h1>", "<ul>"]
+    parts += [f"<li><a href='#{r['name']}'>{r['name']}</a> ({r['seconds']:.1f}s)"
+              f"{' - failed' if r['error'] else ''}</li>" for r in results]
+    parts.append("</ul>")
+
+    for r in results:
+        parts.append(f"<h2 id='{r['name']}'>{r['name']}</h2>")
+        if r['log'].strip():
+            parts.append(f"<pre>{html.escape(r['log'])}</pre>")
+        for figure in r['figures']:
+            parts.append(f"<img src='{r['name']}/{figure}' alt='{figure}'>")
+        for table in r['tables']:
+            frame = pd.read_csv(os.path.join(output_dir, r['name'], table), index_col=0)
+            parts.append(f"<h3>{table[:-4]}</h3>")
+            if len(frame) > MAX_TABLE_ROWS:
+                parts.append(f"<p>First {MAX_TABLE_ROWS} of {len(frame)} rows "
+                             f"(<a href='{r['name']}/{table}'>full table</a>)</p>")
+            parts.append(frame.head(MAX_TABLE_ROWS).to_html(float_format=lambda v: f'{v:.3f}'))
+    parts.append("</body></html>")
+
+    path = os.path.join(output_dir, REPORT_FILENAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+    return path
+
+
+def build_report(data_path, output_dir, max_workers=MAX_WORKERS):
+    """Run every section in parallel and write output_dir/report.html"""
+    start_time = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Build or refresh the shared artifacts once, before the workers load them
+    cube = get_cube(data_path)
+    get_profile(data_path)
+    print(f"Dataset summarized: {cube.n_rows} records")
+
+    names = [name for name, _ in visa_eda.SECTIONS] + [MODEL_SECTION]
+    max_workers = max_workers or min(len(names), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_section, name, data_path, output_dir) for name in names]
+        results = [future.result() for future in futures]
+
+    for r in results:
+        status = 'failed' if r['error'] else f"{len(r['figures'])} figures, {len(r['tables'])} tables"
+        print(f"  {r['name']:<14} {r['seconds']:6.1f}s  {status}")
+
+    path = write_report(results, output_dir)
+    print(f"Report with {len(results)} sections written to {path} "
+          f"in {time.time() - start_time:.1f}s ({max_workers} workers)")
+    return path
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(data_path)), 'eda_report')
+    build_report(data_path, output_dir)
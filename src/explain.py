@@ -0,0 +1,113 @@
+"""
+Prediction Explanations
+Splits a forest's prediction into a baseline plus one contribution per input
+field, by following each tree's decision path (as treeinterpreter does).
+
+Every split moves the prediction from the parent node's mean to the child's
+mean; that change is credited to the feature the parent split on. The changes
+are computed once per model and kept in one sparse (all nodes x encoded
+columns) matrix, so explaining a batch is a single decision_path() call (the
+same traversal as predict) and one sparse product, for every tree and row at
+once. The one-hot columns of a categorical field are then summed back into
+that field, so contributions are reported per original input column:
+
+    prediction = baseline + sum(contributions)
+
+Works for RandomForestRegressor / ExtraTreesRegressor and single regression
+trees, after the one-hot preprocessor of feature_matrix.build_preprocessor.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from feature_matrix import FOREST_MODELS, TREE_MODELS
+
+TOP_FIELDS = 5
+
+
+def supports_explanations(pipeline):
+    """True for a fitted pipeline ending in a forest or a single regression tree"""
+    return hasattr(pipeline, 'steps') and isinstance(pipeline.steps[-1][1], FOREST_MODELS + TREE_MODELS)
+
+
+def node_deltas(tree):
+    """(nodes x features) sparse matrix: the change in mean value a node adds, under its parent's split feature"""
+    tree = tree.tree_
+    values = tree.value[:, 0, 0]
+    parent = np.full(tree.node_count, -1)
+    internal = np.flatnonzero(tree.children_left >= 0)
+    parent[tree.children_left[internal]] = internal
+    parent[tree.children_right[internal]] = internal
+    children = np.flatnonzero(parent >= 0)
+    return sparse.csr_matrix(
+        (values[children] - values[parent[children]], (children, tree.feature[parent[children]])),
+        shape=(tree.node_count, tree.n_features))
+
+
+def encoded_fields(preprocessor):
+    """Input field of every encoded column of a fitted ColumnTransformer (one-hot columns map to their field)"""
+    fields = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder' or transformer == 'drop':
+            continue
+        steps = getattr(transformer, 'named_steps', {})
+        if 'onehot' in steps:
+            for column, categories in zip(columns, steps['onehot'].categories_):
+                fields += [column] * len(categories)
+        else:
+            fields += list(columns)
+    return fields
+
+
+class ForestExplainer:
+    def __init__(self, pipeline):
+        if not supports_explanations(pipeline):
+            raise ValueError("Explanations need a pipeline ending in a forest or a regression tree")
+        self.pipeline = pipeline
+        self.model = pipeline.steps[-1][1]
+        trees = self.model.estimators_ if isinstance(self.model, FOREST_MODELS) else [self.model]
+
+        # Node deltas of every tree stacked in decision_path() column order, averaged over trees
+        self.deltas = sparse.vstack([node_deltas(tree) for tree in trees]).tocsr() / len(trees)
+        self.baseline = float(np.mean([tree.tree_.value[0, 0, 0] for tree in trees]))
+
+        fields = encoded_fields(pipeline.steps[0][1])
+        self.fields = list(dict.fromkeys(fields))
+        index = {field: i for i, field in enumerate(self.fields)}
+        self.field_matrix = sparse.csr_matrix(
+            (np.ones(len(fields)), (np.arange(len(fields)), [index[f] for f in fields])),
+            shape=(len(fields), len(self.fields)))
+
+    def contributions(self, X):
+        """(rows x input fields) DataFrame of contributions; each row sums to prediction - baseline"""
+        encoded = self.pipeline[:-1].transform(X)
+        paths = self.model.decision_path(encoded)
+        if isinstance(paths, tuple):
+            paths = paths[0]
+        by_column = paths @ self.deltas
+        by_field = sparse.csr_matrix(by_column) @ self.field_matrix
+        return pd.DataFrame(by_field.toarray(), columns=self.fields, index=getattr(X, 'index', None))
+
+    def explain(self, X, top=TOP_FIELDS, fixed=()):
+        """
+        Per row: baseline, prediction and the `top` fields with the largest contributions.
+        Fields in `fixed` have the same value for every request, so they are not ranked
+        as drivers; their total is reported separately under 'fixed_features'.
+        """
+        contributions = self.contributions(X)
+        fixed = [field for field in fixed if field in contributions.columns]
+        explanations = []
+        for _, row in contributions.iterrows():
+            ranked = row.drop(fixed)
+            largest = ranked.abs().sort_values(ascending=False).head(top).index
+            explanation = {
+                'baseline': round(self.baseline, 1),
+                'prediction': round(self.baseline + float(row.sum()), 1),
+                'contributions': [{'feature': field, 'days': round(float(row[field]), 1)} for field in largest],
+                'other_features': round(float(ranked.drop(largest).sum()), 1),
+            }
+            if fixed:
+                explanation['fixed_features'] = {'features': fixed, 'days': round(float(row[fixed].sum()), 1)}
+            explanations.append(explanation)
+        return explanations
@@ -0,0 +1,125 @@
+"""
+Feature Matrix
+Preprocessing of the training scripts, as a dense or sparse matrix.
+
+- dense:  the original layout, one-hot columns in a dense float64 matrix
+- sparse: the one-hot block stays CSR and every value is float32 (numeric
+          columns are cast after scaling), a small fraction of the dense size
+
+Both layouts keep the 'num' / 'cat' / 'onehot' step names that the apps
+inspect. Estimators whose tags say they cannot take sparse input get a
+densify step in front of them (dense float32), and so do tree models: they
+accept CSR but split a dense float32 matrix several times faster, and
+convert their input to float32 anyway.
+
+native_categorical_model() is the alternative to one-hot encoding: categorical
+columns become ordinal codes (step 'ordinal') and HistGradientBoostingRegressor
+splits on them natively, so a column can keep up to NATIVE_MAX_CATEGORIES
+levels (one code per histogram bin) without widening the matrix.
+"""
+
+import numpy as np
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import (HistGradientBoostingRegressor, RandomForestRegressor, ExtraTreesRegressor,
+                              GradientBoostingRegressor)
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+from sklearn.tree import DecisionTreeRegressor, ExtraTreeRegressor
+
+# Levels kept per categorical column for native categorical splits; leaves room
+# for 'Other' within the 255 category bins of HistGradientBoostingRegressor
+NATIVE_MAX_CATEGORIES = 250
+
+# Tree models by their public classes (sklearn's base classes are private)
+FOREST_MODELS = (RandomForestRegressor, ExtraTreesRegressor)
+TREE_MODELS = (DecisionTreeRegressor, ExtraTreeRegressor)
+
+
+def build_preprocessor(numerical_cols, categorical_cols, sparse_output=False):
+    """Imputation and scaling of numeric columns, one-hot encoding of categorical ones"""
+    numerical_steps = [
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ]
+    if sparse_output:
+        numerical_steps.append(('float32', FunctionTransformer(
+            np.asarray, kw_args={'dtype': np.float32}, feature_names_out='one-to-one')))
+    numerical_transformer = Pipeline(steps=numerical_steps)
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=sparse_output,
+                                 dtype=np.float32 if sparse_output else np.float64))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', numerical_transformer, numerical_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ],
+        sparse_threshold=1.0 if sparse_output else 0.0)
+
+
+def build_ordinal_preprocessor(numerical_cols, categorical_cols):
+    """Numeric columns as they are (trees need no scaling, NaN stays missing), categorical as codes"""
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        # Unseen categories become NaN, i.e. missing for the native splits; levels
+        # beyond NATIVE_MAX_CATEGORIES share one infrequent code
+        ('ordinal', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan,
+                                   max_categories=NATIVE_MAX_CATEGORIES + 1))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', 'passthrough', numerical_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ])
+
+
+def native_categorical_model(numerical_cols, categorical_cols, **params):
+    """Ordinal encoding + HistGradientBoostingRegressor with native categorical splits"""
+    params = {'max_iter': 300, 'random_state': 42, **params}
+    categorical_features = [False] * len(numerical_cols) + [True] * len(categorical_cols)
+    return Pipeline(steps=[
+        ('preprocessor', build_ordinal_preprocessor(numerical_cols, categorical_cols)),
+        ('regressor', HistGradientBoostingRegressor(categorical_features=categorical_features, **params))
+    ])
+
+
+def category_encoder(pipeline):
+    """The fitted OneHotEncoder or OrdinalEncoder of a pipeline's categorical columns"""
+    steps = pipeline.named_steps['preprocessor'].named_transformers_['cat'].named_steps
+    return steps['onehot'] if 'onehot' in steps else steps['ordinal']
+
+
+def accepts_sparse(estimator):
+    """True if the estimator's tags allow sparse input"""
+    try:
+        return bool(estimator.__sklearn_tags__().input_tags.sparse)
+    except AttributeError:
+        return False
+
+
+def prefers_dense(estimator):
+    """True if the estimator needs dense input or, like tree models, fits much faster on it"""
+    return not accepts_sparse(estimator) or isinstance(
+        estimator, TREE_MODELS + FOREST_MODELS + (GradientBoostingRegressor,))
+
+
+def densify(X):
+    """Dense float32 copy of a sparse matrix (dense input is returned as is)"""
+    return X.toarray() if sparse.issparse(X) else X
+
+
+def densify_step():
+    return 'densify', FunctionTransformer(densify, accept_sparse=True)
+
+
+def matrix_nbytes(X):
+    """Memory held by a dense array or a CSR/CSC matrix"""
+    if sparse.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return np.asarray(X).nbytes
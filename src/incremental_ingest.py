@@ -0,0 +1,270 @@
+"""
+Incremental Ingestion
+Adds newly published LCA disclosure files to the partitioned Parquet store
+without reprocessing history.
+
+- A manifest (_ingest_manifest.json in the dataset directory) records every
+  ingested source file by content hash; unchanged files are skipped and a
+  changed file replaces only its own parts.
+- A case index (_case_index.parquet) maps CASE_NUMBER to its latest
+  DECISION_DATE and the source/partition holding it. Amended cases keep the
+  latest decision: older rows are dropped from the new data, or deleted from
+  the (few) existing partition files that hold them.
+- New files go through the same streaming stages as visa_streaming.py.
+
+Work per refresh is proportional to the new files plus the partitions they
+touch; the index itself is loaded and saved once per run.
+Files whose names start with '_' are ignored by the Parquet dataset readers.
+"""
+
+import os
+import re
+import glob
+import json
+import hashlib
+from datetime import datetime
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from columnar_store import PartitionedWriter, add_fiscal_year
+from visa_streaming import compute_fill_statistics, transform_chunk
+from visa_preprocessing import source_name, CHUNK_SIZE
+
+RAW_DIR = '/content/drive/MyDrive/lca_disclosure'
+DATASET_DIR = '/content/drive/MyDrive/visa_data_parquet'
+MANIFEST_NAME = '_ingest_manifest.json'
+CASE_INDEX_NAME = '_case_index.parquet'
+
+INDEX_COLUMNS = ['DECISION_DATE', 'source', 'fiscal_year', 'VISA_CLASS']
+PART_NAME = re.compile(r'^(?P<source>.*?)(?:-w\d{3})?-\d{5}-\d+\.parquet$')
+
+
+def file_sha256(path, block_size=16 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    temp_path = path + '.tmp'
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def load_manifest(dataset_dir):
+    path = os.path.join(dataset_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {'sources': {}}
+
+
+def save_manifest(dataset_dir, manifest):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(os.path.join(dataset_dir, MANIFEST_NAME), write)
+
+
+def _part_location(dataset_dir, path):
+    """(source, fiscal_year, VISA_CLASS) of a part file from its path"""
+    relative = os.path.relpath(path, dataset_dir).split(os.sep)
+    keys = dict(unquote(segment).split('=', 1) for segment in relative[:-1])
+    match = PART_NAME.match(relative[-1])
+    source = match.group('source') if match else relative[-1]
+    return source, int(keys['fiscal_year']), keys['VISA_CLASS']
+
+
+def rebuild_case_index(dataset_dir):
+    """Build the case index by scanning CASE_NUMBER/DECISION_DATE of every part"""
+    frames = []
+    for path in glob.glob(os.path.join(dataset_dir, 'fiscal_year=*', 'VISA_CLASS=*', '*.parquet')):
+        source, fiscal_year, visa_class = _part_location(dataset_dir, path)
+        table = pq.read_table(path, columns=['CASE_NUMBER', 'DECISION_DATE'])
+        frame = table.to_pandas()
+        frame['source'] = source
+        frame['fiscal_year'] = fiscal_year
+        frame['VISA_CLASS'] = visa_class
+        frames.append(frame)
+    if not frames:
+        return empty_index()
+    index = pd.concat(frames, ignore_index=True)
+    index = index.sort_values('DECISION_DATE', kind='stable').drop_duplicates('CASE_NUMBER', keep='last')
+    return index.set_index('CASE_NUMBER')[INDEX_COLUMNS]
+
+
+def empty_index():
+    index = pd.DataFrame({
+        'CASE_NUMBER': pd.Series(dtype=object),
+        'DECISION_DATE': pd.Series(dtype='datetime64[ns]'),
+        'source': pd.Series(dtype=object),
+        'fiscal_year': pd.Series(dtype='int32'),
+        'VISA_CLASS': pd.Series(dtype=object),
+    })
+    return index.set_index('CASE_NUMBER')
+
+
+def load_case_index(dataset_dir):
+    path = os.path.join(dataset_dir, CASE_INDEX_NAME)
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    if glob.glob(os.path.join(dataset_dir, 'fiscal_year=*')):
+        print("Case index not found; rebuilding from the existing dataset...")
+        return rebuild_case_index(dataset_dir)
+    return empty_index()
+
+
+def save_case_index(dataset_dir, index):
+    _write_atomic(os.path.join(dataset_dir, CASE_INDEX_NAME),
+                  lambda path: index.to_parquet(path))
+
+
+def remove_cases(dataset_dir, superseded):
+    """Delete superseded rows from the partition files that hold them"""
+    rewritten = 0
+    for (source, fiscal_year, visa_class), group in superseded.groupby(['source', 'fiscal_year', 'VISA_CLASS']):
+        cases = pa.array(group.index.astype(str).unique())
+        pattern = os.path.join(dataset_dir, f'fiscal_year={fiscal_year}', 'VISA_CLASS=*', f'{source}-*.parquet')
+        for path in glob.glob(pattern):
+            if _part_location(dataset_dir, path) != (source, fiscal_year, visa_class):
+                continue
+            table = pq.read_table(path, partitioning=None)
+            keep = pc.invert(pc.is_in(table['CASE_NUMBER'], value_set=cases))
+            if pc.all(keep).as_py():
+                continue
+            filtered = table.filter(keep)
+            if filtered.num_rows == 0:
+                os.remove(path)
+            else:
+                _write_atomic(path, lambda temp: pq.write_table(filtered, temp))
+            rewritten += 1
+    return rewritten
+
+
+def _lookup(known, cases):
+    """Index rows for the cases present in `known` (hash lookups, O(len(cases)))"""
+    positions = known.index.get_indexer(cases)
+    found = positions >= 0
+    return found, known.iloc[positions[found]]
+
+
+def ingest_file(raw_path, dataset_dir, index, chunksize=CHUNK_SIZE):
+    """
+    Preprocess one raw file into the dataset, deduplicating against the index.
+    Returns (updated index, rows written, older amendments dropped,
+    partition files rewritten, raw rows read).
+    """
+    name = source_name(raw_path)
+    stats = compute_fill_statistics(raw_path, chunksize)
+    fill_values = stats.fill_values()
+    dtypes = stats.read_dtypes()
+
+    # A changed file replaces all of its own previous parts
+    writer = PartitionedWriter(dataset_dir, name, replace=True)
+    index = index[index['source'] != name]
+
+    added = empty_index()
+    superseded = []
+    rows_dropped = 0
+    rewritten = 0
+
+    for chunk in pd.read_csv(raw_path, chunksize=chunksize, dtype=dtypes, low_memory=False):
+        chunk = transform_chunk(chunk, fill_values)
+        add_fiscal_year(chunk)
+
+        # Latest decision wins within the chunk
+        chunk = chunk.sort_values('DECISION_DATE', kind='stable').drop_duplicates('CASE_NUMBER', keep='last')
+
+        entries = pd.DataFrame({
+            'DECISION_DATE': chunk['DECISION_DATE'].values,
+            'source': name,
+            'fiscal_year': chunk['fiscal_year'].values,
+            'VISA_CLASS': chunk['VISA_CLASS'].fillna('Unknown').astype(str).values,
+        }, index=pd.Index(chunk['CASE_NUMBER'].astype(str).values, name='CASE_NUMBER'))
+
+        # Earlier chunks of this file take precedence over history
+        in_run, previous_run = _lookup(added, entries.index)
+        in_history, previous_history = _lookup(index, entries.index[~in_run])
+        previous = pd.concat([previous_run, previous_history])
+        if len(previous):
+            decision = entries['DECISION_DATE'].reindex(previous.index)
+            newer = (decision.values >= previous['DECISION_DATE'].values) | previous['DECISION_DATE'].isnull().values
+            stale = previous.index[~newer]
+            if len(stale):
+                rows_dropped += len(stale)
+                keep = ~entries.index.isin(stale)
+                chunk = chunk[keep]
+                entries = entries[keep]
+            previous = previous[newer]
+            # Rows from this file must go before the newer rows are written
+            # beside them; history is rewritten once at the end
+            from_run = previous.index.isin(previous_run.index)
+            if from_run.any():
+                rewritten += remove_cases(dataset_dir, previous[from_run])
+            superseded.append(previous[~from_run])
+
+        writer.write(chunk)
+        added = pd.concat([added[~added.index.isin(entries.index)], entries])
+
+    if superseded:
+        rewritten += remove_cases(dataset_dir, pd.concat(superseded))
+
+    index = pd.concat([index[~index.index.isin(added.index)], added])
+    return index, writer.rows, rows_dropped, rewritten, stats.n_rows
+
+
+def discover_sources(raw_dir):
+    return sorted(glob.glob(os.path.join(raw_dir, '*.csv')))
+
+
+def ingest(raw_paths=None, dataset_dir=DATASET_DIR, chunksize=CHUNK_SIZE):
+    """Ingest every new or changed raw file into the dataset"""
+    if raw_paths is None:
+        raw_paths = discover_sources(RAW_DIR)
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    manifest = load_manifest(dataset_dir)
+    index = None
+
+    for raw_path in raw_paths:
+        name = source_name(raw_path)
+        digest = file_sha256(raw_path)
+        entry = manifest['sources'].get(name)
+        if entry and entry['sha256'] == digest:
+            print(f"Skipping {name}: already ingested")
+            continue
+
+        if index is None:
+            index = load_case_index(dataset_dir)
+        action = 'Re-ingesting changed' if entry else 'Ingesting new'
+        print(f"{action} file {name}...")
+
+        index, rows, dropped, rewritten, rows_in = ingest_file(raw_path, dataset_dir, index, chunksize)
+        print(f"  {rows_in:,} raw rows -> {rows:,} rows written, "
+              f"{dropped:,} older amendments dropped, {rewritten} existing partition files rewritten")
+
+        manifest['sources'][name] = {
+            'path': os.path.abspath(raw_path),
+            'sha256': digest,
+            'raw_rows': rows_in,
+            'rows_written': rows,
+            'ingested_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        save_case_index(dataset_dir, index)
+        save_manifest(dataset_dir, manifest)
+
+    if index is None:
+        print("No new or changed files to ingest.")
+    else:
+        print(f"Case index: {len(index):,} cases")
+    return manifest
+
+
+if __name__ == '__main__':
+    ingest()
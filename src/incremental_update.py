@@ -0,0 +1,203 @@
+"""
+Incremental Update
+Refreshes the saved Random Forest with newly decided applications instead of
+retraining it on the whole dataset.
+
+The saved pipeline keeps its fitted preprocessor and the category vocabulary
+saved with it. Only decisions newer than the last update are loaded; they are
+encoded with the existing preprocessor and TREES_PER_UPDATE new trees are fitted
+on them with warm_start, so a routine refresh trains on days of data. The
+updated artifacts are registered and promoted in the model registry
+(model_registry.py), like a full retrain.
+
+Every tree's data window (first/last DECISION_DATE and row count) is recorded in
+visa_tree_window.json next to the model. Trees whose window ended more than
+WINDOW_DAYS before the newest decision are retired, and beyond MAX_TREES the
+oldest trees go first. retrain_model.py writes the window of a full retrain.
+
+Usage: python incremental_update.py [preprocessed_csv] [artifacts_dir] [last_decision_date]
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from data_loader import load_dataset
+from feature_matrix import FOREST_MODELS
+from category_vocab import CategoryVocabulary, VOCAB_FILENAME
+from workload_features import WORKLOAD_FEATURES, WORKLOAD_FILENAME, get_workload_table, add_workload_features
+from model_registry import register, promote, BENCHMARK_ROWS
+
+MODEL_FILENAME = 'visa_processing_model_Random_Forest.pkl'
+FEATURES_FILENAME = 'visa_features.pkl'
+SUMMARY_FILENAME = 'model_summary.json'
+WINDOW_FILENAME = 'visa_tree_window.json'
+WINDOW_VERSION = 1
+
+TREES_PER_UPDATE = 10
+WINDOW_DAYS = 365   # retire trees whose newest decision is older than this
+MAX_TREES = 300     # hard cap on the forest size, oldest trees retired first
+MIN_NEW_ROWS = 500  # fewer new decisions than this wait for the next refresh
+
+# Register the updated artifacts as a new version in artifacts_dir/model_registry
+# and promote it, as retrain_model.py does, so the refresh reaches serving
+REGISTER_MODEL = True
+
+
+def _date(value):
+    return None if value is None else pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def data_window(decision_dates, rows=None):
+    """Window record of the decisions a tree was trained on"""
+    return {
+        'first_decision': _date(decision_dates.min()),
+        'last_decision': _date(decision_dates.max()),
+        'rows': int(len(decision_dates) if rows is None else rows),
+        'trained_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def save_tree_window(path, trees):
+    """One window record per tree, in the order of the forest's estimators_"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': WINDOW_VERSION, 'trees': trees}, f, indent=1)
+
+
+def load_tree_window(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    if saved.get('version') != WINDOW_VERSION:
+        raise ValueError(f"Unsupported tree window version in {path}")
+    return saved['trees']
+
+
+def retire_trees(forest, trees, newest_decision, window_days=WINDOW_DAYS, max_trees=MAX_TREES):
+    """Drop trees that fell out of the window (and the oldest beyond max_trees); returns the kept records"""
+    cutoff = _date(pd.Timestamp(newest_decision) - pd.Timedelta(days=window_days))
+    keep = [i for i, tree in enumerate(trees) if tree['last_decision'] >= cutoff]
+    keep = keep[-max_trees:]
+    forest.estimators_ = [forest.estimators_[i] for i in keep]
+    forest.n_estimators = len(forest.estimators_)
+    return [trees[i] for i in keep]
+
+
+def load_new_decisions(data_path, features, since, artifacts_dir):
+    """Rows decided after `since`, with the workload features the model uses"""
+    columns = ['RECEIVED_DATE', 'DECISION_DATE'] + [f for f in features if f not in WORKLOAD_FEATURES]
+    df = load_dataset(data_path, columns=list(dict.fromkeys(columns + ['processing_days'])),
+                      filters=[('DECISION_DATE', '>', pd.Timestamp(since))])
+    if len(df) and any(f in WORKLOAD_FEATURES for f in features):
+        table = get_workload_table(data_path, path=os.path.join(artifacts_dir, WORKLOAD_FILENAME))
+        add_workload_features(df, table)
+    return df
+
+
+def update(data_path, artifacts_dir, since=None, trees_per_update=TREES_PER_UPDATE,
+           window_days=WINDOW_DAYS, max_trees=MAX_TREES, min_rows=MIN_NEW_ROWS,
+           register_model=REGISTER_MODEL):
+    """
+    Add trees trained on the decisions since the last update and retire old ones.
+    since (a date) is only needed for a model saved without a tree window; its
+    trees are then recorded as covering decisions up to that date.
+    """
+    model_path = os.path.join(artifacts_dir, MODEL_FILENAME)
+    window_path = os.path.join(artifacts_dir, WINDOW_FILENAME)
+    vocab_path = os.path.join(artifacts_dir, VOCAB_FILENAME)
+    if not os.path.exists(model_path):
+        print(f"Error: Model file not found at {model_path}; run retrain_model.py first")
+        return None
+
+    pipeline = joblib.load(model_path)
+    forest = pipeline.steps[-1][1]
+    if not isinstance(forest, FOREST_MODELS):
+        print(f"Error: Incremental updates need a tree ensemble, found {type(forest).__name__}")
+        return None
+    with open(os.path.join(artifacts_dir, FEATURES_FILENAME), 'rb') as f:
+        features = [name for name in pickle.load(f) if name != 'processing_days']
+    vocabulary = CategoryVocabulary.load(vocab_path) if os.path.exists(vocab_path) else CategoryVocabulary()
+
+    trees = load_tree_window(window_path)
+    if trees is None or len(trees) != len(forest.estimators_):
+        if since is None:
+            print(f"Error: No tree window for this model at {window_path}; "
+                  f"retrain with retrain_model.py or pass the last decision date it was trained on")
+            return None
+        print(f"Warning: No tree window for this model; its trees are taken to cover decisions up to {_date(since)}")
+        trees = [{'first_decision': None, 'last_decision': _date(since), 'rows': None, 'trained_at': None}
+                 for _ in forest.estimators_]
+    since = max(t['last_decision'] for t in trees)
+
+    print(f"Loading decisions after {since}...")
+    df = load_new_decisions(data_path, features, since, artifacts_dir)
+    if len(df) < min_rows:
+        print(f"Only {len(df):,} new decisions (minimum {min_rows:,}); model left unchanged")
+        return None
+
+    X = vocabulary.transform(df[features])
+    y = df['processing_days']
+
+    start_time = time.time()
+    # Every step before the forest: the fitted preprocessor (and densify step, if any)
+    X_encoded = pipeline[:-1].transform(X)
+    # Prequential check: error of the current model on decisions it has not seen
+    y_before = forest.predict(X_encoded)
+
+    # oob_score off: OOB rows of the retained trees are meaningless for the new decisions
+    forest.set_params(warm_start=True, oob_score=False, n_estimators=len(forest.estimators_) + trees_per_update)
+    forest.fit(X_encoded, y)
+    forest.set_params(warm_start=False)
+    trees = trees + [data_window(df['DECISION_DATE'])] * trees_per_update
+    retired = len(trees)
+    trees = retire_trees(forest, trees, df['DECISION_DATE'].max(), window_days, max_trees)
+    retired -= len(trees)
+    y_after = forest.predict(X_encoded)
+    print(f"Added {trees_per_update} trees on {len(df):,} decisions "
+          f"({_date(df['DECISION_DATE'].min())} to {_date(df['DECISION_DATE'].max())}) "
+          f"in {time.time() - start_time:.1f}s; retired {retired}, forest now has {len(trees)} trees")
+    print(f"MAE on the new decisions: {mean_absolute_error(y, y_before):.2f} before, "
+          f"{mean_absolute_error(y, y_after):.2f} after the update (in-sample)")
+
+    joblib.dump(pipeline, model_path)
+    save_tree_window(window_path, trees)
+
+    summary_path = os.path.join(artifacts_dir, SUMMARY_FILENAME)
+    summary = {}
+    if os.path.exists(summary_path):
+        with open(summary_path) as f:
+            summary = json.load(f)
+    summary.update({
+        'n_estimators': len(trees),
+        'last_update': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'last_update_rows': int(len(df)),
+        'last_update_rmse_before': float(np.sqrt(mean_squared_error(y, y_before))),
+        'data_window': [min((t['first_decision'] for t in trees if t['first_decision']), default=None),
+                        max(t['last_decision'] for t in trees)],
+    })
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Updated model saved to {model_path}")
+
+    if register_model:
+        registry_dir = os.path.join(artifacts_dir, 'model_registry')
+        version = register(artifacts_dir, X.head(BENCHMARK_ROWS), registry_dir)['version']
+        promote(version, registry_dir)
+    return pipeline
+
+
+if __name__ == '__main__':
+    from retrain_model import DATA_PATH, ARTIFACTS_DIR
+    data_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    artifacts_dir = sys.argv[2] if len(sys.argv) > 2 else ARTIFACTS_DIR
+    since = sys.argv[3] if len(sys.argv) > 3 else None
+    update(data_path, artifacts_dir, since)
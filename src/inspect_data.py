@@ -1,15 +1,16 @@
-import pandas as pd
+from data_loader import load_dataset
 
 DATA_PATH = r'c:\Users\HP\Documents\GitHub\Visa-Status-Prediction\data\visa_data_preprocessed.csv'
 
 try:
     print("Reading dataset...")
-    df = pd.read_csv(DATA_PATH)
-    
-    print(f"Total Rows: {len(df)}")
+    certified_sg = load_dataset(
+        DATA_PATH,
+        columns=['VISA_CLASS', 'CASE_STATUS', 'processing_days'],
+        filters=[('VISA_CLASS', '=', 'H-1B1 Singapore'), ('CASE_STATUS', '=', 'Certified')]
+    )
     
     print("\nMean Processing Days for H-1B1 Singapore (Certified Only):")
-    certified_sg = df[(df['VISA_CLASS'] == 'H-1B1 Singapore') & (df['CASE_STATUS'] == 'Certified')]
     print(certified_sg['processing_days'].mean())
     print(f"Count: {len(certified_sg)}")
 
@@ -0,0 +1,306 @@
+"""
+Model Registry
+Immutable, content-hashed versions of the serving artifacts, each with its
+serving cost measured when it is registered.
+
+    registry_dir/
+        versions/<version>/   read-only copies of the artifacts + version.json
+        CURRENT               id of the promoted version (app.py serves it)
+        history.json          promoted versions in order, for rollback
+
+The version id is the SHA-256 of the artifact names and contents, so the same
+artifacts always map to the same version and registering them again is a
+no-op. At registration the model is benchmarked in a fresh worker process:
+load time, resident memory added by loading the model, single-row p50 / p99
+latency and batch throughput.
+
+promote() refuses a version whose p99 latency or memory is over MAX_P99_MS /
+MAX_MEMORY_MB. rollback() points CURRENT back at the previously promoted
+version; nothing is copied, and the app switches on its next request.
+
+Usage: python model_registry.py register [artifacts_dir] [preprocessed_csv]
+       python model_registry.py promote <version>
+       python model_registry.py rollback
+       python model_registry.py list
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import pickle
+import shutil
+import hashlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from data_loader import load_dataset
+from category_vocab import CategoryVocabulary, VOCAB_FILENAME
+from dataset_profiler import PROFILE_FILENAME
+from workload_features import WORKLOAD_FEATURES, WORKLOAD_FILENAME, WorkloadTable, add_workload_features
+
+REGISTRY_DIR = os.environ.get('VISA_MODEL_REGISTRY', 'model_registry')
+CURRENT_FILENAME = 'CURRENT'
+HISTORY_FILENAME = 'history.json'
+VERSION_FILENAME = 'version.json'
+
+MODEL_FILENAME = 'visa_processing_model_Random_Forest.pkl'
+FEATURES_FILENAME = 'visa_features.pkl'
+ARTIFACT_FILES = [
+    MODEL_FILENAME, 'visa_preprocessor.pkl', FEATURES_FILENAME, 'model_summary.json',
+    VOCAB_FILENAME, WORKLOAD_FILENAME, PROFILE_FILENAME, 'visa_tree_window.json',
+]
+# A version cannot be served without these (the app validates inputs against the profile)
+REQUIRED_FILES = [MODEL_FILENAME, PROFILE_FILENAME]
+
+# Serving budgets checked at promotion
+MAX_P99_MS = 100.0
+MAX_MEMORY_MB = 1024.0
+
+BENCHMARK_ROWS = 1000  # rows kept for the benchmark (and repeated up to BATCH_ROWS)
+LATENCY_CALLS = 200
+BATCH_ROWS = 10000
+
+
+def _sha256(path, block_size=16 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def artifact_hashes(artifacts_dir):
+    """SHA-256 of every artifact present in artifacts_dir (REQUIRED_FILES must all be there)"""
+    for name in REQUIRED_FILES:
+        if not os.path.exists(os.path.join(artifacts_dir, name)):
+            raise FileNotFoundError(f"Required artifact not found: {os.path.join(artifacts_dir, name)}")
+    return {name: _sha256(os.path.join(artifacts_dir, name))
+            for name in ARTIFACT_FILES if os.path.exists(os.path.join(artifacts_dir, name))}
+
+
+def version_id(hashes):
+    digest = hashlib.sha256()
+    for name in sorted(hashes):
+        digest.update(f"{name}:{hashes[name]}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def version_dir(registry_dir, version):
+    return os.path.join(registry_dir, 'versions', version)
+
+
+def load_version(registry_dir, version):
+    """version.json of a registered version"""
+    path = os.path.join(version_dir(registry_dir, version), VERSION_FILENAME)
+    if not os.path.exists(path):
+        raise KeyError(f"Unknown model version: {version}")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def benchmark_rows(data_path, artifacts_dir, n_rows=BENCHMARK_ROWS):
+    """First n_rows of the data prepared like the model's training input"""
+    with open(os.path.join(artifacts_dir, FEATURES_FILENAME), 'rb') as f:
+        features = [name for name in pickle.load(f) if name != 'processing_days']
+    df = load_dataset(data_path, columns=['RECEIVED_DATE'] + [f for f in features if f not in WORKLOAD_FEATURES],
+                      nrows=n_rows)
+    if any(f in WORKLOAD_FEATURES for f in features):
+        add_workload_features(df, WorkloadTable.load(os.path.join(artifacts_dir, WORKLOAD_FILENAME)))
+    vocab_path = os.path.join(artifacts_dir, VOCAB_FILENAME)
+    vocabulary = CategoryVocabulary.load(vocab_path) if os.path.exists(vocab_path) else CategoryVocabulary()
+    return vocabulary.transform(df[features])
+
+
+def resident_mb():
+    """Resident memory of this process in MB (None where it cannot be read)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current resident size here; kB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def benchmark_model(model_path, rows, calls=LATENCY_CALLS, batch_rows=BATCH_ROWS):
+    """Serving cost of a saved model (run in a fresh process so the load is cold)"""
+    # Modules any model pipeline needs, so their import is not counted as model memory
+    import sklearn.compose, sklearn.ensemble, sklearn.pipeline, sklearn.preprocessing  # noqa: F401
+    memory_before = resident_mb()
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    load_time = time.perf_counter() - start
+    memory_after = resident_mb()
+    memory = None if memory_before is None else memory_after - memory_before
+
+    singles = [rows.iloc[[i % len(rows)]] for i in range(calls)]
+    model.predict(singles[0])
+    latencies = []
+    for row in singles:
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = rows.iloc[np.arange(batch_rows) % len(rows)]
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_time = time.perf_counter() - start
+
+    return {
+        'load_time_s': load_time,
+        'memory_mb': memory,
+        'file_mb': os.path.getsize(model_path) / 1e6,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'batch_rows_per_s': batch_rows / batch_time,
+    }
+
+
+def register(artifacts_dir, rows, registry_dir=REGISTRY_DIR):
+    """Copy the artifacts into a new immutable version, benchmarked with rows; returns its version.json"""
+    hashes = artifact_hashes(artifacts_dir)
+    version = version_id(hashes)
+    target = version_dir(registry_dir, version)
+    if os.path.exists(target):
+        print(f"Model version {version} is already registered")
+        return load_version(registry_dir, version)
+
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        for name in hashes:
+            shutil.copy2(os.path.join(artifacts_dir, name), os.path.join(staging, name))
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            benchmark = pool.submit(benchmark_model, os.path.join(staging, MODEL_FILENAME), rows).result()
+
+        summary = {}
+        if 'model_summary.json' in hashes:
+            with open(os.path.join(staging, 'model_summary.json')) as f:
+                summary = json.load(f)
+        info = {
+            'version': version,
+            'registered_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'source': os.path.abspath(artifacts_dir),
+            'files': hashes,
+            'summary': summary,
+            'benchmark': benchmark,
+        }
+        with open(os.path.join(staging, VERSION_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        for name in os.listdir(staging):
+            os.chmod(os.path.join(staging, name), stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    print(f"Registered model version {version}: load {benchmark['load_time_s']:.2f}s, "
+          f"{benchmark['memory_mb'] or 0:.1f} MB resident, p50 {benchmark['p50_ms']:.2f} ms, p99 {benchmark['p99_ms']:.2f} ms, "
+          f"{benchmark['batch_rows_per_s']:,.0f} rows/s in batches")
+    return info
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Id of the promoted version, or None"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILENAME), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _load_history(registry_dir):
+    path = os.path.join(registry_dir, HISTORY_FILENAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['promotions']
+
+
+def _set_current(registry_dir, version, history):
+    _write_atomic(os.path.join(registry_dir, HISTORY_FILENAME), json.dumps({'promotions': history}, indent=2))
+    _write_atomic(os.path.join(registry_dir, CURRENT_FILENAME), version + '\n')
+
+
+def promote(version, registry_dir=REGISTRY_DIR, max_p99_ms=MAX_P99_MS, max_memory_mb=MAX_MEMORY_MB):
+    """Make version the served one, unless it is over the latency or memory budget"""
+    benchmark = load_version(registry_dir, version)['benchmark']
+    over_budget = []
+    if max_p99_ms is not None and benchmark['p99_ms'] > max_p99_ms:
+        over_budget.append(f"p99 latency {benchmark['p99_ms']:.1f} ms > {max_p99_ms} ms")
+    if max_memory_mb is not None and benchmark['memory_mb'] is None:
+        print(f"Warning: Memory of {version} was not measured on this platform; memory budget not checked")
+    elif max_memory_mb is not None and benchmark['memory_mb'] > max_memory_mb:
+        over_budget.append(f"memory {benchmark['memory_mb']:.1f} MB > {max_memory_mb} MB")
+    if over_budget:
+        print(f"Promotion of {version} refused: {'; '.join(over_budget)}")
+        return False
+    if version == current_version(registry_dir):
+        print(f"Model version {version} is already current")
+        return True
+
+    history = _load_history(registry_dir)
+    history.append({'version': version, 'promoted_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+    _set_current(registry_dir, version, history)
+    print(f"Promoted model version {version}")
+    return True
+
+
+def rollback(registry_dir=REGISTRY_DIR):
+    """Serve the previously promoted version again; returns its id (None if there is none)"""
+    history = _load_history(registry_dir)
+    if len(history) < 2:
+        print("Error: No earlier promoted version to roll back to")
+        return None
+    retired = history.pop()
+    _set_current(registry_dir, history[-1]['version'], history)
+    print(f"Rolled back from {retired['version']} to {history[-1]['version']}")
+    return history[-1]['version']
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Every registered version with its accuracy and serving cost"""
+    versions_dir = os.path.join(registry_dir, 'versions')
+    current = current_version(registry_dir)
+    rows = []
+    for version in sorted(os.listdir(versions_dir)) if os.path.isdir(versions_dir) else []:
+        if '.tmp-' in version:
+            continue
+        info = load_version(registry_dir, version)
+        rows.append({'version': version, 'current': version == current, 'registered_at': info['registered_at'],
+                     'model': info['summary'].get('model_name'), 'test_rmse': info['summary'].get('test_rmse'),
+                     **info['benchmark']})
+    return pd.DataFrame(rows).set_index('version') if rows else pd.DataFrame()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'register':
+        from retrain_model import DATA_PATH, ARTIFACTS_DIR
+        artifacts_dir = sys.argv[2] if len(sys.argv) > 2 else ARTIFACTS_DIR
+        data_path = sys.argv[3] if len(sys.argv) > 3 else DATA_PATH
+        register(artifacts_dir, benchmark_rows(data_path, artifacts_dir))
+    elif command == 'promote':
+        promote(sys.argv[2])
+    elif command == 'rollback':
+        rollback()
+    else:
+        print(list_versions().round(3).to_string())
@@ -0,0 +1,353 @@
+"""
+Model Scheduler
+Trains several model pipelines in parallel under a total CPU budget.
+
+Every model gets a number of core slots. Single-threaded estimators take one
+slot and share the pool; estimators configured with n_jobs=-1 (or > 1) get
+PARALLEL_SLOTS reserved slots and their n_jobs is set to that number. A job
+starts as soon as enough slots are free (multi-threaded jobs are queued
+first), so the running jobs never use more than CPU_BUDGET cores. BLAS and
+OpenMP pools inside each job are capped to its slots with threadpoolctl.
+
+Each job runs in its own worker process (the data is sent once per worker)
+and reports its wall time, CPU time (all threads of the job) and peak memory
+allocated during fit (tracemalloc; covers NumPy/SciPy buffers, not the
+native allocations of libraries like XGBoost) next to the usual metrics.
+
+With shared_preprocessing=True every distinct preprocessor is fitted once and
+the encoded train and test matrices are cached (memory-mapped .npy files when
+worker processes are used); the jobs only fit the regressors, and every
+returned model is a full Pipeline around its fitted preprocessor. Pipelines
+that need differently prepared input (e.g. more category levels) get their own
+(X_train, X_test) through `views`.
+With train_evaluation='fast' the train-set metrics skip the full
+predict(X_train): bootstrapped forests report their out-of-bag predictions,
+other models are scored on a target-stratified
+subsample of TRAIN_EVAL_ROWS rows with 95% confidence half-widths
+(Train_MAE_CI / Train_RMSE_CI); Train_Eval says which was used and
+Train_Eval_Time what it cost (the out-of-bag predictions are computed after
+fit() from estimators_samples_, so Train_Time is the fit alone). For the tree
+models this saves little time (predicting 387k training rows took under 2% of
+the forest's fit); the out-of-bag error is mainly a more useful number than
+the near-perfect in-sample fit, and the subsample caps the cost for models
+whose predict is expensive.
+Sparse matrices (feature_matrix.build_preprocessor(sparse_output=True)) are
+cached as .npz, and estimators that cannot take them (or, like trees, fit
+much faster on dense input) get a densify step.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.metrics import mean_absolute_percentage_error
+from threadpoolctl import threadpool_limits
+
+from feature_matrix import prefers_dense, densify, densify_step, matrix_nbytes, FOREST_MODELS
+
+CPU_BUDGET = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+PARALLEL_SLOTS = None  # cores reserved for a multi-threaded model; None = half the budget
+TRAIN_EVAL_ROWS = 20000  # train rows scored per model with train_evaluation='fast'
+
+_data = {}
+
+
+def _estimator(model):
+    """(parameter prefix, estimator) of a Pipeline's final step or a bare estimator"""
+    if isinstance(model, Pipeline):
+        name, estimator = model.steps[-1]
+        return f'{name}__', estimator
+    return '', model
+
+
+def requested_threads(pipeline):
+    """n_jobs of the pipeline's final estimator (1 if it has none)"""
+    n_jobs = _estimator(pipeline)[1].get_params().get('n_jobs')
+    if n_jobs is None:
+        return 1
+    return -1 if n_jobs < 0 else int(n_jobs)
+
+
+def plan_slots(pipelines, budget=CPU_BUDGET, parallel_slots=PARALLEL_SLOTS):
+    """Core slots of every model: 1 for single-threaded, a reserved share otherwise"""
+    parallel_slots = parallel_slots or max(1, budget // 2)
+    slots = {}
+    for name, pipeline in pipelines.items():
+        threads = requested_threads(pipeline)
+        slots[name] = 1 if threads == 1 else min(budget, parallel_slots if threads < 0 else threads)
+    return slots
+
+
+def stratified_rows(y, n_rows, bins=10, seed=42):
+    """Sorted indices of about n_rows rows, the same share of every target decile (None if y is smaller)"""
+    y = np.asarray(y)
+    if len(y) <= n_rows:
+        return None
+    edges = np.unique(np.quantile(y, np.linspace(0, 1, bins + 1)[1:-1]))
+    strata = np.searchsorted(edges, y, side='right')
+    rng = np.random.default_rng(seed)
+    fraction = n_rows / len(y)
+    rows = [rng.choice(members, size=max(1, round(len(members) * fraction)), replace=False)
+            for members in (np.flatnonzero(strata == s) for s in np.unique(strata))]
+    return np.sort(np.concatenate(rows))
+
+
+def _half_width(values, population):
+    """95% half-width of the mean of a sample of `population` rows (with finite population correction)"""
+    n = len(values)
+    return 1.96 * np.std(values, ddof=1) / np.sqrt(n) * np.sqrt(1 - n / population)
+
+
+def train_metrics(y_train, y_pred_train, population=None):
+    """Train-set metrics; with population (a subsample), also the confidence half-widths"""
+    errors = np.asarray(y_train) - np.asarray(y_pred_train)
+    metrics = {
+        'Train_MAE': mean_absolute_error(y_train, y_pred_train),
+        'Train_RMSE': np.sqrt(mean_squared_error(y_train, y_pred_train)),
+        'Train_R2': r2_score(y_train, y_pred_train),
+        'Train_MAPE': mean_absolute_percentage_error(y_train, y_pred_train) * 100,
+        'Train_MAE_CI': np.nan,
+        'Train_RMSE_CI': np.nan,
+    }
+    if population:
+        mse, mse_half_width = np.mean(errors ** 2), _half_width(errors ** 2, population)
+        metrics['Train_MAE_CI'] = _half_width(np.abs(errors), population)
+        metrics['Train_RMSE_CI'] = (np.sqrt(mse + mse_half_width) - np.sqrt(max(mse - mse_half_width, 0))) / 2
+    return metrics
+
+
+def _uses_oob(estimator):
+    return isinstance(estimator, FOREST_MODELS) and estimator.get_params().get('bootstrap', False)
+
+
+def oob_predictions(forest, X):
+    """
+    Out-of-bag prediction of every row of the forest's training input X: the mean
+    of the trees whose bootstrap sample (estimators_samples_) left the row out.
+    Rows that every tree saw are NaN. Same values as fitting with oob_score, but
+    computed after fit() so the cost is timed apart from training.
+    """
+    total, counts = np.zeros(X.shape[0]), np.zeros(X.shape[0])
+    for tree, samples in zip(forest.estimators_, forest.estimators_samples_):
+        left_out = np.ones(X.shape[0], dtype=bool)
+        left_out[samples] = False
+        rows = np.flatnonzero(left_out)
+        total[rows] += tree.predict(X[rows])
+        counts[rows] += 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / counts
+
+
+def _load_cached(value):
+    """Cached matrices arrive as paths: .npy is memory-mapped, sparse .npz is loaded"""
+    if not isinstance(value, str):
+        return value
+    if value.endswith('.npz'):
+        return sparse.load_npz(value)
+    return np.load(value, mmap_mode='r')
+
+
+def _init_worker(inputs, y_train, y_test):
+    _data['inputs'] = {group: {name: _load_cached(value) for name, value in arrays.items()}
+                       for group, arrays in inputs.items()}
+    _data.update(y_train=_load_cached(y_train), y_test=_load_cached(y_test))
+
+
+def with_densify(pipeline):
+    """Copy of the pipeline with a densify step before an estimator that wants dense input"""
+    steps = [(name, clone(step)) for name, step in pipeline.steps]
+    if prefers_dense(steps[-1][1]):
+        steps.insert(-1, densify_step())
+    return Pipeline(steps=steps)
+
+
+def encode_once(preprocessor, X_train, X_test):
+    """Fit a copy of the preprocessor once and encode both splits"""
+    start_time = time.perf_counter()
+    preprocessor = clone(preprocessor)
+    X_train_encoded = preprocessor.fit_transform(X_train)
+    X_test_encoded = preprocessor.transform(X_test)
+    layout = 'sparse' if sparse.issparse(X_train_encoded) else 'dense'
+    print(f"Preprocessing fitted once in {time.perf_counter() - start_time:.1f}s: "
+          f"train {X_train_encoded.shape}, test {X_test_encoded.shape} "
+          f"({layout} {X_train_encoded.dtype}, {matrix_nbytes(X_train_encoded) / 1e6:.1f} MB for train)")
+    return preprocessor, X_train_encoded, X_test_encoded
+
+
+def _input_groups(pipelines, X_train, X_test, views, shared_preprocessing):
+    """
+    Input group of every pipeline, the (X_train, X_test) of every group and,
+    with shared preprocessing, the fitted preprocessor of every group
+    """
+    groups, inputs, preprocessors, keys = {}, {}, {}, {}
+    for name, pipeline in pipelines.items():
+        X_train_view, X_test_view = views.get(name, (X_train, X_test))
+        key = (id(X_train_view), id(pipeline.steps[0][1]) if shared_preprocessing else None)
+        if key not in keys:
+            group = keys[key] = f'input{len(keys)}'
+            if shared_preprocessing:
+                preprocessors[group], X_train_view, X_test_view = encode_once(
+                    pipeline.steps[0][1], X_train_view, X_test_view)
+            inputs[group] = {'X_train': X_train_view, 'X_test': X_test_view}
+        groups[name] = keys[key]
+    return groups, inputs, preprocessors
+
+
+def cache_matrices(cache_dir, **arrays):
+    """Save arrays as .npy (sparse: .npz) files in cache_dir and return their paths by name"""
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = {}
+    for name, array in arrays.items():
+        if sparse.issparse(array):
+            paths[name] = os.path.join(cache_dir, f'{name}.npz')
+            sparse.save_npz(paths[name], array.tocsr(), compressed=False)
+        else:
+            paths[name] = os.path.join(cache_dir, f'{name}.npy')
+            np.save(paths[name], np.asarray(array))
+    return paths
+
+
+def _run_job(name, pipeline, slots, group, train_rows=None, fast=False):
+    """Fit and evaluate one pipeline within its slots (runs in a worker process)"""
+    prefix, estimator = _estimator(pipeline)
+    if 'n_jobs' in estimator.get_params():
+        pipeline.set_params(**{f'{prefix}n_jobs': slots})
+    oob = fast and _uses_oob(estimator)
+    X_train, X_test = _data['inputs'][group]['X_train'], _data['inputs'][group]['X_test']
+    y_train, y_test = _data['y_train'], _data['y_test']
+    if not isinstance(pipeline, Pipeline) and prefers_dense(estimator):
+        X_train, X_test = densify(X_train), densify(X_test)
+
+    with threadpool_limits(limits=slots):
+        tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        pipeline.fit(X_train, y_train)
+        train_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        y_pred_test = pipeline.predict(X_test)
+        eval_start = time.perf_counter()
+        if oob:
+            # Each row predicted by the trees that did not see it; rows no tree left out are skipped
+            steps = pipeline.steps[:-1] if isinstance(pipeline, Pipeline) else []
+            X_forest = Pipeline(steps).transform(X_train) if steps else X_train
+            y_pred_train = oob_predictions(estimator, X_forest)
+            scored = np.isfinite(y_pred_train)
+            metrics, train_eval = train_metrics(y_train[scored], y_pred_train[scored]), 'oob'
+        elif fast and train_rows is not None:
+            X_sample = X_train.iloc[train_rows] if hasattr(X_train, 'iloc') else X_train[train_rows]
+            y_pred_train = pipeline.predict(X_sample)
+            metrics = train_metrics(y_train[train_rows], y_pred_train, population=len(y_train))
+            train_eval = f'subsample ({len(train_rows):,} rows)'
+        else:
+            metrics, train_eval = train_metrics(y_train, pipeline.predict(X_train)), 'full'
+        train_eval_time = time.perf_counter() - eval_start
+
+    result = {
+        'Model': name,
+        **metrics,
+        'Train_Eval': train_eval,
+        'Test_MAE': mean_absolute_error(y_test, y_pred_test),
+        'Test_RMSE': np.sqrt(mean_squared_error(y_test, y_pred_test)),
+        'Test_R2': r2_score(y_test, y_pred_test),
+        'Test_MAPE': mean_absolute_percentage_error(y_test, y_pred_test) * 100,
+        'Train_Time': train_time,
+        'CPU_Time': cpu_time,
+        'Train_Eval_Time': train_eval_time,
+        'Peak_Memory_MB': peak_memory / 1e6,
+        'Threads': slots,
+    }
+    return result, pipeline
+
+
+def run_models(pipelines, X_train, y_train, X_test, y_test, budget=None,
+               parallel_slots=PARALLEL_SLOTS, on_result=None, shared_preprocessing=False,
+               cache_dir=None, views=None, train_evaluation='full'):
+    """
+    Fit and evaluate every pipeline (unfitted copies are used) within `budget`
+    cores (default CPU_BUDGET). Returns (results in completion order, fitted
+    pipelines by name); on_result(result) is called as each model finishes.
+
+    shared_preprocessing fits each distinct preprocessor once; the encoded
+    matrices are kept in cache_dir (a temporary directory by default).
+    views maps a pipeline name to its own (X_train, X_test).
+    train_evaluation 'fast' uses out-of-bag or subsampled train metrics.
+    """
+    budget = max(1, int(budget or CPU_BUDGET))
+    slots = plan_slots(pipelines, budget, parallel_slots)
+    queue = sorted(pipelines, key=lambda name: -slots[name])
+    results, fitted = [], {}
+    start_time = time.perf_counter()
+
+    groups, inputs, preprocessors = _input_groups(pipelines, X_train, X_test, views or {}, shared_preprocessing)
+    y_train, y_test = np.asarray(y_train), np.asarray(y_test)
+    if shared_preprocessing:
+        jobs = {name: clone(_estimator(pipeline)[1]) for name, pipeline in pipelines.items()}
+    else:
+        jobs = {name: with_densify(pipeline) for name, pipeline in pipelines.items()}
+    sparse_input = {group: sparse.issparse(arrays['X_train']) for group, arrays in inputs.items()}
+    fast = train_evaluation == 'fast'
+    train_rows = stratified_rows(y_train, TRAIN_EVAL_ROWS) if fast else None
+
+    def collect(result, model):
+        results.append(result)
+        name = result['Model']
+        if shared_preprocessing:
+            steps = pipelines[name].steps
+            model = Pipeline(steps=[(steps[0][0], preprocessors[groups[name]]), (steps[-1][0], model)])
+            if sparse_input[groups[name]] and prefers_dense(model.steps[-1][1]):
+                model.steps.insert(1, densify_step())
+        fitted[name] = model
+        if on_result:
+            on_result(result)
+
+    if budget == 1:
+        # Nothing to overlap: fit in this process and skip the data transfer
+        _init_worker(inputs, y_train, y_test)
+        for name in queue:
+            collect(*_run_job(name, jobs[name], slots[name], groups[name], train_rows, fast))
+        _data.clear()
+    else:
+        temporary_cache = shared_preprocessing and cache_dir is None
+        targets = (y_train, y_test)
+        if shared_preprocessing:
+            cache_dir = cache_dir or tempfile.mkdtemp(prefix='visa_model_cache_')
+            inputs = {group: cache_matrices(os.path.join(cache_dir, group), **arrays)
+                      for group, arrays in inputs.items()}
+            paths = cache_matrices(cache_dir, y_train=y_train, y_test=y_test)
+            targets = (paths['y_train'], paths['y_test'])
+        free, running = budget, {}
+        try:
+            with ProcessPoolExecutor(max_workers=min(budget, len(queue)), initializer=_init_worker,
+                                     initargs=(inputs,) + targets) as pool:
+                while queue or running:
+                    for name in list(queue):
+                        if slots[name] <= free:
+                            future = pool.submit(_run_job, name, jobs[name], slots[name], groups[name],
+                                                 train_rows, fast)
+                            running[future] = name
+                            free -= slots[name]
+                            queue.remove(name)
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        free += slots[running.pop(future)]
+                        collect(*future.result())
+        finally:
+            if temporary_cache:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start_time
+    serial = sum(r['Train_Time'] for r in results)
+    print(f"\nTrained {len(results)} models in {elapsed:.1f}s on a budget of {budget} cores "
+          f"(sum of per-model training times: {serial:.1f}s)")
+    return results, fitted
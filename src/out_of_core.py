@@ -0,0 +1,195 @@
+"""
+Out-of-Core Training
+Trains on every row of the preprocessed data with bounded memory, instead of
+the H-1B downsampled set of retrain_model.py.
+
+The data is streamed in chunks (data_loader.iter_dataset) and never loaded
+whole:
+
+1. a uniform sample of FIT_SAMPLE_ROWS rows fits the category vocabulary
+   (from the dataset profile when there is one) and the sparse float32
+   preprocessor of feature_matrix.py
+2. every chunk is encoded and fed to SGDRegressor.partial_fit for EPOCHS
+   passes over the data (rows shuffled within each chunk); averaged SGD
+   settles far better than the last iterate
+3. the retrain_model.py forest is refitted on a balanced sample of the same
+   training rows (every minority row, H-1B reservoir-sampled as in
+   stratified_sampler.py), so neither model has seen the test rows
+4. a last pass scores the held-out rows with both models
+
+The train / test split is a seeded random mask per chunk, so every pass sees
+the same split. Errors are accumulated per VISA_CLASS as the chunks go by.
+
+Usage: python out_of_core.py [preprocessed_csv] [artifacts_dir]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline
+
+from data_loader import iter_dataset, compact_dtypes, CHUNK_SIZE
+from dataset_profiler import get_profile
+from category_vocab import CategoryVocabulary
+from feature_matrix import build_preprocessor
+from stratified_sampler import count_chunks, majority_quotas, sample_chunks
+from workload_features import WORKLOAD_FEATURES, WORKLOAD_FILENAME, get_workload_table, add_workload_features
+from retrain_model import selected_features, forest_pipeline
+
+MODEL_FILENAME = 'visa_processing_model_SGD_out_of_core.pkl'
+
+TEST_FRACTION = 0.2
+FIT_SAMPLE_ROWS = 100000
+EPOCHS = 3
+RANDOM_STATE = 42
+
+
+class ErrorAccumulator:
+    """Streaming MAE / RMSE overall and per group"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, y_true, y_pred, groups):
+        errors = np.asarray(y_true, dtype='float64') - np.asarray(y_pred, dtype='float64')
+        frame = pd.DataFrame({'group': np.asarray(groups, dtype=object), 'abs': np.abs(errors),
+                              'sq': errors ** 2})
+        sums = frame.groupby('group')[['abs', 'sq']].agg(['sum', 'count'])
+        for group, row in sums.iterrows():
+            n, abs_sum, sq_sum = self.totals.get(group, (0, 0.0, 0.0))
+            self.totals[group] = (n + row[('abs', 'count')], abs_sum + row[('abs', 'sum')],
+                                  sq_sum + row[('sq', 'sum')])
+
+    def table(self):
+        """Rows, MAE and RMSE per group plus an 'All' row"""
+        totals = pd.DataFrame(self.totals, index=['rows', 'abs', 'sq']).T
+        totals.loc['All'] = totals.sum()
+        table = pd.DataFrame({
+            'rows': totals['rows'].astype('int64'),
+            'MAE': totals['abs'] / totals['rows'],
+            'RMSE': np.sqrt(totals['sq'] / totals['rows']),
+        })
+        return table.sort_values('rows', ascending=False)
+
+
+def iter_model_chunks(data_path, workload_table, chunksize=CHUNK_SIZE, seed=RANDOM_STATE):
+    """(chunk number, frame with the model columns, test mask) for every chunk"""
+    columns = ['RECEIVED_DATE'] + selected_features
+    for number, chunk in enumerate(iter_dataset(data_path, columns=columns, chunksize=chunksize)):
+        chunk = chunk[chunk['processing_days'].notna()].reset_index(drop=True)
+        if not len(chunk):
+            continue
+        add_workload_features(chunk, workload_table)
+        # Same mask on every pass: the generator is seeded with the chunk number
+        test_mask = np.random.default_rng([seed, number]).random(len(chunk)) < TEST_FRACTION
+        yield number, chunk, test_mask
+
+
+def fit_sample(data_path, workload_table, n_rows, profile, chunksize=CHUNK_SIZE):
+    """Uniform sample of about n_rows training rows, drawn chunk by chunk"""
+    fraction = min(1.0, n_rows / profile.n_rows) if profile is not None and profile.n_rows else 1.0
+    parts = []
+    for number, chunk, test_mask in iter_model_chunks(data_path, workload_table, chunksize):
+        train = chunk[~test_mask]
+        parts.append(train.sample(frac=fraction, random_state=RANDOM_STATE + number))
+        if fraction == 1.0 and sum(len(p) for p in parts) >= n_rows:
+            break
+    return pd.concat(parts, ignore_index=True).head(n_rows)
+
+
+def fit_balanced_model(data_path, workload_table, profile, chunksize=CHUNK_SIZE):
+    """(pipeline, vocabulary, features): the retrain_model.py forest fitted on a balanced sample of the training rows"""
+    def train_chunks():
+        for number, chunk, test_mask in iter_model_chunks(data_path, workload_table, chunksize):
+            yield chunk[~test_mask]
+
+    start_time = time.time()
+    quotas = majority_quotas(*count_chunks(train_chunks()))
+    sample, _ = sample_chunks(train_chunks(), quotas, seed=RANDOM_STATE)
+    sample = compact_dtypes(sample)
+    features = [f for f in selected_features[:-1] + WORKLOAD_FEATURES if f in sample.columns]
+    X = sample[features]
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
+    vocabulary = CategoryVocabulary.fit(X, categorical_cols, profile)
+    pipeline = forest_pipeline(numerical_cols, categorical_cols)
+    pipeline.fit(vocabulary.transform(X), sample['processing_days'])
+    print(f"Balanced-sample forest fitted on {len(sample):,} training rows in {time.time() - start_time:.1f}s")
+    return pipeline, vocabulary, features
+
+
+def train_out_of_core(data_path, artifacts_dir, epochs=EPOCHS, chunksize=CHUNK_SIZE):
+    """Fit SGDRegressor on every training row, chunk by chunk, and compare it with the balanced model"""
+    start_time = time.time()
+    profile = get_profile(data_path)
+    workload_table = get_workload_table(data_path, path=os.path.join(artifacts_dir, WORKLOAD_FILENAME))
+
+    tracemalloc.start()
+    sample = fit_sample(data_path, workload_table, FIT_SAMPLE_ROWS, profile, chunksize)
+    features = [f for f in selected_features[:-1] + WORKLOAD_FEATURES if f in sample.columns]
+    X_sample = sample[features]
+    categorical_cols = X_sample.select_dtypes(include=['object', 'category']).columns.tolist()
+    numerical_cols = X_sample.select_dtypes(include=[np.number]).columns.tolist()
+    vocabulary = CategoryVocabulary.fit(X_sample, categorical_cols, profile)
+    preprocessor = build_preprocessor(numerical_cols, categorical_cols, sparse_output=True)
+    preprocessor.fit(vocabulary.transform(X_sample))
+    print(f"Preprocessor fitted on a sample of {len(sample):,} rows")
+    del sample, X_sample
+
+    regressor = SGDRegressor(loss='squared_error', penalty='l2', alpha=1e-4, average=True,
+                             random_state=RANDOM_STATE)
+    rng = np.random.default_rng(RANDOM_STATE)
+    train_rows = 0
+    for epoch in range(epochs):
+        epoch_start = time.time()
+        train_rows = 0
+        for number, chunk, test_mask in iter_model_chunks(data_path, workload_table, chunksize):
+            train = chunk[~test_mask]
+            order = rng.permutation(len(train))
+            X = preprocessor.transform(vocabulary.transform(train[features]))[order]
+            regressor.partial_fit(X, train['processing_days'].to_numpy(dtype='float64')[order])
+            train_rows += len(train)
+        print(f"  Epoch {epoch + 1}/{epochs}: {train_rows:,} training rows in {time.time() - epoch_start:.1f}s")
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+    print(f"Trained on {train_rows:,} rows in {time.time() - start_time:.1f}s, "
+          f"peak memory {peak_memory / 1e6:.1f} MB")
+
+    # Held-out rows of every chunk, scored by both models
+    balanced = fit_balanced_model(data_path, workload_table, profile, chunksize)
+    errors = {'Out-of-core SGD (all rows)': ErrorAccumulator(), 'Balanced-sample model': ErrorAccumulator()}
+    for number, chunk, test_mask in iter_model_chunks(data_path, workload_table, chunksize):
+        test = chunk[test_mask]
+        if not len(test):
+            continue
+        y_test, visa_class = test['processing_days'], test['VISA_CLASS']
+        errors['Out-of-core SGD (all rows)'].add(y_test, pipeline.predict(vocabulary.transform(test[features])),
+                                                 visa_class)
+        model, model_vocabulary, model_features = balanced
+        errors['Balanced-sample model'].add(y_test, model.predict(model_vocabulary.transform(test[model_features])),
+                                            visa_class)
+
+    tables = {name: accumulator.table() for name, accumulator in errors.items()}
+    comparison = pd.concat(tables, axis=1)
+    print("\nHeld-out error by VISA_CLASS:")
+    print(comparison.round(2).to_string())
+
+    model_path = os.path.join(artifacts_dir, MODEL_FILENAME)
+    joblib.dump(pipeline, model_path)
+    print(f"Out-of-core model saved to {model_path}")
+    return pipeline, comparison
+
+
+if __name__ == '__main__':
+    from retrain_model import DATA_PATH, ARTIFACTS_DIR
+    data_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    artifacts_dir = sys.argv[2] if len(sys.argv) > 2 else ARTIFACTS_DIR
+    train_out_of_core(data_path, artifacts_dir)
@@ -0,0 +1,180 @@
+"""
+Plot Utilities
+Scatter rendering that stays fast as the number of points grows.
+
+- 'scatter': every point (used automatically below POINT_BUDGET points)
+- 'sample':  stratified sample of at most POINT_BUDGET points over a 2D grid;
+             sparse cells are kept whole, so outliers stay visible
+- 'hexbin':  log-scaled hexagonal density plus the outlying points on top
+- 'auto':    'scatter' within the budget, otherwise 'sample'
+
+finish_figure() and save_table() either show a figure interactively or, when
+an output directory is given (headless report runs), save it there instead.
+"""
+
+import os
+import numpy as np
+
+RENDER_MODE = 'auto'
+POINT_BUDGET = 20000
+GRID_BINS = 60
+OUTLIER_QUANTILE = 0.001
+FIGURE_DPI = 100
+
+
+def _grid_cells(x, y, bins):
+    """Cell number of every point on a bins x bins grid over the data range"""
+    cells = np.zeros(len(x), dtype='int64')
+    for values in (x, y):
+        low, high = values.min(), values.max()
+        span = high - low if high > low else 1.0
+        index = ((values - low) / span * bins).astype('int64').clip(0, bins - 1)
+        cells = cells * bins + index
+    return cells
+
+
+def stratified_sample(x, y, budget=POINT_BUDGET, bins=GRID_BINS, seed=42):
+    """
+    Indices of at most `budget` points, spread over a 2D grid: every cell gets
+    the same cap (water-filling), so dense cells are thinned and sparse ones kept.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    cells = _grid_cells(x, y, bins)
+    shuffled = rng.permutation(n)
+    order = shuffled[np.argsort(cells[shuffled], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_cells)) + 1]
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    # Largest per-cell cap that keeps the total within budget
+    low, high = 0, int(counts.max())
+    while low < high:
+        cap = (low + high + 1) // 2
+        if np.minimum(counts, cap).sum() <= budget:
+            low = cap
+        else:
+            high = cap - 1
+    return np.sort(order[rank < max(low, 1)])
+
+
+def outlier_mask(x, y, q=OUTLIER_QUANTILE):
+    """Points outside the [q, 1 - q] quantile range of either coordinate"""
+    mask = np.zeros(len(x), dtype=bool)
+    for values in (x, y):
+        low, high = np.quantile(values, [q, 1 - q])
+        mask |= (values < low) | (values > high)
+    return mask
+
+
+def density_scatter(ax, x, y, mode=None, budget=POINT_BUDGET, gridsize=GRID_BINS, **scatter_kwargs):
+    """Scatter x against y on ax using the given (or module default) render mode"""
+    mode = mode or RENDER_MODE
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+
+    if mode == 'auto':
+        mode = 'scatter' if len(x) <= budget else 'sample'
+
+    if mode == 'scatter':
+        return ax.scatter(x, y, **scatter_kwargs)
+
+    if mode == 'sample':
+        keep = stratified_sample(x, y, budget=budget)
+        if len(keep) < len(x):
+            ax.text(0.99, 0.01, f'{len(keep):,} of {len(x):,} points (stratified)',
+                    transform=ax.transAxes, ha='right', va='bottom', fontsize=8, alpha=0.7)
+        return ax.scatter(x[keep], y[keep], **scatter_kwargs)
+
+    if mode == 'hexbin':
+        image = ax.hexbin(x, y, gridsize=gridsize, bins='log', mincnt=1, cmap='viridis')
+        outliers = np.flatnonzero(outlier_mask(x, y))
+        if len(outliers) > budget:
+            outliers = outliers[stratified_sample(x[outliers], y[outliers], budget=budget)]
+        ax.scatter(x[outliers], y[outliers], s=6, color='red', alpha=0.6, label='Outliers')
+        ax.figure.colorbar(image, ax=ax, label='Points per bin (log)')
+        return image
+
+    raise ValueError(f"Unknown render mode: {mode}")
+
+
+def finish_figure(fig, name, output_dir=None):
+    """Show the figure, or save it as output_dir/name.png and close it (returns the path)"""
+    import matplotlib.pyplot as plt
+    fig.tight_layout()
+    if output_dir is None:
+        plt.show()
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{name}.png')
+    fig.savefig(path, dpi=FIGURE_DPI)
+    plt.close(fig)
+    return path
+
+
+def save_table(table, name, output_dir=None):
+    """Save a table as output_dir/name.csv (no-op without an output directory)"""
+    if output_dir is None:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{name}.csv')
+    table.to_csv(path)
+    return path
+
+
+def model_diagnostics_figure(y_test, y_pred, model_name):
+    """Actual vs predicted, residuals, error distribution and error vs actual"""
+    import matplotlib.pyplot as plt
+    y_test = np.asarray(y_test, dtype='float64')
+    y_pred = np.asarray(y_pred, dtype='float64')
+    residuals = y_test - y_pred
+    r2 = 1 - (residuals ** 2).sum() / ((y_test - y_test.mean()) ** 2).sum()
+
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+
+    # 1. Actual vs Predicted Scatter Plot
+    density_scatter(axes[0, 0], y_test, y_pred, alpha=0.5, s=10)
+    axes[0, 0].plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
+    axes[0, 0].set_xlabel('Actual Processing Days')
+    axes[0, 0].set_ylabel('Predicted Processing Days')
+    axes[0, 0].set_title(f'Actual vs Predicted - {model_name}')
+    axes[0, 0].grid(True, alpha=0.3)
+    axes[0, 0].text(0.05, 0.95, f'R² = {r2:.3f}',
+                    transform=axes[0, 0].transAxes, fontsize=12,
+                    verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    # 2. Residual Plot
+    density_scatter(axes[0, 1], y_pred, residuals, alpha=0.5, s=10)
+    axes[0, 1].axhline(y=0, color='r', linestyle='--')
+    axes[0, 1].set_xlabel('Predicted Processing Days')
+    axes[0, 1].set_ylabel('Residuals (Actual - Predicted)')
+    axes[0, 1].set_title(f'Residual Plot - {model_name}')
+    axes[0, 1].grid(True, alpha=0.3)
+
+    # 3. Error Distribution
+    axes[1, 0].hist(residuals, bins=50, edgecolor='black', alpha=0.7)
+    axes[1, 0].axvline(x=0, color='r', linestyle='--', linewidth=2)
+    axes[1, 0].set_xlabel('Prediction Error (Days)')
+    axes[1, 0].set_ylabel('Frequency')
+    axes[1, 0].set_title(f'Error Distribution - {model_name}')
+    axes[1, 0].grid(True, alpha=0.3)
+    axes[1, 0].text(0.05, 0.95, f'Mean Error: {residuals.mean():.2f} days\nStd Error: {residuals.std(ddof=1):.2f} days',
+                    transform=axes[1, 0].transAxes, fontsize=10,
+                    verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+    # 4. Error vs Actual
+    density_scatter(axes[1, 1], y_test, residuals, alpha=0.5, s=10)
+    axes[1, 1].axhline(y=0, color='r', linestyle='--')
+    axes[1, 1].set_xlabel('Actual Processing Days')
+    axes[1, 1].set_ylabel('Prediction Error (Days)')
+    axes[1, 1].set_title('Prediction Error vs Actual Value')
+    axes[1, 1].grid(True, alpha=0.3)
+    return fig
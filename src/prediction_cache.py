@@ -0,0 +1,123 @@
+"""
+Shared Prediction Cache
+Host-wide cache of model predictions shared by every worker process.
+
+Entries live in a local SQLite file (WAL mode) so all Flask/gunicorn workers
+on one host read and write the same table, and the cache survives restarts.
+Keys combine the model version with the canonical input produced by
+VisaPredictor._validate_and_map_inputs. The table is bounded to
+`max_entries` rows; the least recently used rows are evicted first.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_PATH = 'prediction_cache.sqlite'
+MAX_ENTRIES = 50000
+
+# Only rewrite last_used when it is older than this, so hot keys do not turn
+# every read into a write.
+TOUCH_INTERVAL = 60
+
+# Check the table size once every this many inserts (per process).
+EVICT_EVERY = 100
+
+
+class SharedPredictionCache:
+    def __init__(self, path=CACHE_PATH, model_version='unknown', max_entries=MAX_ENTRIES):
+        """Open (or create) the cache file for the given model version"""
+        self.path = path
+        self.model_version = str(model_version)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            ' key TEXT PRIMARY KEY,'
+            ' model_version TEXT NOT NULL,'
+            ' prediction REAL NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_last_used ON predictions (last_used)')
+        conn.commit()
+
+    def _connect(self):
+        """Return a connection owned by the current process and thread"""
+        # Connections must not cross a fork, so they are keyed by pid as well.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, input_data):
+        """Hash the model version and canonical input into a cache key"""
+        canonical = json.dumps(input_data, sort_keys=True, default=str)
+        digest = hashlib.sha1(f"{self.model_version}|{canonical}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, input_data):
+        """Return the cached prediction for input_data, or None"""
+        key = self.make_key(input_data)
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT prediction, last_used FROM predictions WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                conn.execute('UPDATE predictions SET last_used = ? WHERE key = ?', (now, key))
+            return row[0]
+        except sqlite3.Error as e:
+            print(f"Warning: Prediction cache read failed: {e}")
+            return None
+
+    def put(self, input_data, prediction):
+        """Store a prediction and evict old entries when over the size bound"""
+        key = self.make_key(input_data)
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO predictions (key, model_version, prediction, last_used) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self.model_version, float(prediction), time.time())
+            )
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Warning: Prediction cache write failed: {e}")
+
+    def _evict(self, conn):
+        """Drop the least recently used rows beyond max_entries"""
+        count = conn.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM predictions WHERE key IN '
+                '(SELECT key FROM predictions ORDER BY last_used LIMIT ?)',
+                (excess,)
+            )
+
+    def clear(self):
+        """Remove every cached prediction"""
+        self._connect().execute('DELETE FROM predictions')
+
+
+def file_model_version(path):
+    """Cheap model version derived from the model file's size and mtime"""
+    stat = os.stat(path)
+    token = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:12]
@@ -1,130 +1,155 @@
 
-import pandas as pd
 import numpy as np
+from scipy import sparse
 import warnings
 import os
 from datetime import datetime
 import json
 import pickle
+import shutil
 import joblib
+import time
+import tracemalloc
 
 # Sklearn imports
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+from data_loader import load_dataset
+from feature_matrix import build_preprocessor, matrix_nbytes, native_categorical_model, NATIVE_MAX_CATEGORIES
+from feature_matrix import prefers_dense, densify_step
+from dataset_profiler import get_profile, profile_path_for, PROFILE_FILENAME
+from category_vocab import CategoryVocabulary, VOCAB_FILENAME
+from workload_features import WORKLOAD_FEATURES, get_workload_table, add_workload_features
+from incremental_update import WINDOW_FILENAME, data_window, save_tree_window
+from model_registry import register, promote, BENCHMARK_ROWS
+from stratified_sampler import stratified_sample
+
 warnings.filterwarnings('ignore')
 
 # Paths
 DATA_PATH = r'c:\Users\HP\Documents\GitHub\Visa-Status-Prediction\data\visa_data_preprocessed.csv'
 ARTIFACTS_DIR = r'c:\Users\HP\Documents\GitHub\Visa-Status-Prediction\src'
 
+# Training mode: sparse float32 one-hot features (feature_matrix.py) keep the
+# matrix small enough to train on every row; with BALANCED_SAMPLING off the
+# H-1B majority is not downsampled
+SPARSE_FEATURES = True
+BALANCED_SAMPLING = True
+
+# Also split the H-1B quota over CASE_STATUS so the sample keeps its status mix
+STRATIFY_BY_STATUS = False
+
+# Train HistGradientBoosting with native categorical splits instead of the
+# one-hot forest; keeps up to NATIVE_MAX_CATEGORIES levels per column
+NATIVE_CATEGORICAL = False
+
+# Register the saved artifacts as an immutable, benchmarked version in
+# ARTIFACTS_DIR/model_registry and promote it if it is within the serving
+# budgets (model_registry.py); serve it with VISA_MODEL_REGISTRY set
+REGISTER_MODEL = True
+
+selected_features = [
+    'VISA_CLASS', 'CASE_STATUS', 'FULL_TIME_POSITION', 'EMPLOYER_STATE', 'WORKSITE_STATE',
+    'application_year', 'application_month', 'application_season', 'application_weekday',
+    'JOB_TITLE', 'SOC_TITLE', 'TOTAL_WORKER_POSITIONS',
+    'WAGE_RATE_OF_PAY_FROM', 'WAGE_UNIT_OF_PAY', 'PREVAILING_WAGE', 'PW_UNIT_OF_PAY',
+    'NAICS_CODE', 'H_1B_DEPENDENT', 'WILLFUL_VIOLATOR',
+    'processing_days'
+]
+
+def forest_pipeline(numerical_cols, categorical_cols):
+    """The one-hot Random Forest pipeline (as in the app), unfitted"""
+    # Preprocessing
+    preprocessor = build_preprocessor(numerical_cols, categorical_cols, sparse_output=SPARSE_FEATURES)
+
+    # Model - Random Forest
+    # Increase estimators and depth to capture subtle signals (like H-1B1 Singapore)
+    model = RandomForestRegressor(n_estimators=100, max_depth=None, random_state=42, n_jobs=-1)
+
+    pipeline = Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', model)
+    ])
+    if SPARSE_FEATURES and prefers_dense(model):
+        # Encoded rows are kept sparse until the forest, which splits dense float32 far faster
+        pipeline.steps.insert(1, densify_step())
+    return pipeline
+
 def retrain():
     print("Loading data...")
     if not os.path.exists(DATA_PATH):
         print(f"Error: Data file not found at {DATA_PATH}")
         return
 
-    # Read the full dataset to ensure we get a random distribution of classes
-    # If memory is an issue, we could use chunking, but for <1GB file, full read is usually fine.
-    df = pd.read_csv(DATA_PATH)
-    print(f"Full Data loaded: {df.shape}")
-    
-    # Print diversity stats relative to the full dataset
-    if 'CASE_STATUS' in df.columns:
-         print("CASE_STATUS distribution in full data:")
-         print(df['CASE_STATUS'].value_counts())
-
-    # Balanced/Stratified Sampling Strategy
-    # The dataset is dominated by H-1B, causing the model to ignore rare classes.
-    # We will downsample H-1B but keep ALL minority classes.
-    
-    print("Applying balanced sampling...")
-    majority_class = 'H-1B'
-    
-    # 1. Split Majority vs Minority
-    df_minority = df[df['VISA_CLASS'] != majority_class]
-    df_majority = df[df['VISA_CLASS'] == majority_class]
-    
-    print(f"Majority (H-1B) count: {len(df_majority)}")
-    print(f"Minority (Others) count: {len(df_minority)}")
-    
-    # 2. Downsample Majority
-    # We want to force the model to pay equal attention to minority classes.
-    # Strategy: Aggressive 1:1 Ratio. Take exactly len(df_minority) samples of majority.
-    target_majority_size = len(df_minority)
-    
-    # Ensure we have at least 10k majority samples to be safe, if minority is tiny
-    target_majority_size = max(target_majority_size, 10000)
-    
-    df_majority_sampled = df_majority.sample(n=target_majority_size, random_state=42)
-    print(f"Downsampled Majority to: {len(df_majority_sampled)} (Targeting 1:1 Ratio)")
-    
-    # 3. Combine and Shuffle
-    df = pd.concat([df_majority_sampled, df_minority])
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-    
-    print(f"Balanced Data for Training: {df.shape}")
-    print("Class distribution in balanced set:")
-    print(df['VISA_CLASS'].value_counts())
+    columns = ['RECEIVED_DATE', 'DECISION_DATE'] + selected_features
+    if BALANCED_SAMPLING:
+        # Balanced/Stratified Sampling Strategy
+        # The dataset is dominated by H-1B, causing the model to ignore rare classes.
+        # Every minority-class row is kept and H-1B is reservoir-sampled to a 1:1
+        # ratio (at least 10k rows) while the data streams by, so only the sampled
+        # rows are ever loaded (stratified_sampler.py).
+        print("Applying balanced sampling...")
+        df = stratified_sample(DATA_PATH, columns=columns, by_status=STRATIFY_BY_STATUS)
+
+        print(f"Balanced Data for Training: {df.shape}")
+        print("Class distribution in balanced set:")
+        print(df['VISA_CLASS'].value_counts())
+    else:
+        # Read every row but only the columns the model uses, with compact dtypes.
+        df = load_dataset(DATA_PATH, columns=columns)
+        print(f"Full Data loaded: {df.shape}")
+        if 'CASE_STATUS' in df.columns:
+            print("CASE_STATUS distribution in full data:")
+            print(df['CASE_STATUS'].value_counts())
+        print("Training on the full (unbalanced) dataset")
+
+    # Intake volume / open backlog when each application was received
+    workload_table = get_workload_table(DATA_PATH, path=os.path.join(ARTIFACTS_DIR, 'workload_features.npz'))
+    add_workload_features(df, workload_table)
+    df = df.drop(columns='RECEIVED_DATE')
     
     print(f"Data loaded: {df.shape}")
 
-    selected_features = [
-        'VISA_CLASS', 'CASE_STATUS', 'FULL_TIME_POSITION', 'EMPLOYER_STATE', 'WORKSITE_STATE',
-        'application_year', 'application_month', 'application_season', 'application_weekday',
-        'JOB_TITLE', 'SOC_TITLE', 'TOTAL_WORKER_POSITIONS',
-        'WAGE_RATE_OF_PAY_FROM', 'WAGE_UNIT_OF_PAY', 'PREVAILING_WAGE', 'PW_UNIT_OF_PAY',
-        'NAICS_CODE', 'H_1B_DEPENDENT', 'WILLFUL_VIOLATOR',
-        'processing_days'
-    ]
-
-    available_features = [f for f in selected_features if f in df.columns]
+    model_features = selected_features[:-1] + WORKLOAD_FEATURES + selected_features[-1:]
+    available_features = [f for f in model_features if f in df.columns]
     X = df[available_features].copy()
     y = X.pop('processing_days')
 
     # Handle high cardinality
-    categorical_cols = X.select_dtypes(include=['object']).columns.tolist()
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
     numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
 
-    for col in categorical_cols:
-        if X[col].nunique() > 50:
-            top_categories = X[col].value_counts().head(20).index
-            X[col] = X[col].apply(lambda x: x if x in top_categories else 'Other')
-
-    # Preprocessing
-    numerical_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='median')),
-        ('scaler', StandardScaler())
-    ])
-
-    categorical_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='most_frequent')),
-        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
-    ])
-
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', numerical_transformer, numerical_cols),
-            ('cat', categorical_transformer, categorical_cols)
-        ])
-
-    # Model - Random Forest (as in the app)
-    # Increase estimators and depth to capture subtle signals (like H-1B1 Singapore)
-    model = RandomForestRegressor(n_estimators=100, max_depth=None, random_state=42, n_jobs=-1)
-
-    pipeline = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('regressor', model)
-    ])
+    # Category levels come from the full-data profile (built first if missing or stale)
+    profile = get_profile(DATA_PATH)
+    max_unique, top_k = (NATIVE_MAX_CATEGORIES, NATIVE_MAX_CATEGORIES) if NATIVE_CATEGORICAL else (50, 20)
+    vocabulary = CategoryVocabulary.fit(X, categorical_cols, profile, max_unique, top_k)
+    X = vocabulary.transform(X)
+
+    if NATIVE_CATEGORICAL:
+        model_name = 'HistGradientBoosting native categorical (Retrained)'
+        pipeline = native_categorical_model(numerical_cols, categorical_cols)
+        preprocessor = pipeline.named_steps['preprocessor']
+    else:
+        model_name = 'Random Forest (Retrained)'
+        pipeline = forest_pipeline(numerical_cols, categorical_cols)
+        preprocessor = pipeline.named_steps['preprocessor']
+        model = pipeline.named_steps['regressor']
 
     print("Training model...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    tracemalloc.start()
+    start_time = time.time()
     pipeline.fit(X_train, y_train)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    encoded = preprocessor.transform(X_train.head(1000))
+    print(f"Trained on {len(X_train):,} rows in {time.time() - start_time:.1f}s, "
+          f"peak memory {peak_memory / 1e6:.1f} MB "
+          f"(feature matrix ~{matrix_nbytes(encoded) / encoded.shape[0] * len(X_train) / 1e6:.1f} MB, "
+          f"{'sparse' if sparse.issparse(encoded) else 'dense'} {encoded.dtype})")
 
     print("Evaluating...")
     y_pred = pipeline.predict(X_test)
@@ -173,11 +198,24 @@ def retrain():
     # Save Features
     with open(os.path.join(ARTIFACTS_DIR, 'visa_features.pkl'), 'wb') as f:
         pickle.dump(available_features, f)
+
+    # Save the kept category levels (the app maps inputs with them)
+    vocabulary.save(os.path.join(ARTIFACTS_DIR, VOCAB_FILENAME))
+
+    # The training-data profile is saved next to the data; the app validates inputs against it
+    profile_path = os.path.join(ARTIFACTS_DIR, PROFILE_FILENAME)
+    if os.path.abspath(profile_path_for(DATA_PATH)) != os.path.abspath(profile_path):
+        shutil.copyfile(profile_path_for(DATA_PATH), profile_path)
+
+    # Decisions every tree was trained on; incremental_update.py continues from here
+    if not NATIVE_CATEGORICAL:
+        window = data_window(df.loc[X_train.index, 'DECISION_DATE'])
+        save_tree_window(os.path.join(ARTIFACTS_DIR, WINDOW_FILENAME), [window] * len(model.estimators_))
         
     # Save Summary
     # Save Summary
     summary = {
-        'model_name': 'Random Forest (Retrained)',
+        'model_name': model_name,
         'test_rmse': float(rmse),
         'test_mae': float(mae),
         'test_r2': float(r2),
@@ -187,6 +225,11 @@ def retrain():
     with open(os.path.join(ARTIFACTS_DIR, 'model_summary.json'), 'w') as f:
         json.dump(summary, f, indent=2)
 
+    if REGISTER_MODEL:
+        registry_dir = os.path.join(ARTIFACTS_DIR, 'model_registry')
+        version = register(ARTIFACTS_DIR, X_test.head(BENCHMARK_ROWS), registry_dir)['version']
+        promote(version, registry_dir)
+
     print("Done.")
 
 if __name__ == "__main__":
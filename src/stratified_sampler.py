@@ -0,0 +1,133 @@
+"""
+Stratified Sampler
+Builds the balanced training set of retrain_model.py from a stream of chunks
+instead of loading the whole dataset and downsampling it in memory.
+
+Every row outside the majority class (H-1B) is kept. The majority class is
+cut to a quota of max(minority rows, MIN_MAJORITY_ROWS) by reservoir
+sampling: each majority row gets a seeded uniform random key and the rows
+with the smallest keys are kept, so after every chunk the reservoir holds a
+uniform sample of the rows seen so far. Only the reservoir, the kept minority
+rows and one chunk are ever in memory.
+
+With by_status the quota is split over the CASE_STATUS values of the
+majority class in proportion to their counts, and each status gets its own
+reservoir, so the status mix of the sample matches the full data exactly.
+
+A cheap first pass reads only the strata columns to size the quotas. The
+sample is the same for a given seed and chunk size.
+
+Usage: python stratified_sampler.py [preprocessed_csv] [visa_class|visa_class_status]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import iter_dataset, compact_dtypes
+
+MAJORITY_CLASS = 'H-1B'
+MIN_MAJORITY_ROWS = 10000
+RANDOM_STATE = 42
+
+# Peak memory follows the chunk, not the dataset; smaller than data_loader's
+# CHUNK_SIZE at about the same speed
+SAMPLE_CHUNK_SIZE = 50000
+
+
+def _strata(chunk, by_status):
+    """Stratum label of every row: its CASE_STATUS, or one stratum for all"""
+    if by_status:
+        return chunk['CASE_STATUS'].astype(str).to_numpy()
+    return np.full(len(chunk), '', dtype=object)
+
+
+def count_chunks(chunks, majority_class=MAJORITY_CLASS, by_status=False):
+    """(minority rows, majority rows per stratum) of a stream of chunks"""
+    n_minority, majority = 0, pd.Series(dtype='int64')
+    for chunk in chunks:
+        is_majority = (chunk['VISA_CLASS'].astype(str) == majority_class).to_numpy()
+        n_minority += int((~is_majority).sum())
+        counts = pd.Series(_strata(chunk[is_majority], by_status)).value_counts()
+        majority = majority.add(counts, fill_value=0)
+    return n_minority, majority.astype('int64')
+
+
+def count_strata(data_path, majority_class=MAJORITY_CLASS, by_status=False, chunksize=SAMPLE_CHUNK_SIZE):
+    """(minority rows, majority rows per stratum) from a pass over the strata columns only"""
+    columns = ['VISA_CLASS'] + (['CASE_STATUS'] if by_status else [])
+    chunks = iter_dataset(data_path, columns=columns, chunksize=chunksize, compact=False)
+    return count_chunks(chunks, majority_class, by_status)
+
+
+def majority_quotas(n_minority, majority_counts, majority_rows=None):
+    """Rows to keep per majority stratum, split in proportion to the stratum sizes"""
+    total = majority_counts.sum()
+    target = min(majority_rows or max(n_minority, MIN_MAJORITY_ROWS), total)
+    if not total:
+        return {}
+    exact = majority_counts / total * target
+    quotas = np.floor(exact).astype('int64')
+    # Largest remainders take the rows lost to rounding down
+    shortfall = int(target - quotas.sum())
+    quotas[(exact - quotas).sort_values(ascending=False).index[:shortfall]] += 1
+    return quotas.to_dict()
+
+
+def _keep_smallest_keys(reservoir, quotas):
+    """Rows of the reservoir with the quota smallest keys in each stratum"""
+    reservoir = reservoir.sort_values('_key', kind='stable')
+    rank = reservoir.groupby('_stratum').cumcount()
+    return reservoir[rank < reservoir['_stratum'].map(quotas)]
+
+
+def sample_chunks(chunks, quotas, majority_class=MAJORITY_CLASS, by_status=False, seed=RANDOM_STATE):
+    """(every minority row plus the majority reservoir, majority rows kept) of a stream of chunks"""
+    minority_parts, reservoir = [], None
+    for number, chunk in enumerate(chunks):
+        is_majority = (chunk['VISA_CLASS'].astype(str) == majority_class).to_numpy()
+        minority_parts.append(chunk[~is_majority])
+        candidates = chunk[is_majority].assign(_stratum=_strata(chunk[is_majority], by_status))
+        # Seeded by the chunk number, so the keys do not depend on earlier chunks
+        candidates['_key'] = np.random.default_rng([seed, number]).random(len(candidates))
+        reservoir = candidates if reservoir is None else pd.concat([reservoir, candidates])
+        reservoir = _keep_smallest_keys(reservoir, quotas)
+
+    parts = minority_parts + ([reservoir.drop(columns=['_stratum', '_key'])] if reservoir is not None else [])
+    return pd.concat(parts, ignore_index=True), 0 if reservoir is None else len(reservoir)
+
+
+def stratified_sample(data_path, columns=None, majority_class=MAJORITY_CLASS, by_status=False,
+                      majority_rows=None, seed=RANDOM_STATE, chunksize=SAMPLE_CHUNK_SIZE):
+    """All minority-class rows plus a reservoir sample of the majority class, shuffled"""
+    start_time = time.time()
+    n_minority, majority_counts = count_strata(data_path, majority_class, by_status, chunksize)
+    quotas = majority_quotas(n_minority, majority_counts, majority_rows)
+    print(f"Majority ({majority_class}) count: {majority_counts.sum():,}")
+    print(f"Minority (Others) count: {n_minority:,}")
+
+    strata_columns = ['VISA_CLASS'] + (['CASE_STATUS'] if by_status else [])
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + strata_columns))
+    chunks = iter_dataset(data_path, columns=read_columns, chunksize=chunksize, compact=False)
+    df, n_sampled = sample_chunks(chunks, quotas, majority_class, by_status, seed)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    df = compact_dtypes(df.sample(frac=1, random_state=seed).reset_index(drop=True))
+
+    print(f"Downsampled Majority to: {n_sampled:,} (Targeting 1:1 Ratio)")
+    print(f"Balanced sample of {len(df):,} rows in {time.time() - start_time:.1f}s, "
+          f"{df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    return df
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    by_status = len(sys.argv) > 2 and sys.argv[2] == 'visa_class_status'
+    sample = stratified_sample(data_path, by_status=by_status)
+    print("Class distribution in balanced set:")
+    print(sample['VISA_CLASS'].value_counts())
+    if 'CASE_STATUS' in sample.columns:
+        print(pd.crosstab(sample['VISA_CLASS'], sample['CASE_STATUS']))
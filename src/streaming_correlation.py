@@ -0,0 +1,118 @@
+"""
+Streaming Correlation
+Pearson correlations between numeric columns and one-hot encoded categorical
+columns, accumulated chunk by chunk from sparse blocks.
+
+Each chunk is encoded as a sparse CSR matrix (numeric columns shifted by the
+first chunk's means, plus one column per category value seen so far), and the
+row count, column sums and the sparse cross-product matrix X'X are added up.
+Correlations follow from these sufficient statistics, so memory depends on
+the number of features and co-occurring categories, not on the number of rows.
+Feature names and the dropped first level match
+pd.get_dummies(..., drop_first=True).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class StreamingCorrelation:
+    def __init__(self, numeric_columns, categorical_columns):
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.vocab = {col: {} for col in self.categorical_columns}
+        self.n_features = len(self.numeric_columns)
+        self.n = 0
+        self.shift = None
+        self.sums = np.zeros(self.n_features)
+        self.cross = sparse.csr_matrix((self.n_features, self.n_features))
+
+    def _codes(self, col, series):
+        """Global feature index of every row's category (-1 for missing)"""
+        present = series.notnull().values
+        values = series[present].astype(str)
+        vocab = self.vocab[col]
+        for value in pd.unique(values):
+            if value not in vocab:
+                vocab[value] = self.n_features
+                self.n_features += 1
+        codes = np.full(len(series), -1, dtype='int64')
+        codes[present] = values.map(vocab).values
+        return codes
+
+    def update(self, chunk):
+        """Add one chunk (rows with a missing numeric value are skipped)"""
+        chunk = chunk.dropna(subset=[c for c in self.numeric_columns if c in chunk.columns])
+        if chunk.empty:
+            return
+        n = len(chunk)
+
+        numeric = chunk[self.numeric_columns].to_numpy(dtype='float64')
+        if self.shift is None:
+            self.shift = numeric.mean(axis=0)
+        numeric = numeric - self.shift
+
+        rows = [np.repeat(np.arange(n), len(self.numeric_columns))]
+        cols = [np.tile(np.arange(len(self.numeric_columns)), n)]
+        data = [numeric.ravel()]
+        for col in self.categorical_columns:
+            codes = self._codes(col, chunk[col])
+            present = np.flatnonzero(codes >= 0)
+            rows.append(present)
+            cols.append(codes[present])
+            data.append(np.ones(len(present)))
+
+        p = self.n_features
+        block = sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(n, p))
+
+        if self.cross.shape[0] < p:
+            self.cross.resize((p, p))
+            self.sums = np.concatenate([self.sums, np.zeros(p - len(self.sums))])
+        self.n += n
+        self.sums += np.asarray(block.sum(axis=0)).ravel()
+        self.cross = self.cross + (block.T @ block).tocsr()
+
+    def _dummy_features(self, columns=None, drop_first=True):
+        """(global index, get_dummies-style name) of the features of the given columns"""
+        columns = columns or self.numeric_columns + self.categorical_columns
+        features = [(i, col) for i, col in enumerate(self.numeric_columns) if col in columns]
+        for col in self.categorical_columns:
+            if col not in columns:
+                continue
+            levels = sorted(self.vocab[col].items())
+            if drop_first:
+                levels = levels[1:]
+            features += [(index, f'{col}_{value}') for value, index in levels]
+        return features
+
+    def correlation_matrix(self, columns=None, drop_first=True):
+        """Dense correlation matrix over the features of the given source columns"""
+        features = self._dummy_features(columns, drop_first)
+        index = np.array([i for i, _ in features])
+        cross = self.cross[index][:, index].toarray()
+        sums = self.sums[index]
+        covariance = (cross - np.outer(sums, sums) / self.n) / (self.n - 1)
+        std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = covariance / np.outer(std, std)
+        corr[:, std == 0] = np.nan
+        corr[std == 0, :] = np.nan
+        names = [name for _, name in features]
+        return pd.DataFrame(corr, index=names, columns=names)
+
+    def target_correlations(self, target, drop_first=True):
+        """Correlation of every feature with one numeric column, like corr()[target]"""
+        t = self.numeric_columns.index(target)
+        features = [(i, name) for i, name in self._dummy_features(drop_first=drop_first) if name != target]
+        index = np.array([i for i, _ in features])
+        cross_t = np.asarray(self.cross[t].toarray()).ravel()[index]
+        diagonal = self.cross.diagonal()
+        cov_t = (cross_t - self.sums[t] * self.sums[index] / self.n) / (self.n - 1)
+        var = (diagonal[index] - self.sums[index] ** 2 / self.n) / (self.n - 1)
+        var_t = (diagonal[t] - self.sums[t] ** 2 / self.n) / (self.n - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov_t / np.sqrt(var * var_t)
+        corr[var <= 0] = np.nan
+        return pd.Series(corr, index=[name for _, name in features], name=target)
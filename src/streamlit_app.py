@@ -7,6 +7,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from feature_matrix import category_encoder
+from explain import ForestExplainer, supports_explanations
+from workload_features import WorkloadTable, WORKLOAD_FILENAME, OVERALL_FEATURES
+
 # Set page configuration
 st.set_page_config(
     page_title="Visa Processing Time Predictor",
@@ -44,6 +48,7 @@ class VisaPredictor:
         self.PREPROCESSOR_PATH = os.path.join(current_dir, 'visa_preprocessor.pkl')
         self.FEATURES_PATH = os.path.join(current_dir, 'visa_features.pkl')
         self.SUMMARY_PATH = os.path.join(current_dir, 'model_summary.json')
+        self.WORKLOAD_PATH = os.path.join(current_dir, WORKLOAD_FILENAME)
         
         # Load artifacts
         self._load_artifacts()
@@ -78,16 +83,20 @@ class VisaPredictor:
         else:
             self.preprocessor = None
         
+        # Intake / backlog lookup table (models retrained with the workload features need it)
+        if os.path.exists(self.WORKLOAD_PATH):
+            self.workload = WorkloadTable.load(self.WORKLOAD_PATH)
+        else:
+            self.workload = None
+        
         # Load categories/features logic... 
         # (Simplified for Streamlit: we assume init is successful if files exist)
         
         # Introspect model categories if possible
         try:
             if hasattr(self.model, 'named_steps'):
-                preprocessor = self.model.named_steps['preprocessor']
-                cat_transformer = preprocessor.named_transformers_['cat']
-                onehot = cat_transformer.named_steps['onehot']
-                self.model_categories = onehot.categories_
+                # One-hot ('onehot') or native categorical ('ordinal') encoder
+                self.model_categories = category_encoder(self.model).categories_
             else:
                 self.model_categories = []
         except:
@@ -121,7 +130,12 @@ class VisaPredictor:
         }
         
         # Apply mappings
-        return self._validate_and_map_inputs(input_data)
+        input_data = self._validate_and_map_inputs(input_data)
+        
+        # Current intake volume and backlog (O(1) lookup by day), as in app.py
+        if self.workload is not None:
+            input_data.update(self.workload.lookup(current_date, input_data['VISA_CLASS']))
+        return input_data
 
     def _validate_and_map_inputs(self, input_data):
         # Mappings logic from app.py
@@ -174,6 +188,16 @@ class VisaPredictor:
             st.error(f"Prediction error: {str(e)}")
             return None
 
+    def explain(self, input_data):
+        """Baseline and per-field contributions to the estimate (None if the model has no trees)"""
+        if not supports_explanations(self.model):
+            return None
+        if getattr(self, 'explainer', None) is None:
+            self.explainer = ForestExplainer(self.model)
+        # Held overall intake and backlog are the same for every request; not ranked as drivers
+        fixed = OVERALL_FEATURES if self.workload is not None and self.workload.held(datetime.now()) else ()
+        return self.explainer.explain(pd.DataFrame([input_data]), fixed=fixed)[0]
+
 @st.cache_resource
 def get_predictor():
     return VisaPredictor()
@@ -214,6 +238,8 @@ def main():
             h1b_dep = st.selectbox("H-1B Dependent?", predictor.allowed_values['H_1B_DEPENDENT'])
         with c2:
             willful_viol = st.selectbox("Willful Violator?", predictor.allowed_values['WILLFUL_VIOLATOR'])
+        
+        explain = st.checkbox("Explain the estimate")
             
         submitted = st.form_submit_button("Predict Processing Time", type="primary")
         
@@ -258,6 +284,19 @@ def main():
                 st.warning("⏳ Average Processing Time")
             else:
                 st.error("🐢 Slow Processing Time")
+            
+            if explain:
+                explanation = predictor.explain(prepared_data)
+                if explanation is None:
+                    st.caption("Explanations are only available for tree-based models.")
+                else:
+                    st.subheader("What drives this estimate")
+                    st.caption(f"Average case: {explanation['baseline']:.1f} days; each bar adds or removes days.")
+                    contributions = pd.DataFrame(explanation['contributions']).set_index('feature')
+                    contributions.loc['Other features'] = explanation['other_features']
+                    if 'fixed_features' in explanation:
+                        contributions.loc['Current intake and backlog'] = explanation['fixed_features']['days']
+                    st.bar_chart(contributions['days'])
 
 if __name__ == "__main__":
     main()
@@ -10,19 +10,23 @@ Original file is located at
 # MODULE 3: Predictive Modeling
 # AI Enabled Visa Status Prediction and Processing Time Estimator
 
+import os
 import pandas as pd
 import numpy as np
+import matplotlib
+
+# Headless runs (VISA_REPORT_DIR=<dir>) save figures, tables and the test set
+# predictions there instead of showing them; eda_report.py collects them
+REPORT_DIR = os.environ.get('VISA_REPORT_DIR')
+if REPORT_DIR:
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.impute import SimpleImputer
 
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
@@ -30,32 +34,20 @@ from sklearn.tree import DecisionTreeRegressor
 from xgboost import XGBRegressor
 
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.metrics import mean_absolute_percentage_error
-
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
 
+from data_loader import load_dataset
+from feature_matrix import build_preprocessor, native_categorical_model, NATIVE_MAX_CATEGORIES
+from dataset_profiler import load_profile, profile_path_for
+from category_vocab import CategoryVocabulary
+from model_scheduler import run_models
+from plot_utils import finish_figure, save_table, model_diagnostics_figure
+from workload_features import WORKLOAD_FEATURES, get_workload_table, add_workload_features
 
-# Load preprocessed data
-print("\n1. Loading preprocessed data...")
-file_path = '/content/drive/MyDrive/visa_data_preprocessed.csv'
-df = pd.read_csv(file_path)
-
-print(f"   Dataset shape: {df.shape}")
-print(f"   Columns: {len(df.columns)}")
-
-print("\n2. Dataset overview:")
-print(f"   Date range: {df['RECEIVED_DATE'].min()} to {df['RECEIVED_DATE'].max()}")
-print(f"   Total applications: {len(df):,}")
-
-
-print("\n3. Target variable analysis (processing_days):")
-print(f"   Mean: {df['processing_days'].mean():.2f} days")
-print(f"   Median: {df['processing_days'].median():.2f} days")
-print(f"   Std Dev: {df['processing_days'].std():.2f} days")
-print(f"   Min: {df['processing_days'].min()} days")
-print(f"   Max: {df['processing_days'].max()} days")
-print(f"   Skewness: {df['processing_days'].skew():.3f}")
+# The seaborn palette is only loaded for figures that are shown
+plt.style.use('seaborn-v0_8-darkgrid')
+if matplotlib.get_backend().lower() != 'agg':
+    import seaborn as sns
+    sns.set_palette("husl")
 
 
 selected_features = [
@@ -92,6 +84,37 @@ selected_features = [
     'processing_days'
 ]
 
+
+# Load preprocessed data (only the columns used below, with compact dtypes)
+print("\n1. Loading preprocessed data...")
+file_path = '/content/drive/MyDrive/visa_data_preprocessed.csv'
+df = load_dataset(file_path, columns=['RECEIVED_DATE'] + selected_features)
+
+# Saved dataset profile (dataset_profiler.py), used for category reduction
+profile = load_profile(profile_path_for(file_path), file_path)
+
+# Intake volume / open backlog when each application was received
+workload_table = get_workload_table(file_path)
+add_workload_features(df, workload_table)
+selected_features = selected_features[:-1] + WORKLOAD_FEATURES + selected_features[-1:]
+
+print(f"   Dataset shape: {df.shape}")
+print(f"   Columns: {len(df.columns)}")
+
+print("\n2. Dataset overview:")
+print(f"   Date range: {df['RECEIVED_DATE'].min()} to {df['RECEIVED_DATE'].max()}")
+print(f"   Total applications: {len(df):,}")
+
+
+print("\n3. Target variable analysis (processing_days):")
+print(f"   Mean: {df['processing_days'].mean():.2f} days")
+print(f"   Median: {df['processing_days'].median():.2f} days")
+print(f"   Std Dev: {df['processing_days'].std():.2f} days")
+print(f"   Min: {df['processing_days'].min()} days")
+print(f"   Max: {df['processing_days'].max()} days")
+print(f"   Skewness: {df['processing_days'].skew():.3f}")
+
+
 available_features = [f for f in selected_features if f in df.columns]
 print(f"\nSelected {len(available_features)} features out of {len(selected_features)} proposed")
 
@@ -103,11 +126,11 @@ print(f"Target variable shape: {y.shape}")
 
 print("\nFeature types:")
 print(f"  Numerical features: {len(X.select_dtypes(include=[np.number]).columns)}")
-print(f"  Categorical features: {len(X.select_dtypes(include=['object']).columns)}")
+print(f"  Categorical features: {len(X.select_dtypes(include=['object', 'category']).columns)}")
 
 
 
-categorical_cols = X.select_dtypes(include=['object']).columns.tolist()
+categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
 numerical_cols = X.select_dtypes(include=[np.number]).columns.tolist()
 
 print(f"\nCategorical columns ({len(categorical_cols)}):")
@@ -120,34 +143,26 @@ print(f"\nNumerical columns ({len(numerical_cols)}):")
 print("  " + ", ".join(numerical_cols))
 
 
-print("\nHandling high cardinality categorical features...")
-for col in categorical_cols:
-    if X[col].nunique() > 50:
-        print(f"  Reducing categories in '{col}' (had {X[col].nunique()} unique values)")
+# Native categorical gradient boosting (feature_matrix.py) joins the comparison
+# with its own input, keeping up to NATIVE_MAX_CATEGORIES levels per column
+NATIVE_CATEGORICAL = True
+if NATIVE_CATEGORICAL:
+    native_vocabulary = CategoryVocabulary.fit(X, categorical_cols, profile,
+                                               NATIVE_MAX_CATEGORIES, NATIVE_MAX_CATEGORIES)
+    X_native = native_vocabulary.transform(X)
 
-        top_categories = X[col].value_counts().head(20).index
-        X[col] = X[col].apply(lambda x: x if x in top_categories else 'Other')
+# Kept levels per column (category_vocab.py); saved with the model for serving
+print("\nHandling high cardinality categorical features...")
+vocabulary = CategoryVocabulary.fit(X, categorical_cols, profile)
+X = vocabulary.transform(X, verbose=True)
 
 print("\nCreating preprocessing pipelines...")
 
+# Keep the one-hot block sparse and store the matrix as float32 (feature_matrix.py);
+# much smaller than the dense float64 layout, so the full dataset fits in memory
+SPARSE_FEATURES = True
 
-numerical_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='median')),
-    ('scaler', StandardScaler())
-])
-
-
-categorical_transformer = Pipeline(steps=[
-    ('imputer', SimpleImputer(strategy='most_frequent')),
-    ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
-])
-
-# Combine transformers
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', numerical_transformer, numerical_cols),
-        ('cat', categorical_transformer, categorical_cols)
-    ])
+preprocessor = build_preprocessor(numerical_cols, categorical_cols, sparse_output=SPARSE_FEATURES)
 
 
 
@@ -163,6 +178,16 @@ print(f"Split ratio: 80% train, 20% test")
 
 
 
+# Total cores for the model comparison (None = every available core); models
+# with n_jobs=-1 get reserved slots, the others share the rest
+CPU_BUDGET = None
+# Fit imputation/scaling/one-hot encoding once and train every regressor on the
+# cached encoded matrices (the saved models are still full pipelines)
+SHARED_PREPROCESSING = True
+# Train metrics without predicting the whole training set: out-of-bag
+# predictions for the forest, a stratified subsample (with 95% bounds) otherwise
+FAST_EVALUATION = True
+
 models = {
     'Linear Regression': LinearRegression(),
     'Ridge Regression': Ridge(alpha=1.0),
@@ -181,54 +206,40 @@ for name, model in models.items():
     ])
 
 
-results = []
-for name, pipeline in model_pipelines.items():
-    print(f"\nTraining {name}...")
-
-    start_time = datetime.now()
-    pipeline.fit(X_train, y_train)
-    train_time = (datetime.now() - start_time).total_seconds()
-
-    y_pred_train = pipeline.predict(X_train)
-    y_pred_test = pipeline.predict(X_test)
+def report_model(result):
+    def bound(metric):
+        return f" ±{result[metric]:.2f}" if np.isfinite(result[metric]) else ""
 
-    train_mae = mean_absolute_error(y_train, y_pred_train)
-    test_mae = mean_absolute_error(y_test, y_pred_test)
+    print(f"\n{result['Model']} ({result['Threads']} threads):")
+    print(f"  Training Time: {result['Train_Time']:.2f} seconds (CPU: {result['CPU_Time']:.2f} seconds)")
+    print(f"  Peak Memory: {result['Peak_Memory_MB']:.1f} MB")
+    print(f"  Train metrics: {result['Train_Eval']} ({result['Train_Eval_Time']:.2f} seconds)")
+    print(f"  MAE: Train={result['Train_MAE']:.2f}{bound('Train_MAE_CI')}, Test={result['Test_MAE']:.2f} days")
+    print(f"  RMSE: Train={result['Train_RMSE']:.2f}{bound('Train_RMSE_CI')}, Test={result['Test_RMSE']:.2f} days")
+    print(f"  R² Score: Train={result['Train_R2']:.3f}, Test={result['Test_R2']:.3f}")
+    print(f"  MAPE: Train={result['Train_MAPE']:.2f}%, Test={result['Test_MAPE']:.2f}%")
 
-    train_rmse = np.sqrt(mean_squared_error(y_train, y_pred_train))
-    test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
 
-    train_r2 = r2_score(y_train, y_pred_train)
-    test_r2 = r2_score(y_test, y_pred_test)
+model_inputs, model_vocabularies = {}, {}
+if NATIVE_CATEGORICAL:
+    native_name = 'HistGradientBoosting (native categorical)'
+    model_pipelines[native_name] = native_categorical_model(numerical_cols, categorical_cols)
+    model_inputs[native_name] = (X_native.loc[X_train.index], X_native.loc[X_test.index])
+    model_vocabularies[native_name] = native_vocabulary
 
-    train_mape = mean_absolute_percentage_error(y_train, y_pred_train) * 100
-    test_mape = mean_absolute_percentage_error(y_test, y_pred_test) * 100
-
-    results.append({
-        'Model': name,
-        'Train_MAE': train_mae,
-        'Test_MAE': test_mae,
-        'Train_RMSE': train_rmse,
-        'Test_RMSE': test_rmse,
-        'Train_R2': train_r2,
-        'Test_R2': test_r2,
-        'Train_MAPE': train_mape,
-        'Test_MAPE': test_mape,
-        'Train_Time': train_time
-    })
-
-    print(f"  Training Time: {train_time:.2f} seconds")
-    print(f"  MAE: Train={train_mae:.2f}, Test={test_mae:.2f} days")
-    print(f"  RMSE: Train={train_rmse:.2f}, Test={test_rmse:.2f} days")
-    print(f"  R² Score: Train={train_r2:.3f}, Test={test_r2:.3f}")
-    print(f"  MAPE: Train={train_mape:.2f}%, Test={test_mape:.2f}%")
+# Fit the models in parallel within the core budget (model_scheduler.py)
+print(f"\nTraining {len(model_pipelines)} models...")
+results, model_pipelines = run_models(model_pipelines, X_train, y_train, X_test, y_test,
+                                      budget=CPU_BUDGET, on_result=report_model,
+                                      shared_preprocessing=SHARED_PREPROCESSING, views=model_inputs,
+                                      train_evaluation='fast' if FAST_EVALUATION else 'full')
 
 results_df = pd.DataFrame(results)
 results_df = results_df.sort_values('Test_RMSE')
 
 
 print("\nModels ranked by Test RMSE (lower is better):")
-print(results_df[['Model', 'Test_RMSE', 'Test_MAE', 'Test_R2', 'Test_MAPE', 'Train_Time']].to_string(index=False))
+print(results_df[['Model', 'Test_RMSE', 'Test_MAE', 'Test_R2', 'Test_MAPE', 'Train_Time', 'CPU_Time', 'Peak_Memory_MB', 'Threads']].to_string(index=False))
 
 
 fig, axes = plt.subplots(2, 2, figsize=(16, 12))
@@ -265,13 +276,15 @@ axes[1, 1].axvline(results_df['Train_Time'].min(), color='red', linestyle='--',
 for i, v in enumerate(results_df['Train_Time']):
     axes[1, 1].text(v + 0.5, i, f'{v:.1f}', va='center')
 
-plt.tight_layout()
-plt.show()
+finish_figure(fig, 'model_comparison', REPORT_DIR)
+save_table(results_df.set_index('Model'), 'model_comparison', REPORT_DIR)
 
 
 
 best_model_name = results_df.iloc[0]['Model']
 best_model = model_pipelines[best_model_name]
+# Each model was fitted on its own copy of the preprocessor
+preprocessor = best_model.named_steps['preprocessor']
 
 print(f"\n Best Performing Model: {best_model_name}")
 print(f"   Test RMSE: {results_df.iloc[0]['Test_RMSE']:.2f} days")
@@ -325,16 +338,21 @@ if best_model_name in ['Random Forest', 'Gradient Boosting', 'XGBoost', 'Decisio
         ax.set_xlabel('Feature Importance Score')
         ax.set_title(f'Top 15 Feature Importances - {best_model_name}')
         ax.invert_yaxis()
-        plt.tight_layout()
-        plt.show()
+        finish_figure(fig, 'feature_importance', REPORT_DIR)
+        save_table(importance_df.set_index('Feature'), 'feature_importance', REPORT_DIR)
 
 
         train_score = results_df[results_df['Model'] == best_model_name]['Train_R2'].values[0]
         test_score = results_df[results_df['Model'] == best_model_name]['Test_R2'].values[0]
+        train_eval = results_df[results_df['Model'] == best_model_name]['Train_Eval'].values[0]
         overfit_gap = train_score - test_score
 
         print(f"\n Overfitting Analysis:")
-        print(f"   Train R²: {train_score:.3f}")
+        if train_eval == 'oob':
+            # Out-of-bag R² estimates unseen-data performance, so a large gap means train/test shift
+            print(f"   Train R² (out-of-bag): {train_score:.3f}")
+        else:
+            print(f"   Train R²: {train_score:.3f}")
         print(f"   Test R²: {test_score:.3f}")
         print(f"   Gap: {overfit_gap:.3f}")
 
@@ -345,58 +363,19 @@ if best_model_name in ['Random Forest', 'Gradient Boosting', 'XGBoost', 'Decisio
 
 
 
-y_pred = best_model.predict(X_test)
+y_pred = best_model.predict(model_inputs.get(best_model_name, (X_train, X_test))[1])
 
 
-fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-
-# 1. Actual vs Predicted Scatter Plot
-axes[0, 0].scatter(y_test, y_pred, alpha=0.5, s=10)
-axes[0, 0].plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--', lw=2)
-axes[0, 0].set_xlabel('Actual Processing Days')
-axes[0, 0].set_ylabel('Predicted Processing Days')
-axes[0, 0].set_title(f'Actual vs Predicted - {best_model_name}')
-axes[0, 0].grid(True, alpha=0.3)
+fig = model_diagnostics_figure(y_test, y_pred, best_model_name)
+finish_figure(fig, 'model_diagnostics', REPORT_DIR)
 
-# Add R² score to plot
-axes[0, 0].text(0.05, 0.95, f'R² = {r2_score(y_test, y_pred):.3f}',
-                transform=axes[0, 0].transAxes, fontsize=12,
-                verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-# 2. Residual Plot
-residuals = y_test - y_pred
-axes[0, 1].scatter(y_pred, residuals, alpha=0.5, s=10)
-axes[0, 1].axhline(y=0, color='r', linestyle='--')
-axes[0, 1].set_xlabel('Predicted Processing Days')
-axes[0, 1].set_ylabel('Residuals (Actual - Predicted)')
-axes[0, 1].set_title(f'Residual Plot - {best_model_name}')
-axes[0, 1].grid(True, alpha=0.3)
-
-# 3. Error Distribution
-axes[1, 0].hist(residuals, bins=50, edgecolor='black', alpha=0.7)
-axes[1, 0].axvline(x=0, color='r', linestyle='--', linewidth=2)
-axes[1, 0].set_xlabel('Prediction Error (Days)')
-axes[1, 0].set_ylabel('Frequency')
-axes[1, 0].set_title(f'Error Distribution - {best_model_name}')
-axes[1, 0].grid(True, alpha=0.3)
-
-
-mean_error = residuals.mean()
-std_error = residuals.std()
-axes[1, 0].text(0.05, 0.95, f'Mean Error: {mean_error:.2f} days\nStd Error: {std_error:.2f} days',
-                transform=axes[1, 0].transAxes, fontsize=10,
-                verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-
-
-axes[1, 1].scatter(y_test, residuals, alpha=0.5, s=10)
-axes[1, 1].axhline(y=0, color='r', linestyle='--')
-axes[1, 1].set_xlabel('Actual Processing Days')
-axes[1, 1].set_ylabel('Prediction Error (Days)')
-axes[1, 1].set_title('Prediction Error vs Actual Value')
-axes[1, 1].grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.show()
+# Test set predictions for the report's model diagnostics section
+if REPORT_DIR:
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    np.savez_compressed(os.path.join(REPORT_DIR, 'model_predictions.npz'),
+                        y_test=y_test.to_numpy(dtype='float64'), y_pred=y_pred, model_name=np.array(best_model_name),
+                        visa_class=np.asarray(X_test['VISA_CLASS'].astype(str), dtype=str) if 'VISA_CLASS' in X_test.columns
+                        else np.array([], dtype=str))
 
 
 
@@ -427,10 +406,15 @@ features_filename = '/content/drive/MyDrive/visa_features.pkl'
 with open(features_filename, 'wb') as f:
     pickle.dump(available_features, f)
 
+# Save the category vocabulary the best model was trained with
+vocab_filename = '/content/drive/MyDrive/visa_category_vocab.json'
+model_vocabularies.get(best_model_name, vocabulary).save(vocab_filename)
+
 print(f"\n Model saved successfully!")
 print(f"   Model file: {model_filename}")
 print(f"   Preprocessor: {preprocessor_filename}")
 print(f"   Features: {features_filename}")
+print(f"   Category vocabulary: {vocab_filename}")
 
 summary = {
     'model_name': best_model_name,
@@ -472,4 +456,5 @@ if 'VISA_CLASS' in X_test.columns:
         'Error': ['mean', 'std', 'count']
     }).round(2)
 
-    print(visa_errors.head(10))
\ No newline at end of file
+    print(visa_errors.head(10))
+    save_table(visa_errors, 'visa_class_errors', REPORT_DIR)
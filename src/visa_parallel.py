@@ -0,0 +1,219 @@
+"""
+Parallel Preprocessing
+Multi-core version of visa_streaming.preprocess_streaming.
+
+The raw CSV is split into byte ranges that start and end on line boundaries.
+Pass 1 collects FillStatistics for every range in a process pool and merges
+them into global fill values (text columns whose heavy hitters overflowed get
+a second, exact counting pass over the ranges, so their modes do not depend on
+where the ranges are cut); pass 2 runs filling, date conversion,
+processing_days filtering, cleaning and temporal features for every range in
+the pool, each worker writing its own part file. The parts are concatenated
+in file order, so the output is the same as the serial streaming path.
+
+Assumes records do not contain quoted line breaks (true for the LCA
+disclosure exports); ranges are cut at the first newline after each offset.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from streaming_stats import FillStatistics
+from visa_streaming import transform_chunk, OutputSummary
+from visa_preprocessing import source_name, CHUNK_SIZE
+
+N_WORKERS = os.cpu_count() or 1
+
+
+class RangeReader:
+    """Read-only file object limited to the bytes [start, end) of a file"""
+
+    def __init__(self, path, start, end):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def readline(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        line = self.file.readline(self.remaining if size is None or size < 0 else min(size, self.remaining))
+        self.remaining -= len(line)
+        return line
+
+    def close(self):
+        self.file.close()
+
+
+def split_byte_ranges(file_path, n_parts):
+    """Split the data rows (after the header) into ~equal line-aligned byte ranges"""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        data_start = len(header)
+        boundaries = [data_start]
+        for i in range(1, n_parts):
+            offset = data_start + (size - data_start) * i // n_parts
+            if offset <= boundaries[-1]:
+                continue
+            f.seek(offset - 1)
+            f.readline()  # finish the line that contains the offset
+            position = f.tell()
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+        boundaries.append(size)
+    columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+    return columns, list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_range(file_path, start, end, columns, chunksize, dtype=None, usecols=None):
+    """Iterate over one byte range as DataFrame chunks"""
+    reader = RangeReader(file_path, start, end)
+    return reader, pd.read_csv(reader, header=None, names=columns, usecols=usecols, chunksize=chunksize,
+                               dtype=dtype, low_memory=False)
+
+
+def _range_statistics(args):
+    file_path, start, end, columns, chunksize = args
+    stats = FillStatistics()
+    reader, chunks = read_range(file_path, start, end, columns, chunksize)
+    try:
+        for chunk in chunks:
+            stats.update(chunk)
+    finally:
+        reader.close()
+    return stats
+
+
+def _range_value_counts(args):
+    file_path, start, end, columns, chunksize, count_columns = args
+    stats = FillStatistics()
+    dtypes = {column: object for column in count_columns}
+    reader, chunks = read_range(file_path, start, end, columns, chunksize, dtype=dtypes, usecols=count_columns)
+    try:
+        for chunk in chunks:
+            stats.count_values(chunk)
+    finally:
+        reader.close()
+    return stats
+
+
+def _range_transform(args):
+    (index, file_path, start, end, columns, chunksize, dtypes, fill_values,
+     part_path, columnar_path) = args
+
+    writer = None
+    if columnar_path:
+        from columnar_store import PartitionedWriter
+        writer = PartitionedWriter(columnar_path, source_name(file_path), replace=False, worker=index)
+
+    summary = OutputSummary()
+    header_written = False
+    reader, chunks = read_range(file_path, start, end, columns, chunksize, dtype=dtypes)
+    try:
+        with open(part_path, 'w', newline='') as out:
+            for chunk in chunks:
+                rows_in = len(chunk)
+                chunk = transform_chunk(chunk, fill_values)
+                summary.update(chunk, rows_in)
+                chunk.to_csv(out, header=not header_written, index=False)
+                header_written = True
+                if writer is not None:
+                    writer.write(chunk)
+    finally:
+        reader.close()
+    return summary
+
+
+def _concatenate_parts(part_paths, output_path):
+    """Join worker outputs in order, keeping only the first header"""
+    header_written = False
+    with open(output_path, 'wb') as out:
+        for path in part_paths:
+            if os.path.getsize(path) == 0:
+                continue
+            with open(path, 'rb') as part:
+                header = part.readline()
+                if not header_written:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+
+
+def preprocess_parallel(file_path, output_path, n_workers=N_WORKERS, chunksize=CHUNK_SIZE,
+                        columnar_path=None):
+    """Preprocess the raw file with a pool of n_workers processes"""
+    start_time = time.time()
+    columns, ranges = split_byte_ranges(file_path, n_workers)
+    print(f"Split {file_path} into {len(ranges)} partitions for {n_workers} workers")
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        print("Pass 1: collecting fill statistics...")
+        stats = FillStatistics()
+        for partial in pool.map(_range_statistics, [(file_path, s, e, columns, chunksize) for s, e in ranges]):
+            stats.merge(partial)
+        count_columns = stats.inexact_mode_columns()
+        if count_columns:
+            print(f"Counting {len(count_columns)} high-cardinality text columns exactly: {', '.join(count_columns)}")
+            tasks = [(file_path, s, e, columns, chunksize, count_columns) for s, e in ranges]
+            for partial in pool.map(_range_value_counts, tasks):
+                stats.merge(partial)
+        fill_values = stats.fill_values()
+        dtypes = stats.read_dtypes()
+        pass1_time = time.time() - start_time
+
+        print(f"Dataset rows: {stats.n_rows:,}, columns: {len(stats.null_counts)}")
+        print("\nMissing values per column:")
+        print(stats.missing_table())
+        print(f"\nFill values computed for {len(fill_values)} columns")
+
+        if columnar_path:
+            from columnar_store import remove_source_parts
+            os.makedirs(columnar_path, exist_ok=True)
+            remove_source_parts(columnar_path, source_name(file_path))
+
+        print("\nPass 2: cleaning and feature engineering...")
+        temp_dir = tempfile.mkdtemp(prefix='visa_parts_', dir=os.path.dirname(os.path.abspath(output_path)))
+        part_paths = [os.path.join(temp_dir, f'part-{i:05d}.csv') for i in range(len(ranges))]
+        tasks = [
+            (i, file_path, s, e, columns, chunksize, dtypes, fill_values, part_paths[i], columnar_path)
+            for i, (s, e) in enumerate(ranges)
+        ]
+        summary = OutputSummary()
+        for partial in pool.map(_range_transform, tasks):
+            summary.merge(partial)
+
+    _concatenate_parts(part_paths, output_path)
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    summary.report()
+    total_time = time.time() - start_time
+    print(f"\nPreprocessed data saved to: {output_path}")
+    if columnar_path:
+        print(f"Columnar dataset written to: {columnar_path}")
+    print(f"Final dataset rows: {summary.rows_out:,}")
+    print(f"Parallel preprocessing finished in {total_time:.1f} seconds "
+          f"(pass 1: {pass1_time:.1f}s, pass 2: {total_time - pass1_time:.1f}s)")
+    return stats
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import file_path, output_path, columnar_path
+    preprocess_parallel(file_path, output_path, columnar_path=columnar_path)
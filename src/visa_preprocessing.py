@@ -10,10 +10,7 @@ Original file is located at
 # MODULE 1: Data Collection & Preprocessing
 # AI Enabled Visa Status Prediction and Processing Time Estimator
 
-# Mount Google Drive
-from google.colab import drive
-drive.mount('/content/drive')
-
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -25,148 +22,308 @@ warnings.filterwarnings('ignore')
 pd.set_option('display.max_columns', None)
 plt.style.use('seaborn-v0_8-darkgrid')
 
-# Load data
+# Paths
 file_path = '/content/drive/MyDrive/Combined_LCA_Disclosure_Data_FY2024.csv'
-df = pd.read_csv(file_path)
-
-print(f"Dataset shape: {df.shape}")
-print(f"Columns: {list(df.columns)}\n")
-
-print("Dataset Info:")
-df.info()
-
-print("\nFirst 5 rows:")
-print(df.head())
-
-# Handle missing values
-print("\nMissing values per column:")
-missing_values = df.isnull().sum()
-missing_percentage = (missing_values / len(df)) * 100
-missing_df = pd.DataFrame({
-    'Missing Values': missing_values,
-    'Percentage': missing_percentage
-})
-print(missing_df[missing_df['Missing Values'] > 0].sort_values('Percentage', ascending=False))
-
-# Fill missing values
-for column in df.columns:
-    if df[column].isnull().sum() > 0:
-        if df[column].dtype in ['int64', 'float64']:
-            if df[column].dtype == 'float64' or df[column].nunique() > 10:
-                df[column].fillna(df[column].median(), inplace=True)
-            else:
-                df[column].fillna(df[column].mode()[0], inplace=True)
-        elif df[column].dtype == 'object':
-            df[column].fillna(df[column].mode()[0], inplace=True)
-
-print(f"\nTotal missing values after handling: {df.isnull().sum().sum()}")
-
-# Convert date columns
-date_columns = ['RECEIVED_DATE', 'DECISION_DATE', 'ORIGINAL_CERT_DATE', 'BEGIN_DATE', 'END_DATE']
-for col in date_columns:
-    if col in df.columns:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
-
-print("\nDate columns converted to datetime")
-
-# Calculate processing days
-df['processing_days'] = (df['DECISION_DATE'] - df['RECEIVED_DATE']).dt.days
-
-# Remove invalid processing times
-negative_days = df[df['processing_days'] < 0].shape[0]
-if negative_days > 0:
-    df = df[df['processing_days'] >= 0]
-    print(f"Removed {negative_days} records with negative processing days")
-
-print(f"\nProcessing days created:")
-print(f"  Mean: {df['processing_days'].mean():.2f} days")
-print(f"  Median: {df['processing_days'].median():.2f} days")
-print(f"  Min: {df['processing_days'].min()} days")
-print(f"  Max: {df['processing_days'].max()} days")
-
-# Clean categorical columns
-categorical_cols = df.select_dtypes(include=['object']).columns
-for col in categorical_cols:
-    if df[col].dtype == 'object':
-        df[col] = df[col].astype(str).str.strip()
-        df[col] = df[col].str.replace(r'\s+', ' ', regex=True)
-
-print(f"\nCleaned {len(categorical_cols)} categorical columns")
-
-# Create temporal features from RECEIVED_DATE
-if 'RECEIVED_DATE' in df.columns and df['RECEIVED_DATE'].dtype == 'datetime64[ns]':
-    df['application_year'] = df['RECEIVED_DATE'].dt.year
-    df['application_month'] = df['RECEIVED_DATE'].dt.month
-    df['application_day'] = df['RECEIVED_DATE'].dt.day
-    df['application_weekday'] = df['RECEIVED_DATE'].dt.weekday
-
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return 'Winter'
-        elif month in [3, 4, 5]:
-            return 'Spring'
-        elif month in [6, 7, 8]:
-            return 'Summer'
-        else:
-            return 'Fall'
-
-    df['application_season'] = df['application_month'].apply(get_season)
-
-    print(f"Created temporal features from RECEIVED_DATE")
-
-# Exploratory Data Analysis
-print("\n" + "="*60)
-print("EXPLORATORY DATA ANALYSIS")
-print("="*60)
-
-fig, axes = plt.subplots(2, 2, figsize=(15, 10))
-
-# 1. Distribution of processing days
-axes[0, 0].hist(df['processing_days'], bins=50, edgecolor='black', alpha=0.7)
-axes[0, 0].set_xlabel('Processing Days')
-axes[0, 0].set_ylabel('Frequency')
-axes[0, 0].set_title('Distribution of Processing Days')
-axes[0, 0].axvline(df['processing_days'].mean(), color='red', linestyle='--')
-
-# 2. Top 10 visa classes
-if 'VISA_CLASS' in df.columns:
-    top_visa = df['VISA_CLASS'].value_counts().head(10)
-    axes[0, 1].bar(top_visa.index, top_visa.values)
-    axes[0, 1].set_xlabel('Visa Class')
-    axes[0, 1].set_ylabel('Count')
-    axes[0, 1].set_title('Top 10 Visa Classes')
-    axes[0, 1].tick_params(axis='x', rotation=45)
-
-# 3. Processing time by visa class
-if 'VISA_CLASS' in df.columns:
-    visa_avg = df.groupby('VISA_CLASS')['processing_days'].mean().sort_values(ascending=False).head(10)
-    axes[1, 0].bar(visa_avg.index, visa_avg.values)
-    axes[1, 0].set_xlabel('Visa Class')
-    axes[1, 0].set_ylabel('Average Processing Days')
-    axes[1, 0].set_title('Top 10 Visa Classes by Processing Time')
-    axes[1, 0].tick_params(axis='x', rotation=45)
-
-# 4. Case status distribution
-if 'CASE_STATUS' in df.columns:
-    status_counts = df['CASE_STATUS'].value_counts()
-    axes[1, 1].bar(status_counts.index, status_counts.values)
-    axes[1, 1].set_xlabel('Case Status')
-    axes[1, 1].set_ylabel('Count')
-    axes[1, 1].set_title('Case Status Distribution')
-    axes[1, 1].tick_params(axis='x', rotation=45)
-
-plt.tight_layout()
-plt.show()
-
-# Additional analysis: Processing time by season
-if 'application_season' in df.columns:
-    seasonal_avg = df.groupby('application_season')['processing_days'].mean()
-    print("\nAverage processing time by season:")
-    for season, days in seasonal_avg.items():
-        print(f"  {season}: {days:.2f} days")
-
-# Save preprocessed data
 output_path = '/content/drive/MyDrive/visa_data_preprocessed.csv'
-df.to_csv(output_path, index=False)
-print(f"\nPreprocessed data saved to: {output_path}")
-print(f"Final dataset shape: {df.shape}")
\ No newline at end of file
+columnar_path = '/content/drive/MyDrive/visa_data_parquet'
+
+# Also write a Parquet dataset partitioned by fiscal year and VISA_CLASS
+# (see columnar_store.py) so downstream scripts can skip CSV parsing.
+WRITE_COLUMNAR = True
+
+# Streaming mode reads the raw file in chunks (two passes) so peak memory is
+# bounded by CHUNK_SIZE instead of the dataset size. See visa_streaming.py.
+STREAMING_MODE = False
+CHUNK_SIZE = 200000
+
+# Parallel mode runs the streaming stages over line-aligned byte ranges of the
+# raw file in a process pool (see visa_parallel.py). Output matches streaming.
+PARALLEL_MODE = False
+N_WORKERS = os.cpu_count() or 1
+
+date_columns = ['RECEIVED_DATE', 'DECISION_DATE', 'ORIGINAL_CERT_DATE', 'BEGIN_DATE', 'END_DATE']
+
+
+def fill_missing_values(df):
+    """Fill nulls with the column median (numeric) or mode (categorical)"""
+    for column in df.columns:
+        if df[column].isnull().sum() > 0:
+            if df[column].dtype in ['int64', 'float64']:
+                if df[column].dtype == 'float64' or df[column].nunique() > 10:
+                    df[column] = df[column].fillna(df[column].median())
+                else:
+                    df[column] = df[column].fillna(df[column].mode()[0])
+            elif pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column]):
+                df[column] = df[column].fillna(df[column].mode()[0])
+    return df
+
+
+def apply_fill_values(df, fill_values):
+    """Fill nulls from precomputed per-column fill values"""
+    for column, value in fill_values.items():
+        if column in df.columns:
+            df[column] = df[column].fillna(value)
+    return df
+
+
+# Formats tried, in order, when parsing date strings; anything left over
+# falls back to pandas' format inference.
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M:%S']
+
+
+class DateParser:
+    """Parses date strings once per distinct value and remembers the result"""
+
+    def __init__(self, formats=DATE_FORMATS):
+        self.formats = formats
+        self.cache = {}
+
+    def _parse_new(self, values):
+        values = pd.Series(values, dtype=object).astype(str)
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        remaining = pd.Series(True, index=values.index)
+        for fmt in self.formats:
+            if not remaining.any():
+                break
+            attempt = pd.to_datetime(values[remaining], format=fmt, errors='coerce')
+            ok = attempt.notna()
+            parsed[ok[ok].index] = attempt[ok]
+            remaining[ok[ok].index] = False
+        if remaining.any():
+            parsed[remaining] = pd.to_datetime(values[remaining], errors='coerce')
+        self.cache.update(zip(values.values, parsed.values))
+
+    def parse(self, series):
+        """Vectorized to_datetime(errors='coerce') for a column of strings"""
+        codes, uniques = pd.factorize(series)
+        unique_keys = pd.Index(uniques).astype(str)
+        new = [value for value in unique_keys if value not in self.cache]
+        if new:
+            self._parse_new(new)
+
+        # One extra NaT slot for missing values (code -1)
+        lookup = np.array([self.cache[value] for value in unique_keys] + [np.datetime64('NaT')],
+                          dtype='datetime64[ns]')
+        return pd.Series(lookup[codes], index=series.index)
+
+
+_date_parser = DateParser()
+
+
+def convert_date_columns(df, parser=None):
+    """Convert the known date columns to datetime"""
+    parser = parser or _date_parser
+    for col in date_columns:
+        if col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                continue
+            df[col] = parser.parse(df[col])
+    return df
+
+
+def add_processing_days(df):
+    """Create the processing_days target from DECISION_DATE - RECEIVED_DATE"""
+    df['processing_days'] = (df['DECISION_DATE'] - df['RECEIVED_DATE']).dt.days
+    return df
+
+
+def clean_text_values(series):
+    """Strip and collapse whitespace once per distinct value, then map back"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    cleaned = pd.Index(uniques).astype(str).str.strip().str.replace(r'\s+', ' ', regex=True)
+    return pd.Series(np.asarray(cleaned, dtype=object)[codes], index=series.index)
+
+
+def clean_categorical_columns(df):
+    """Strip and collapse whitespace in every object column"""
+    categorical_cols = df.select_dtypes(include=['object', 'string']).columns
+    for col in categorical_cols:
+        df[col] = clean_text_values(df[col])
+    return categorical_cols
+
+
+# Season for each month number (index 0 covers missing months, as get_season does)
+SEASON_BY_MONTH = np.array(['Fall', 'Winter', 'Winter', 'Spring', 'Spring', 'Spring',
+                            'Summer', 'Summer', 'Summer', 'Fall', 'Fall', 'Fall', 'Winter'], dtype=object)
+
+
+def get_season(month):
+    if month in [12, 1, 2]:
+        return 'Winter'
+    elif month in [3, 4, 5]:
+        return 'Spring'
+    elif month in [6, 7, 8]:
+        return 'Summer'
+    else:
+        return 'Fall'
+
+
+def seasons_for_months(months):
+    """Vectorized get_season over an array of month numbers"""
+    months = np.nan_to_num(np.asarray(months, dtype='float64'), nan=0).astype('int64')
+    return SEASON_BY_MONTH[months]
+
+
+def add_temporal_features(df):
+    """Create temporal features from RECEIVED_DATE (computed per distinct date)"""
+    if 'RECEIVED_DATE' in df.columns and pd.api.types.is_datetime64_any_dtype(df['RECEIVED_DATE']):
+        codes, uniques = pd.factorize(df['RECEIVED_DATE'], use_na_sentinel=False)
+        dates = pd.DatetimeIndex(uniques)
+        df['application_year'] = dates.year.values[codes]
+        df['application_month'] = dates.month.values[codes]
+        df['application_day'] = dates.day.values[codes]
+        df['application_weekday'] = dates.weekday.values[codes]
+        df['application_season'] = seasons_for_months(dates.month.values)[codes]
+        return True
+    return False
+
+
+def run_eda(df):
+    """Quick EDA figures on the preprocessed frame"""
+    print("\n" + "="*60)
+    print("EXPLORATORY DATA ANALYSIS")
+    print("="*60)
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+
+    # 1. Distribution of processing days
+    axes[0, 0].hist(df['processing_days'], bins=50, edgecolor='black', alpha=0.7)
+    axes[0, 0].set_xlabel('Processing Days')
+    axes[0, 0].set_ylabel('Frequency')
+    axes[0, 0].set_title('Distribution of Processing Days')
+    axes[0, 0].axvline(df['processing_days'].mean(), color='red', linestyle='--')
+
+    # 2. Top 10 visa classes
+    if 'VISA_CLASS' in df.columns:
+        top_visa = df['VISA_CLASS'].value_counts().head(10)
+        axes[0, 1].bar(top_visa.index, top_visa.values)
+        axes[0, 1].set_xlabel('Visa Class')
+        axes[0, 1].set_ylabel('Count')
+        axes[0, 1].set_title('Top 10 Visa Classes')
+        axes[0, 1].tick_params(axis='x', rotation=45)
+
+    # 3. Processing time by visa class
+    if 'VISA_CLASS' in df.columns:
+        visa_avg = df.groupby('VISA_CLASS')['processing_days'].mean().sort_values(ascending=False).head(10)
+        axes[1, 0].bar(visa_avg.index, visa_avg.values)
+        axes[1, 0].set_xlabel('Visa Class')
+        axes[1, 0].set_ylabel('Average Processing Days')
+        axes[1, 0].set_title('Top 10 Visa Classes by Processing Time')
+        axes[1, 0].tick_params(axis='x', rotation=45)
+
+    # 4. Case status distribution
+    if 'CASE_STATUS' in df.columns:
+        status_counts = df['CASE_STATUS'].value_counts()
+        axes[1, 1].bar(status_counts.index, status_counts.values)
+        axes[1, 1].set_xlabel('Case Status')
+        axes[1, 1].set_ylabel('Count')
+        axes[1, 1].set_title('Case Status Distribution')
+        axes[1, 1].tick_params(axis='x', rotation=45)
+
+    plt.tight_layout()
+    plt.show()
+
+    # Additional analysis: Processing time by season
+    if 'application_season' in df.columns:
+        seasonal_avg = df.groupby('application_season')['processing_days'].mean()
+        print("\nAverage processing time by season:")
+        for season, days in seasonal_avg.items():
+            print(f"  {season}: {days:.2f} days")
+
+
+def source_name(path):
+    """Name used to tag a raw file's parts in the columnar dataset"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def preprocess(file_path, output_path, columnar_path=None):
+    """Load the full raw file in memory, preprocess it and save the result"""
+    # Load data
+    df = pd.read_csv(file_path)
+
+    print(f"Dataset shape: {df.shape}")
+    print(f"Columns: {list(df.columns)}\n")
+
+    print("Dataset Info:")
+    df.info()
+
+    print("\nFirst 5 rows:")
+    print(df.head())
+
+    # Handle missing values
+    print("\nMissing values per column:")
+    missing_values = df.isnull().sum()
+    missing_percentage = (missing_values / len(df)) * 100
+    missing_df = pd.DataFrame({
+        'Missing Values': missing_values,
+        'Percentage': missing_percentage
+    })
+    print(missing_df[missing_df['Missing Values'] > 0].sort_values('Percentage', ascending=False))
+
+    # Fill missing values
+    df = fill_missing_values(df)
+
+    print(f"\nTotal missing values after handling: {df.isnull().sum().sum()}")
+
+    # Convert date columns
+    df = convert_date_columns(df)
+
+    print("\nDate columns converted to datetime")
+
+    # Calculate processing days
+    df = add_processing_days(df)
+
+    # Remove invalid processing times
+    negative_days = df[df['processing_days'] < 0].shape[0]
+    if negative_days > 0:
+        df = df[df['processing_days'] >= 0]
+        print(f"Removed {negative_days} records with negative processing days")
+
+    print(f"\nProcessing days created:")
+    print(f"  Mean: {df['processing_days'].mean():.2f} days")
+    print(f"  Median: {df['processing_days'].median():.2f} days")
+    print(f"  Min: {df['processing_days'].min()} days")
+    print(f"  Max: {df['processing_days'].max()} days")
+
+    # Clean categorical columns
+    categorical_cols = clean_categorical_columns(df)
+
+    print(f"\nCleaned {len(categorical_cols)} categorical columns")
+
+    # Create temporal features from RECEIVED_DATE
+    if add_temporal_features(df):
+        print(f"Created temporal features from RECEIVED_DATE")
+
+    # Exploratory Data Analysis
+    run_eda(df)
+
+    # Save preprocessed data
+    df.to_csv(output_path, index=False)
+    print(f"\nPreprocessed data saved to: {output_path}")
+    print(f"Final dataset shape: {df.shape}")
+
+    if columnar_path:
+        from columnar_store import write_columnar
+        write_columnar(df, columnar_path, source_name(file_path))
+        print(f"Columnar dataset written to: {columnar_path}")
+    return df
+
+
+def main():
+    # Mount Google Drive
+    from google.colab import drive
+    drive.mount('/content/drive')
+
+    target = columnar_path if WRITE_COLUMNAR else None
+    if PARALLEL_MODE:
+        from visa_parallel import preprocess_parallel
+        preprocess_parallel(file_path, output_path, n_workers=N_WORKERS, chunksize=CHUNK_SIZE, columnar_path=target)
+    elif STREAMING_MODE:
+        from visa_streaming import preprocess_streaming
+        preprocess_streaming(file_path, output_path, chunksize=CHUNK_SIZE, columnar_path=target)
+    else:
+        preprocess(file_path, output_path, columnar_path=target)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Streaming Preprocessing
+Chunked, two-pass version of visa_preprocessing.preprocess.
+
+Pass 1 reads the raw LCA disclosure file chunk by chunk and collects fill
+statistics (null counts, streaming medians, heavy-hitter modes). Text columns
+with nulls and more distinct values than the heavy hitters can hold are then
+re-read on their own and counted exactly, so their fill mode is the same as
+the in-memory .mode()[0].
+Pass 2 re-reads it and applies filling, date conversion, processing_days
+filtering, categorical cleaning and temporal features one chunk at a time,
+appending each finished chunk to the output CSV (and, optionally, to the
+partitioned Parquet dataset from columnar_store.py).
+
+Peak memory is bounded by the chunk size plus the (bounded) statistics.
+Note: rows with negative or missing processing_days are always dropped here;
+the in-memory path only drops them when at least one negative value exists.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from streaming_stats import FillStatistics, StreamingMedian
+from visa_preprocessing import (
+    apply_fill_values,
+    convert_date_columns,
+    add_processing_days,
+    clean_categorical_columns,
+    add_temporal_features,
+    source_name,
+    CHUNK_SIZE,
+)
+
+
+def compute_fill_statistics(file_path, chunksize=CHUNK_SIZE):
+    """Pass 1: stream the raw file and collect fill statistics"""
+    stats = FillStatistics()
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, low_memory=False):
+        stats.update(chunk)
+
+    columns = stats.inexact_mode_columns()
+    if columns:
+        print(f"Counting {len(columns)} high-cardinality text columns exactly: {', '.join(columns)}")
+        dtypes = {column: object for column in columns}
+        for chunk in pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+            stats.count_values(chunk)
+    return stats
+
+
+def transform_chunk(chunk, fill_values):
+    """Pass 2 stages for a single chunk; returns the cleaned chunk"""
+    chunk = apply_fill_values(chunk, fill_values)
+    chunk = convert_date_columns(chunk)
+    chunk = add_processing_days(chunk)
+    chunk = chunk[chunk['processing_days'] >= 0].copy()
+    clean_categorical_columns(chunk)
+    add_temporal_features(chunk)
+    return chunk
+
+
+class OutputSummary:
+    """Running processing_days statistics over the transformed chunks"""
+
+    def __init__(self):
+        self.rows_in = 0
+        self.rows_out = 0
+        self.days_sum = 0.0
+        self.days_min = np.inf
+        self.days_max = -np.inf
+        self.days_median = StreamingMedian()
+        self.season_sums = {}
+        self.season_counts = {}
+
+    def update(self, chunk, rows_in):
+        self.rows_in += rows_in
+        self.rows_out += len(chunk)
+
+        days = chunk['processing_days']
+        if len(days):
+            self.days_sum += float(days.sum())
+            self.days_min = min(self.days_min, days.min())
+            self.days_max = max(self.days_max, days.max())
+            self.days_median.update(days)
+        if 'application_season' in chunk.columns:
+            grouped = days.groupby(chunk['application_season']).agg(['sum', 'count'])
+            for season, row in grouped.iterrows():
+                self.season_sums[season] = self.season_sums.get(season, 0.0) + row['sum']
+                self.season_counts[season] = self.season_counts.get(season, 0) + row['count']
+
+    def merge(self, other):
+        self.rows_in += other.rows_in
+        self.rows_out += other.rows_out
+        self.days_sum += other.days_sum
+        self.days_min = min(self.days_min, other.days_min)
+        self.days_max = max(self.days_max, other.days_max)
+        self.days_median.merge(other.days_median)
+        for season, total in other.season_sums.items():
+            self.season_sums[season] = self.season_sums.get(season, 0.0) + total
+            self.season_counts[season] = self.season_counts.get(season, 0) + other.season_counts[season]
+
+    def report(self):
+        removed = self.rows_in - self.rows_out
+        if removed > 0:
+            print(f"Removed {removed} records with negative or missing processing days")
+
+        if self.rows_out:
+            print(f"\nProcessing days created:")
+            print(f"  Mean: {self.days_sum / self.rows_out:.2f} days")
+            print(f"  Median: {self.days_median.median():.2f} days")
+            print(f"  Min: {self.days_min} days")
+            print(f"  Max: {self.days_max} days")
+
+        if self.season_counts:
+            print("\nAverage processing time by season:")
+            for season in sorted(self.season_counts):
+                print(f"  {season}: {self.season_sums[season] / self.season_counts[season]:.2f} days")
+
+
+def preprocess_streaming(file_path, output_path, chunksize=CHUNK_SIZE, columnar_path=None):
+    """Preprocess the raw file with memory bounded by chunksize"""
+    start_time = time.time()
+
+    print(f"Pass 1: collecting fill statistics ({chunksize:,} rows per chunk)...")
+    stats = compute_fill_statistics(file_path, chunksize)
+    fill_values = stats.fill_values()
+
+    print(f"Dataset rows: {stats.n_rows:,}, columns: {len(stats.null_counts)}")
+    print("\nMissing values per column:")
+    print(stats.missing_table())
+    print(f"\nFill values computed for {len(fill_values)} columns")
+
+    # Parse every chunk with the whole-file dtypes (object / float64 columns)
+    dtypes = stats.read_dtypes()
+
+    print("\nPass 2: cleaning and feature engineering...")
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    writer = None
+    if columnar_path:
+        from columnar_store import PartitionedWriter
+        writer = PartitionedWriter(columnar_path, source_name(file_path))
+
+    summary = OutputSummary()
+    for i, chunk in enumerate(pd.read_csv(file_path, chunksize=chunksize, dtype=dtypes, low_memory=False)):
+        rows_in = len(chunk)
+        chunk = transform_chunk(chunk, fill_values)
+        summary.update(chunk, rows_in)
+
+        chunk.to_csv(output_path, mode='a', header=(i == 0), index=False)
+        if writer is not None:
+            writer.write(chunk)
+        print(f"  Chunk {i + 1}: {summary.rows_out:,} rows written")
+
+    summary.report()
+
+    print(f"\nPreprocessed data saved to: {output_path}")
+    if writer is not None:
+        print(f"Columnar dataset written to: {columnar_path} ({writer.part} parts)")
+    print(f"Final dataset rows: {summary.rows_out:,}")
+    print(f"Streaming preprocessing finished in {time.time() - start_time:.1f} seconds")
+    return stats
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import file_path, output_path, columnar_path
+    preprocess_streaming(file_path, output_path, columnar_path=columnar_path)
@@ -0,0 +1,231 @@
+"""
+Workload Features
+Intake volume and open backlog at the time an application is received,
+overall and per VISA_CLASS, as model features.
+
+Dates are integer day numbers (days since 1970-01-01) and weeks are integer
+Monday-based week numbers; every series is a bincount over days, and rolling
+intake and backlog come from cumulative sums:
+
+- intake_7d / intake_28d: applications received in the 7 / 28 days before
+- open_backlog: applications received before the day and decided on or after it
+- class_intake_28d / class_open_backlog: the same within the VISA_CLASS
+
+Only days before the received date are counted, so the values are known at
+request time. The table is saved as a compact .npz (one float32 row per
+feature and series, one column per day) and looked up in O(1) by day offset.
+
+The disclosure data only holds decided cases, so the last days of the table
+miss the applications still pending when the file was cut and under-count
+intake and backlog. The last complete day is the last decision date minus
+the COMPLETE_QUANTILE processing time; later dates (every request at
+serving time, and the newest training rows) get that day's values, so
+training and serving read the same column.
+
+Usage: python workload_features.py [preprocessed_csv]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from data_loader import iter_dataset, CHUNK_SIZE
+from dataset_profiler import source_fingerprint
+
+WORKLOAD_FILENAME = 'workload_features.npz'
+WORKLOAD_VERSION = 2
+ALL_CLASSES = '__all__'
+
+# Applications received this far (in processing-time quantile) before the last
+# decision are nearly all decided in the data
+COMPLETE_QUANTILE = 0.95
+
+OVERALL_FEATURES = ['intake_7d', 'intake_28d', 'open_backlog']
+CLASS_FEATURES = ['class_intake_28d', 'class_open_backlog']
+WORKLOAD_FEATURES = OVERALL_FEATURES + CLASS_FEATURES
+
+
+def day_numbers(dates):
+    """Integer day numbers of a datetime Series/array (NaT becomes -1)"""
+    dates = pd.to_datetime(pd.Series(dates), errors='coerce')
+    days = dates.values.astype('datetime64[D]').astype('int64')
+    return np.where(dates.isnull().values, -1, days)
+
+
+def week_numbers(days):
+    """Monday-based integer week numbers of integer day numbers"""
+    return (np.asarray(days) + 3) // 7
+
+
+def week_label(weeks):
+    """ISO-style 'YYYY-Www' label of integer week numbers (for display only)"""
+    mondays = pd.to_datetime(np.asarray(weeks) * 7 - 3, unit='D')
+    calendar = mondays.isocalendar()
+    return (calendar['year'].astype(str) + '-W' + calendar['week'].astype(str).str.zfill(2)).values
+
+
+def _rolling(cumulative, window):
+    """Sum over the `window` days before each day, from an inclusive cumsum"""
+    before = np.concatenate([[0], cumulative[:-1]])
+    lagged = np.concatenate([np.zeros(window, dtype=before.dtype), before])[:len(before)]
+    return before - lagged
+
+
+class WorkloadTable:
+    def __init__(self, start_day, classes, values, last_complete_day=None):
+        self.start_day = int(start_day)
+        self.classes = list(classes)
+        self.class_index = {name: i for i, name in enumerate(self.classes)}
+        # values[series, feature, day]; series 0 is every class combined
+        self.values = values
+        last_day = self.start_day + self.n_days - 1
+        self.last_complete_day = last_day if last_complete_day is None else min(int(last_complete_day), last_day)
+        self.version = WORKLOAD_VERSION
+
+    @property
+    def n_days(self):
+        return self.values.shape[2]
+
+    def _offsets(self, days):
+        return np.clip(np.asarray(days) - self.start_day, 0, self.n_days - 1)
+
+    @property
+    def last_complete_date(self):
+        return pd.Timestamp(self.last_complete_day, unit='D')
+
+    def held(self, date):
+        """True if date is after the last complete day, so lookup() holds that day's values"""
+        return int(day_numbers([date])[0]) > self.last_complete_day
+
+    def lookup(self, date, visa_class=None):
+        """Feature values for one received date (dates after the last complete day get its values)"""
+        offset = int(self._offsets(min(int(day_numbers([date])[0]), self.last_complete_day)))
+        result = dict(zip(OVERALL_FEATURES, self.values[0, :len(OVERALL_FEATURES), offset].tolist()))
+        series = self.class_index.get(visa_class)
+        class_values = self.values[series, len(OVERALL_FEATURES):, offset] if series else np.zeros(len(CLASS_FEATURES))
+        result.update(zip(CLASS_FEATURES, [float(v) for v in class_values]))
+        return result
+
+    def lookup_frame(self, received_dates, visa_classes):
+        """Feature columns for many rows at once (held after the last complete day, like lookup())"""
+        offsets = self._offsets(np.minimum(day_numbers(received_dates), self.last_complete_day))
+        series = pd.Series(visa_classes).astype(object).map(self.class_index).fillna(-1).astype('int64').values
+        frame = pd.DataFrame({
+            name: self.values[0, i, offsets] for i, name in enumerate(OVERALL_FEATURES)
+        })
+        for i, name in enumerate(CLASS_FEATURES):
+            column = self.values[np.maximum(series, 0), len(OVERALL_FEATURES) + i, offsets]
+            frame[name] = np.where(series > 0, column, 0).astype('float32')
+        return frame
+
+    def save(self, path, source=None):
+        np.savez_compressed(path, start_day=self.start_day, classes=np.array(self.classes, dtype=str),
+                            values=self.values, source=np.array(repr(source)),
+                            last_complete_day=self.last_complete_day, version=WORKLOAD_VERSION)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            last_complete_day = int(data['last_complete_day']) if 'last_complete_day' in data.files else None
+            table = cls(int(data['start_day']), data['classes'].tolist(), data['values'], last_complete_day)
+            table.source = str(data['source'])
+            table.version = int(data['version']) if 'version' in data.files else 1
+        return table
+
+
+def build_workload_table(data_path, chunksize=CHUNK_SIZE):
+    """Count received and decided applications per day and class in one pass"""
+    start_time = time.time()
+    received, decided = [], []
+    durations = np.zeros(1, dtype='int64')
+    for chunk in iter_dataset(data_path, columns=['RECEIVED_DATE', 'DECISION_DATE', 'VISA_CLASS'],
+                              chunksize=chunksize):
+        frame = pd.DataFrame({
+            'received': day_numbers(chunk['RECEIVED_DATE']),
+            'decided': day_numbers(chunk['DECISION_DATE']),
+            'visa_class': chunk['VISA_CLASS'].astype(object).fillna('Unknown').values,
+        })
+        frame = frame[frame['received'] >= 0]
+        received.append(frame.groupby(['visa_class', 'received']).size())
+        decided.append(frame[frame['decided'] >= 0].groupby(['visa_class', 'decided']).size())
+        # Histogram of processing days, for the last complete day
+        elapsed = (frame['decided'] - frame['received'])[frame['decided'] >= 0].clip(lower=0).values
+        counts = np.bincount(elapsed)
+        durations = np.pad(durations, (0, max(0, len(counts) - len(durations))))
+        durations[:len(counts)] += counts
+
+    received = pd.concat(received).groupby(level=[0, 1]).sum()
+    decided = pd.concat(decided).groupby(level=[0, 1]).sum()
+    # Days up to the day after the last receipt; later decisions never affect a feature
+    days = received.index.get_level_values(1)
+    start_day, end_day = int(days.min()), int(days.max())
+    n_days = end_day - start_day + 2
+    complete_wait = int(np.searchsorted(np.cumsum(durations), COMPLETE_QUANTILE * durations.sum()))
+    last_complete_day = max(start_day, min(end_day, int(decided.index.get_level_values(1).max()) - complete_wait))
+    decided = decided[decided.index.get_level_values(1) < start_day + n_days]
+
+    classes = [ALL_CLASSES] + sorted(received.index.get_level_values(0).unique())
+    values = np.zeros((len(classes), len(WORKLOAD_FEATURES), n_days), dtype='float32')
+
+    def daily(counts, visa_class):
+        if visa_class == ALL_CLASSES:
+            counts = counts.groupby(level=1).sum()
+        elif visa_class in counts.index.get_level_values(0):
+            counts = counts.xs(visa_class, level=0)
+        else:
+            return np.zeros(n_days, dtype='int64')
+        return np.bincount(counts.index.values - start_day, weights=counts.values, minlength=n_days).astype('int64')
+
+    for series, visa_class in enumerate(classes):
+        cum_received = np.cumsum(daily(received, visa_class))
+        cum_decided = np.cumsum(daily(decided, visa_class))
+        backlog = np.concatenate([[0], cum_received[:-1] - cum_decided[:-1]])
+        features = {
+            'intake_7d': _rolling(cum_received, 7),
+            'intake_28d': _rolling(cum_received, 28),
+            'open_backlog': backlog,
+        }
+        features['class_intake_28d'] = features['intake_28d']
+        features['class_open_backlog'] = backlog
+        for i, name in enumerate(WORKLOAD_FEATURES):
+            values[series, i] = features[name]
+
+    table = WorkloadTable(start_day, classes, values, last_complete_day)
+    print(f"Workload table: {len(classes) - 1} visa classes x {n_days} days "
+          f"built in {time.time() - start_time:.1f}s (complete up to {table.last_complete_date:%Y-%m-%d})")
+    return table
+
+
+def workload_path_for(data_path):
+    return os.path.join(os.path.dirname(os.path.abspath(data_path)), WORKLOAD_FILENAME)
+
+
+def get_workload_table(data_path, path=None, rebuild=False):
+    """Load the saved table for data_path, rebuilding it if missing or stale"""
+    path = path or workload_path_for(data_path)
+    source = source_fingerprint(data_path)
+    if not rebuild and os.path.exists(path):
+        table = WorkloadTable.load(path)
+        if table.source == repr(source) and table.version == WORKLOAD_VERSION:
+            return table
+    table = build_workload_table(data_path)
+    table.save(path, source)
+    table.source = repr(source)
+    print(f"Workload table saved to: {path}")
+    return table
+
+
+def add_workload_features(df, table):
+    """Add the workload feature columns to a frame with RECEIVED_DATE and VISA_CLASS"""
+    features = table.lookup_frame(df['RECEIVED_DATE'], df['VISA_CLASS'])
+    for name in WORKLOAD_FEATURES:
+        df[name] = features[name].values
+    return df
+
+
+if __name__ == '__main__':
+    from visa_preprocessing import output_path
+    data_path = sys.argv[1] if len(sys.argv) > 1 else output_path
+    get_workload_table(data_path, rebuild=True)